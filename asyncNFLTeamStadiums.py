@@ -0,0 +1,409 @@
+from nflTeamStadiums import NFLTeamStadiums
+from custom_libs import requestsCommon as rC
+from custom_libs.weatherCache import WeatherCache
+import asyncio
+import copy
+
+
+class AsyncNFLTeamStadiums(NFLTeamStadiums):
+    """
+    asyncio version of NFLTeamStadiums for event loop services. Wikipedia and Open Meteo are requested with aiohttp so
+    nothing blocks the loop, while the parsing, caches and every lookup are shared with NFLTeamStadiums. Parsing and
+    the stadium, weather and sqlite cache files are handled in worker threads (asyncio.to_thread), so they do not block
+    the loop either.
+
+    The methods that request the network (create, refresh, get_weather_forecast_for_stadium,
+    get_weather_for_stadiums, get_weather_for_slate and prefetch_weather) are coroutines with a timeout parameter, the
+    seconds allowed for each request. They can be cancelled at any point: a cancelled refresh leaves the previous data
+    in place unless it was already saving the new data. start_background_refresh refreshes on a schedule in a task on
+    the event loop.
+
+    Create instances with create() and close them when done:
+
+        async with await AsyncNFLTeamStadiums.create() as nfl_stadiums:
+            weather = await nfl_stadiums.get_weather_forecast_for_stadium('DET', '2024-09-08', 13, 16)
+    """
+    def __init__(self, use_cache=True, verbose=True, **kwargs):
+        """
+        Only loads the stadium data from cache, use create() to scrape it when there is no cache. Parameters are the
+        same as NFLTeamStadiums.
+        """
+        self._session = None
+        self._refresh_lock = asyncio.Lock()
+        # cache key -> [task, number of callers waiting on it]. The task returns dict() cache key -> weather data and
+        # a batched request is registered under the cache key of each of its locations.
+        self._weather_tasks = {}
+        super().__init__(use_cache=use_cache, verbose=verbose, **kwargs)
+
+    @classmethod
+    async def create(cls, use_cache=True, verbose=True, timeout=5, **kwargs):
+        """
+        :param timeout: float(), seconds allowed for each request if the data has to be scraped (default 5)
+
+        Other parameters are the same as NFLTeamStadiums.
+
+        :return:        AsyncNFLTeamStadiums(), with the stadium data loaded from cache, or scraped from wikipedia if
+                        there is no cache
+        """
+        nfl_stadiums = cls(use_cache=False, verbose=verbose, **kwargs)
+        try:
+            if use_cache:
+                await asyncio.to_thread(nfl_stadiums._check_cache)
+            if not nfl_stadiums.data:
+                await nfl_stadiums._refresh(False, True, timeout, load_newer_cache=use_cache)
+        except BaseException:
+            await nfl_stadiums.close()
+            raise
+
+        return nfl_stadiums
+
+    def _load_data(self, use_cache):
+        # Scraping is left to create, so constructing never touches the network
+        if use_cache:
+            self._check_cache()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """
+        Stops the background refresh and closes the connections to wikipedia and Open Meteo. The next request opens
+        new ones.
+        """
+        await self.stop_background_refresh()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = rC.create_async_session()
+
+        return self._session
+
+    async def _run_wiki_requests_async(self, steps, timeout):
+        """
+        Async version of _run_wiki_requests. Requests yielded together are made concurrently, at most
+        self._max_concurrent_requests at a time. The steps between requests parse pages and read and write the cache
+        files, so they run in a worker thread.
+        """
+        results, error = None, None
+        while True:
+            outcome, value = await self._advance_steps_async(steps, results, error)
+            if outcome == 'return':
+                return value
+            if outcome == 'raise':
+                raise value
+
+            requests = value
+            try:
+                results, error = await self._send_wiki_requests_async(requests, timeout), None
+            except BaseException as e:
+                # Includes cancellation, so the steps can put the previous data back
+                results, error = None, e
+
+    async def _advance_steps_async(self, steps, results, error):
+        step = asyncio.ensure_future(asyncio.to_thread(self._advance_steps, steps, results, error))
+        try:
+            return await asyncio.shield(step)
+        except asyncio.CancelledError:
+            # A step cannot be interrupted part way. Wait for it, then stop the steps where they are so they put the
+            # previous data back.
+            while not step.done():
+                try:
+                    await asyncio.shield(step)
+                except asyncio.CancelledError:
+                    pass
+            if step.result()[0] == 'yield':
+                steps.close()
+            raise
+
+    def _advance_steps(self, steps, results, error):
+        """
+        Runs the steps up to their next requests. Exceptions are returned rather than raised since StopIteration
+        cannot be raised through a Future.
+
+        :return: tuple(), ('yield', requests), ('return', return value of steps) or ('raise', Exception())
+        """
+        try:
+            requests = steps.throw(error) if error is not None else steps.send(results)
+        except StopIteration as e:
+            return 'return', e.value
+        except BaseException as e:
+            return 'raise', e
+
+        # Loaded here rather than by the first request on the loop
+        self._get_wiki_responses()
+        return 'yield', requests
+
+    async def _send_wiki_requests_async(self, requests, timeout):
+        semaphore = asyncio.Semaphore(self._max_concurrent_requests)
+
+        async def send_request(request):
+            params, parse = request
+            # Both can read cache files, the list page html for a 304 in particular
+            headers = await asyncio.to_thread(self._get_wiki_request_headers, params)
+            async with semaphore:
+                response = await rC.async_basic_request(self._get_session(), self._main_url, params=params,
+                                                        headers=headers, timeout=timeout,
+                                                        instrumentation=self._instrumentation)
+            response = await asyncio.to_thread(self._check_not_modified, params, response)
+            return response if parse is None else parse(response)
+
+        tasks = [asyncio.ensure_future(send_request(x)) for x in requests]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def refresh(self, incremental=True, wait=True, timeout=5):
+        """
+        Updates the stadium data from wikipedia. See NFLTeamStadiums.refresh.
+
+        :param incremental: bool(), see NFLTeamStadiums.refresh
+        :param wait:        bool(), see NFLTeamStadiums.refresh. Waiting does not block the event loop.
+        :param timeout:     float(), seconds allowed for each request (default 5)
+
+        :return:            bool(), True if anything was re-fetched or loaded from another process's refresh, False if
+                            the data was already up to date or another process is refreshing and wait is False
+        """
+        return await self._refresh(incremental, wait, timeout)
+
+    async def _refresh(self, incremental, wait, timeout, load_newer_cache=True):
+        async with self._refresh_lock:
+            if not await self._acquire_cache_lock_async(wait):
+                self._check_print("INFO: Another process is refreshing the stadium data, keeping the current data.")
+                return False
+
+            try:
+                if load_newer_cache and await asyncio.to_thread(self._load_newer_cache):
+                    return True
+                return await self._run_wiki_requests_async(self._refresh_steps(incremental), timeout)
+            finally:
+                self._cache_lock.release()
+
+    def start_background_refresh(self, interval=86400, incremental=True, timeout=5):
+        """
+        Same as NFLTeamStadiums.start_background_refresh, in a task on the running event loop instead of a thread.
+        Must be called from the event loop. close() stops it.
+
+        :param timeout: float(), seconds allowed for each request (default 5)
+        """
+        if interval <= 0:
+            raise ValueError(f"interval must be greater than 0, not {interval!r}")
+
+        if self._background_refresh is not None:
+            self._background_refresh.cancel()
+        self._background_refresh = asyncio.ensure_future(self._run_background_refresh_async(interval, incremental,
+                                                                                            timeout))
+
+    async def stop_background_refresh(self):
+        """
+        Stops the refreshes started by start_background_refresh. A refresh in progress is cancelled, which keeps the
+        previous data.
+        """
+        task, self._background_refresh = self._background_refresh, None
+        if task is None or task is asyncio.current_task():
+            return
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run_background_refresh_async(self, interval, incremental, timeout):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh(incremental=incremental, wait=False, timeout=timeout)
+            except Exception as e:
+                self._report_background_refresh_error(e)
+
+    async def _acquire_cache_lock_async(self, wait):
+        if self._acquire_cache_lock(wait=False):
+            return True
+        if not wait:
+            return False
+
+        self._check_print("INFO: Waiting for another process to finish scraping the stadium data.")
+        while not self._cache_lock.acquire(blocking=False):
+            await asyncio.sleep(self._cache_lock.poll_interval)
+        return True
+
+    async def get_weather_forecast_for_stadium(self, team, day, hour_start=0, hour_end=23, day_format="%Y-%m-%d",
+                                               timezone='America/New_York', stadium_name=None, output_format='dict',
+                                               timeout=5):
+        """
+        See NFLTeamStadiums.get_weather_forecast_for_stadium.
+
+        :param timeout: float(), seconds allowed for the request (default 5)
+        """
+        params, start_datetime_obj, end_datetime_obj = self._get_forecast_request(team, day, hour_start, hour_end,
+                                                                                  day_format, timezone, stadium_name,
+                                                                                  output_format)
+        weather_data = await self._get_weather_data_async(params, timeout)
+        return self._get_forecast_window(weather_data, start_datetime_obj, end_datetime_obj, output_format)
+
+    async def _get_weather_data_async(self, params, timeout):
+        """
+        Async version of _get_weather_data. Identical requests made at the same time share one task, and a location
+        that is part of a batch in flight waits for that batch.
+        """
+        cache_key = WeatherCache.make_key(params)
+        entry = self._weather_tasks.get(cache_key)
+        if entry is None:
+            entry = self._add_weather_task(self._load_weather_data_async(params, cache_key, timeout), [cache_key])
+        else:
+            self._increment('weather.coalesced')
+
+        weather_data = (await self._wait_for_weather_task(entry))[cache_key]
+        return copy.deepcopy(weather_data) if weather_data is not None else None
+
+    def _add_weather_task(self, coroutine, cache_keys):
+        """
+        Starts a weather request and registers it as the request in flight for each of cache_keys until it is done.
+
+        :param coroutine:   returns dict(), cache key -> weather data for each of cache_keys
+        :return:            list(), [task, number of callers waiting on it]
+        """
+        entry = [asyncio.ensure_future(coroutine), 0]
+        for cache_key in cache_keys:
+            self._weather_tasks[cache_key] = entry
+        entry[0].add_done_callback(lambda _: self._remove_weather_task(entry))
+        return entry
+
+    async def _wait_for_weather_task(self, entry):
+        # Shielded so one cancelled caller does not cancel the request for the others. The request itself is
+        # cancelled once every caller waiting on it is.
+        entry[1] = entry[1] + 1
+        try:
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            entry[1] = entry[1] - 1
+            if entry[1] == 0 and not entry[0].done():
+                entry[0].cancel()
+                self._remove_weather_task(entry)
+            raise
+
+    def _remove_weather_task(self, entry):
+        for cache_key in [k for k, v in self._weather_tasks.items() if v is entry]:
+            del self._weather_tasks[cache_key]
+
+    async def _load_weather_data_async(self, params, cache_key, timeout):
+        weather_data = await asyncio.to_thread(self._get_stored_weather_data, params, cache_key)
+        if weather_data is None:
+            try:
+                response = await rC.async_basic_request(self._get_session(), self._weather_url, params=params,
+                                                        timeout=timeout, instrumentation=self._instrumentation)
+            except Exception as e:
+                self._increment('weather.failures', tags={'error': type(e).__name__})
+                raise
+            weather_data = await asyncio.to_thread(self._parse_weather_response, response, cache_key, params)
+
+        return {cache_key: weather_data}
+
+    async def _get_weather_data_many_async(self, params_list, timeout, max_workers=16):
+        """
+        Async version of _get_weather_data_many. Locations with a request already in flight wait for it, and the
+        batches it requests are registered as in flight for each of their locations so concurrent callers wait for
+        them too.
+        """
+        cache_keys = [WeatherCache.make_key(x) for x in params_list]
+        params_by_key = dict(zip(cache_keys, params_list))
+        stored = await asyncio.to_thread(
+            lambda: {k: self._get_stored_weather_data(v, k) for k, v in params_by_key.items()
+                     if k not in self._weather_tasks})
+
+        # Checked once the stored weather is read, another caller may have started requesting a location meanwhile.
+        # Nothing is awaited from here until the batches are registered.
+        results = {}
+        to_request = {}
+        waiting = {}    # cache key -> entry of the task it waits for
+        for cache_key, params in params_by_key.items():
+            entry = self._weather_tasks.get(cache_key)
+            if entry is not None:
+                self._increment('weather.coalesced')
+                waiting[cache_key] = entry
+            elif stored.get(cache_key) is not None:
+                results[cache_key] = (stored[cache_key], None)
+            else:
+                to_request[cache_key] = params
+
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def load_batch(batch):
+            async with semaphore:
+                response = await rC.async_basic_request(self._get_session(), self._weather_url,
+                                                        params=self._get_weather_batch_params(batch),
+                                                        timeout=timeout, instrumentation=self._instrumentation)
+            forecasts = await asyncio.to_thread(self._parse_weather_batch_response, response, batch)
+            return dict(zip([x[0] for x in batch], forecasts))
+
+        for batch in self._get_weather_batches(to_request):
+            entry = self._add_weather_task(load_batch(batch), [x[0] for x in batch])
+            waiting.update((x[0], entry) for x in batch)
+
+        async def wait_for_task(entry, task_cache_keys):
+            try:
+                loaded = await self._wait_for_weather_task(entry)
+            except Exception as e:
+                return {x: (None, e) for x in task_cache_keys}
+            return {x: (loaded[x], None) for x in task_cache_keys}
+
+        # Each task is waited for once, however many of its locations were asked for
+        cache_keys_by_task = {}
+        for cache_key, entry in waiting.items():
+            cache_keys_by_task.setdefault(id(entry), (entry, []))[1].append(cache_key)
+
+        for loaded in await asyncio.gather(*[wait_for_task(x, y) for x, y in cache_keys_by_task.values()]):
+            results.update(loaded)
+
+        return [(copy.deepcopy(weather_data) if weather_data is not None else None, error)
+                for weather_data, error in (results[x] for x in cache_keys)]
+
+    async def get_weather_for_stadiums(self, day, teams=None, hour_start=0, hour_end=23, day_format="%Y-%m-%d",
+                                       timezone='America/New_York', output_format='dict', timeout=5):
+        """
+        See NFLTeamStadiums.get_weather_for_stadiums.
+
+        :param timeout: float(), seconds allowed for each request (default 5)
+        """
+        if teams is None:
+            teams = sorted(set(self._team_alias_index.values()))
+
+        results = await self.get_weather_for_slate([(x, day, hour_start, hour_end) for x in teams],
+                                                   day_format=day_format, timezone=timezone,
+                                                   output_format=output_format, timeout=timeout)
+        return {x['team']: x['weather'] for x in results}
+
+    async def get_weather_for_slate(self, games, day_format="%Y-%m-%d", timezone='America/New_York', max_workers=16,
+                                    output_format='dict', timeout=5):
+        """
+        See NFLTeamStadiums.get_weather_for_slate. A request that times out is reported in the 'error' of its games.
+
+        :param timeout: float(), seconds allowed for each request (default 5)
+        """
+        results, requests = self._get_slate_requests(games, day_format, timezone, output_format)
+        loaded = await self._get_weather_data_many_async([x[1][0] for x in requests], timeout,
+                                                         max_workers=max_workers)
+        self._set_slate_results(results, requests, loaded, output_format)
+        return results
+
+    async def prefetch_weather(self, start_day, end_day, teams=None, day_format="%Y-%m-%d",
+                               timezone='America/New_York', max_workers=16, timeout=5):
+        """
+        See NFLTeamStadiums.prefetch_weather.
+
+        :param timeout: float(), seconds allowed for each request (default 5)
+        """
+        locations, to_request, failed = self._get_prefetch_locations(start_day, end_day, teams, day_format, timezone)
+        loaded = await self._get_weather_data_many_async([x[0] for x in to_request], timeout,
+                                                         max_workers=max_workers)
+        self._add_prefetch_results(to_request, loaded, failed)
+        return {"locations": len(locations), "requests": len(to_request), "failed": failed}
@@ -0,0 +1,76 @@
+"""
+Guards against import time regressions. Imports nflTeamStadiums in fresh interpreters with python -X importtime,
+reports the best cumulative import time and fails if it is over --max-ms or if a heavy dependency (bs4, requests,
+urllib3, numpy) gets imported eagerly. If a stadium cache exists, loading from it and doing a lookup is checked too,
+since that path should not need the network stack either.
+
+Usage:
+    python benchmarks/importTimeBenchmark.py [--repeat 5] [--max-ms 50]
+"""
+from pathlib import Path
+import argparse
+import subprocess
+import sys
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from custom_libs import osCommon as osC
+
+HEAVY_MODULES = ['bs4', 'requests', 'urllib3', 'numpy']
+REPO_DIR = str(Path(__file__).parents[1])
+
+
+def run_python(code, *options):
+    return subprocess.run([sys.executable, *options, '-c', code], cwd=REPO_DIR, capture_output=True, text=True,
+                          check=True)
+
+
+def measure_import_ms():
+    completed = run_python('import nflTeamStadiums', '-X', 'importtime')
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = [x.strip() for x in line.split('|')]
+        if len(fields) == 3 and fields[2] == 'nflTeamStadiums':
+            return int(fields[1]) / 1000
+
+    raise RuntimeError(f"nflTeamStadiums not found in importtime output:\n{completed.stderr}")
+
+
+def get_loaded_heavy_modules(code):
+    completed = run_python(f"{code}\nimport sys\nprint(','.join(x for x in {HEAVY_MODULES!r} if x in sys.modules))")
+    loaded = completed.stdout.strip().splitlines()[-1] if completed.stdout.strip() else ''
+    return [x for x in loaded.split(',') if x]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    failures = []
+    best_ms = min(measure_import_ms() for _ in range(args.repeat))
+    print(f"import nflTeamStadiums: best of {args.repeat} = {best_ms:.1f} ms (limit {args.max_ms:.0f} ms)")
+    if best_ms > args.max_ms:
+        failures.append(f"import took {best_ms:.1f} ms")
+
+    checks = [('import', 'import nflTeamStadiums')]
+    if osC.get_file_size(osC.create_file_path_string(["resources", "parsedSoup.json"])) > 2:
+        checks.append(('cached lookup', "import nflTeamStadiums\n"
+                                        "s = nflTeamStadiums.NFLTeamStadiums(verbose=False)\n"
+                                        "s.get_stadium_by_team('DET')"))
+    else:
+        print("no stadium cache found, skipping the cached lookup check")
+
+    for name, code in checks:
+        loaded = get_loaded_heavy_modules(code)
+        print(f"heavy modules loaded after {name}: {loaded if loaded else 'none'}")
+        if loaded:
+            failures.append(f"{name} loaded {', '.join(loaded)}")
+
+    if failures:
+        sys.exit("FAILED: " + "; ".join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Offline benchmark suite for the NFLTeamStadiums hot paths. Runs against the local Wikipedia/Open-Meteo stand-in
+(benchmarks/standIn.py) with a configurable injected latency and writes the timings as a json artifact. Pass a
+previous artifact with --baseline to fail on regressions.
+
+Usage:
+    python benchmarks/runBenchmarks.py [--latency 0.05] [--repeat 5] [--output benchmarkResults.json]
+                                       [--baseline previousResults.json] [--tolerance 0.25]
+
+The artifact is written to benchmarks/benchmarkResults.json unless --output says otherwise. That file is not tracked
+by git.
+"""
+from pathlib import Path
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from custom_libs import fileCommon as fC
+from custom_libs.teamLists import city_short, long, mascots
+from nflTeamStadiums import NFLTeamStadiums
+from standIn import StandInHandler, start_stand_in
+
+SLATE_TEAMS = ['PIT', 'DET', 'KC', 'NYJ', 'NYG', 'LAR', 'LAC', 'BUF', 'CHI', 'GB', 'MIN', 'SF', 'SEA', 'ARI', 'MIA',
+               'DAL']
+
+
+def time_runs(function, repeat, setup=None):
+    """
+    :return: dict(), timing stats over repeat runs plus the average number of stand-in requests per run
+    """
+    timings = []
+    request_count = 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        requests_before = StandInHandler.request_count
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+        request_count = request_count + StandInHandler.request_count - requests_before
+
+    return {
+        "repeat": repeat,
+        "minMs": min(timings) * 1000,
+        "medianMs": statistics.median(timings) * 1000,
+        "meanMs": statistics.mean(timings) * 1000,
+        "requestsPerRun": request_count / repeat
+    }
+
+
+def run_benchmarks(base_url, cache_dir, repeat):
+    def create(**kwargs):
+        return NFLTeamStadiums(verbose=False, cache_dir=cache_dir, wiki_api_url=f"{base_url}/w/api.php",
+                               weather_api_url=f"{base_url}/v1/forecast", **kwargs)
+
+    results = {"coldConstruction": time_runs(lambda: create(use_cache=False, cache_format='binary'), repeat),
+               "warmCacheLoadJson": time_runs(lambda: create(), repeat * 10),
+               "warmCacheLoadBinary": time_runs(lambda: create(cache_format='binary'), repeat * 10)}
+
+    stadiums = create()
+    team_aliases = city_short + long + mascots
+    names = stadiums.get_list_of_stadium_names()
+
+    def lookup_teams():
+        for team in team_aliases:
+            stadiums.get_stadium_by_team(team)
+
+    def lookup_names():
+        for name in names:
+            stadiums.get_stadium_by_name(name)
+
+    def calculate_pairwise_distances():
+        for team1 in city_short:
+            for team2 in city_short:
+                stadiums.calculate_distance_between_stadiums(team1, team2)
+
+    def calculate_distance_matrix():
+        stadiums.distance_matrix()
+
+    results['teamLookups'] = time_runs(lookup_teams, repeat * 10)
+    results['teamLookups']['operations'] = len(team_aliases)
+    results['nameLookups'] = time_runs(lookup_names, repeat * 10)
+    results['nameLookups']['operations'] = len(names)
+    results['pairwiseDistances'] = time_runs(calculate_pairwise_distances, repeat)
+    results['pairwiseDistances']['operations'] = len(city_short) ** 2
+    results['distanceMatrix'] = time_runs(calculate_distance_matrix, repeat * 10,
+                                          setup=stadiums._snapshot.distance_matrices.clear)
+
+    uncached = create(weather_cache_ttl=0)
+    slate = [(x, '2024-09-08', 13, 16) for x in SLATE_TEAMS]
+    results['weatherSingleUncached'] = time_runs(
+        lambda: uncached.get_weather_forecast_for_stadium('PIT', '2024-09-08', hour_start=13, hour_end=16), repeat)
+    results['weatherSlateUncached'] = time_runs(lambda: uncached.get_weather_for_slate(slate), repeat)
+    results['weatherSlateUncached']['operations'] = len(slate)
+
+    cached = create()
+    cached.clear_weather_cache()
+    cached.get_weather_for_slate(slate)
+    results['weatherSlateCached'] = time_runs(lambda: cached.get_weather_for_slate(slate), repeat)
+    results['weatherSlateCached']['operations'] = len(slate)
+
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous and result['medianMs'] > previous['medianMs'] * (1 + tolerance):
+            regressions.append(f"{name}: {previous['medianMs']:.3f} ms -> {result['medianMs']:.3f} ms")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every stand-in response")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=str(Path(__file__).parent / 'benchmarkResults.json'))
+    parser.add_argument('--baseline', help="results json from a previous run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed median slowdown vs the baseline")
+    args = parser.parse_args()
+
+    server, base_url = start_stand_in(latency=args.latency)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            results = run_benchmarks(base_url, cache_dir, args.repeat)
+    finally:
+        server.shutdown()
+
+    artifact = {
+        "meta": {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latencySeconds": args.latency
+        },
+        "results": results
+    }
+    fC.write_content_to_file(args.output, json.dumps(artifact, indent=2))
+
+    for name, result in results.items():
+        print(f"{name:<24} median {result['medianMs']:10.3f} ms  min {result['minMs']:10.3f} ms  "
+              f"requests/run {result['requestsPerRun']:5.1f}")
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        regressions = find_regressions(results, fC.load_json_from_file(args.baseline), args.tolerance)
+        if regressions:
+            sys.exit("REGRESSIONS:\n" + "\n".join(regressions))
+        print("no regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
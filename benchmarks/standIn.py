@@ -0,0 +1,178 @@
+"""
+Local stand-in for the Wikipedia and Open-Meteo APIs used by NFLTeamStadiums, so benchmarks run offline and
+repeatably. Responses are rendered from fixtures/stadiumPages.json in the same shape the real APIs return:
+
+    GET /w/api.php?action=parse                 stadium list page html with its revid
+    GET /w/api.php?action=query&redirects=1     redirect resolution
+    GET /w/api.php?action=query&prop=...        coordinates and/or info (lastrevid) per title
+    GET /v1/forecast                            hourly forecast, one or many comma separated locations
+
+Every response waits latency seconds first to model the network round trip. With etags, Wikipedia responses carry an
+ETag and are answered 304 Not Modified when the request's If-None-Match still matches, like a caching mirror.
+"""
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import html
+import json
+import math
+import threading
+import time
+import urllib.parse
+import zlib
+
+FIXTURE_FILE = Path(__file__).parent / "fixtures" / "stadiumPages.json"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fixture = None
+    page_html = None
+    latency = 0.0
+    etags = False
+    request_count = 0
+    bytes_sent = 0
+    _count_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, conditional=False):
+        body = json.dumps(payload).encode('utf-8')
+        etag = f'"{zlib.crc32(body):08x}"' if conditional and self.etags else None
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the request, e.g., a cancelled or timed out one
+            return
+        with StandInHandler._count_lock:
+            StandInHandler.bytes_sent = StandInHandler.bytes_sent + len(body)
+
+    def do_GET(self):
+        with StandInHandler._count_lock:
+            StandInHandler.request_count = StandInHandler.request_count + 1
+        time.sleep(self.latency)
+
+        parsed = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        if parsed.path.endswith('/forecast'):
+            self._send_json(get_forecast(query))
+        elif query.get('action') == 'parse':
+            self._send_json({"parse": {"title": query.get('page'), "pageid": 1, "revid": self.fixture['revid'],
+                                       "text": {"*": self.page_html}}}, conditional=True)
+        else:
+            self._send_json(get_query(self.fixture, query), conditional=True)
+
+
+def _render_table_rows(rows, teams_header):
+    html_rows = ['<tr><th>Image</th><th>Name</th><th>Capacity</th><th>Location</th><th>Surface</th>'
+                 f'<th>Roof type</th><th>{teams_header}</th><th>Opened</th><th>Ref.</th></tr>']
+    for name, path, is_redirect, capacity, city, surface, roof, teams, opened, lat, lon in rows:
+        redirect_class = ' class="mw-redirect"' if is_redirect else ''
+        team_links = ', '.join(f'<a href="/wiki/{x.replace(" ", "_")}">{html.escape(x)}</a>' for x in teams)
+        html_rows.append(
+            f'<tr><td><a href="/wiki/File:{path}.jpg" class="mw-file-description"><img src="{path}.jpg"></a></td>'
+            f'<th scope="row"><a href="/wiki/{path}"{redirect_class} title="{html.escape(name)}">{html.escape(name)}'
+            f'</a><sup class="reference"><a href="#cite_note-1">[1]</a></sup></th><td>{capacity:,}</td>'
+            f'<td>{html.escape(city)}</td><td>{surface}</td><td>{roof}</td><td>{team_links}</td><td>{opened}</td>'
+            f'<td><sup class="reference"><a href="#cite_note-2">[2]</a></sup></td></tr>')
+
+    return ''.join(html_rows)
+
+
+def render_page_html(fixture):
+    # filler paragraphs bring the page close to the size of the real one
+    filler = ''.join(f'<p>Paragraph {i} with a <a href="/wiki/Link_{i}">link</a> and <b>some</b> more text.</p>'
+                     for i in range(300))
+    return ('<div class="mw-parser-output"><p>The National Football League stadiums...</p>' + filler +
+            '<div class="mw-heading mw-heading2"><h2 id="List_of_current_stadiums">List of current stadiums</h2>'
+            '</div><table class="wikitable"><tr><td>Key</td></tr></table>'
+            f'<table class="wikitable sortable">{_render_table_rows(fixture["currentStadiums"], "Team(s)")}</table>' +
+            filler +
+            '<div class="mw-heading mw-heading2"><h2 id="Additional_stadiums">Additional stadiums</h2></div>'
+            f'<table class="wikitable sortable">{_render_table_rows(fixture["additionalStadiums"], "Event(s)")}'
+            '</table>' + filler + '</div>')
+
+
+def get_query(fixture, query):
+    titles = [x.replace('_', ' ') for x in query.get('titles', '').split('|') if x]
+    if query.get('redirects'):
+        redirects = [{"from": x, "to": fixture['redirects'][x.replace(' ', '_')].replace('_', ' ')}
+                     for x in titles if x.replace(' ', '_') in fixture['redirects']]
+        return {"query": {"redirects": redirects, "pages": {}}}
+
+    rows_by_title = {}
+    for row in fixture['currentStadiums'] + fixture['additionalStadiums']:
+        title = urllib.parse.unquote(row[1])
+        rows_by_title[fixture['redirects'].get(title, title).replace('_', ' ')] = row
+
+    props = query.get('prop', '').split('|')
+    pages = {}
+    for i, title in enumerate(titles):
+        page = {"pageid": 100 + i, "ns": 0, "title": title}
+        if 'info' in props:
+            is_list_page = title == 'List of current NFL stadiums'
+            page['lastrevid'] = fixture['revid'] if is_list_page else zlib.crc32(title.encode('utf-8'))
+        row = rows_by_title.get(title)
+        if row and 'coordinates' in props:
+            page['coordinates'] = [{"lat": row[9], "lon": row[10], "primary": "", "globe": "earth"}]
+        pages[str(page['pageid'])] = page
+
+    return {"query": {"pages": pages}}
+
+
+def get_forecast(query):
+    # Like Open-Meteo, the times are the local times of consecutive hours, so a day with a DST change has 23 or 25
+    # of them
+    try:
+        zone = ZoneInfo(query.get('timezone') or 'UTC')
+    except (ValueError, ZoneInfoNotFoundError):
+        zone = timezone.utc
+    start = datetime.strptime(query['start_date'], '%Y-%m-%d').replace(tzinfo=zone).astimezone(timezone.utc)
+    end = (datetime.strptime(query['end_date'], '%Y-%m-%d') + timedelta(days=1)).replace(tzinfo=zone)
+    hours = int((end.astimezone(timezone.utc) - start).total_seconds() // 3600)
+    times = [(start + timedelta(hours=x)).astimezone(zone).strftime('%Y-%m-%dT%H:%M') for x in range(hours)]
+
+    forecasts = []
+    for lat, lon in zip(query['latitude'].split(','), query['longitude'].split(',')):
+        hourly = {"time": times}
+        for i, variable in enumerate(query['hourly'].split(',')):
+            hourly[variable] = [round(50 + 10 * math.sin(x / 4 + i) + float(lat) / 10, 2) for x in range(hours)]
+        forecasts.append({"latitude": float(lat), "longitude": float(lon), "timezone": query.get('timezone'),
+                          "hourly_units": {}, "hourly": hourly})
+
+    return forecasts[0] if len(forecasts) == 1 else forecasts
+
+
+def start_stand_in(latency=0.0, etags=False):
+    """
+    :param latency: float(), seconds every response is delayed by
+    :param etags:   bool(), if True, Wikipedia responses support conditional requests (see module docstring)
+    :return:        tuple(), (server, base url). Call server.shutdown() when done.
+    """
+    with open(FIXTURE_FILE, encoding='utf-8') as f:
+        StandInHandler.fixture = json.load(f)
+    StandInHandler.page_html = render_page_html(StandInHandler.fixture)
+    StandInHandler.latency = latency
+    StandInHandler.etags = etags
+    StandInHandler.request_count = 0
+    StandInHandler.bytes_sent = 0
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,92 @@
+"""
+Compares how long and how much memory it takes to get the stadium tables out of the "List of current NFL stadiums"
+page html with the targeted extraction used by NFLTeamStadiums against the previous approach of parsing the whole
+page and walking it node by node.
+
+Usage:
+    python benchmarks/tableExtractionBenchmark.py [--html path/to/page.html] [--repeat 20]
+
+By default the page html cached by NFLTeamStadiums in resources/rawSoup.txt is used, or the stand-in page rendered
+from benchmarks/fixtures when there is no cache.
+"""
+from pathlib import Path
+import argparse
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from custom_libs import requestsCommon as rC
+from custom_libs import osCommon as osC
+from custom_libs import fileCommon as fC
+from nflTeamStadiums import NFLTeamStadiums
+from standIn import FIXTURE_FILE, render_page_html
+
+SECTIONS = [('List_of_current_stadiums', 2), ('Additional_stadiums', 1)]
+
+
+def full_page_extraction(html_content):
+    soup = rC.get_soup_from_html_content(html_content)
+    str(soup)   # the previous path also serialized the full soup to rawSoup.txt
+    tables = []
+    for heading_id, table_num in SECTIONS:
+        heading = soup.find(id=heading_id)
+        tables.append(NFLTeamStadiums._find_table_under_heading(heading, table_num))
+
+    return [len(NFLTeamStadiums._get_table_rows(x)) for x in tables]
+
+
+def targeted_extraction(html_content):
+    tables = []
+    for heading_id, table_num in SECTIONS:
+        heading_found, table_element = NFLTeamStadiums._get_table_under_heading(html_content, heading_id, table_num)
+        tables.append(table_element)
+
+    return [len(NFLTeamStadiums._get_table_rows(x)) for x in tables]
+
+
+def measure(extraction, html_content, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = extraction(html_content)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    extraction(html_content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return rows, min(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--html', default=osC.create_file_path_string(["resources", "rawSoup.txt"]))
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if osC.get_file_size(args.html) > 0:
+        html_content = fC.read_file_content(args.html)
+    else:
+        print(f"no html in {args.html}, using the stand-in page")
+        html_content = render_page_html(fC.load_json_from_file(FIXTURE_FILE))
+
+    print(f"page size: {len(html_content) / 1024:.0f} KiB, parser for targeted path: {rC.get_fastest_html_parser()}")
+    results = {}
+    for name, extraction in [('full page', full_page_extraction), ('targeted', targeted_extraction)]:
+        results[name] = measure(extraction, html_content, args.repeat)
+        rows, best, peak = results[name]
+        print(f"{name:<10} rows={rows}  best={best * 1000:8.2f} ms  peak memory={peak / 1024 / 1024:7.2f} MiB")
+
+    if results['full page'][0] != results['targeted'][0]:
+        sys.exit("ERROR: the two extraction paths found different tables")
+
+    full, targeted = results['full page'], results['targeted']
+    print(f"speedup: {full[1] / targeted[1]:.1f}x  peak memory reduction: {full[2] / targeted[2]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
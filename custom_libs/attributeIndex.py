@@ -0,0 +1,86 @@
+import bisect
+
+
+class AttributeIndex:
+    """
+    Index of records by attribute value, for filters combining several attributes without scanning the records.
+
+    Every filter resolves to a bitset (an int where bit i is set for record i) and a compound filter is the
+    intersection of its bitsets:
+        categorical     value -> bitset of the records with it. Values are compared case-insensitively with runs of
+                        whitespace collapsed.
+        range           values sorted with their record positions, plus the bitset of every prefix of that order, so
+                        the records between two bounds are found with two binary searches and one xor.
+    """
+    def __init__(self, records, categorical=(), ranges=()):
+        """
+        :param records:     list(), objects with the indexed attributes
+        :param categorical: list() of str(), attributes matched by value
+        :param ranges:      list() of str(), attributes matched by range. Records where the attribute is None are left
+                            out of its index.
+        """
+        self._all = (1 << len(records)) - 1
+        self._categories = {}
+        for attribute in categorical:
+            bitsets = {}
+            for i, record in enumerate(records):
+                key = self.normalize(getattr(record, attribute))
+                bitsets[key] = bitsets.get(key, 0) | (1 << i)
+            self._categories[attribute] = bitsets
+
+        self._ranges = {}
+        for attribute in ranges:
+            pairs = sorted((getattr(x, attribute), i) for i, x in enumerate(records)
+                           if getattr(x, attribute) is not None)
+            prefixes = [0]
+            for _, i in pairs:
+                prefixes.append(prefixes[-1] | (1 << i))
+            self._ranges[attribute] = ([x[0] for x in pairs], prefixes)
+
+    @staticmethod
+    def normalize(value):
+        """
+        :return: str(), value as compared by categorical filters
+        """
+        return ' '.join(str(value).split()).casefold()
+
+    def _match_category(self, attribute, values):
+        bitsets = self._categories[attribute]
+        bits = 0
+        for value in values:
+            bits = bits | bitsets.get(self.normalize(value), 0)
+
+        return bits
+
+    def _match_range(self, attribute, low, high):
+        values, prefixes = self._ranges[attribute]
+        start = 0 if low is None else bisect.bisect_left(values, low)
+        end = len(values) if high is None else bisect.bisect_right(values, high)
+        if start >= end:
+            return 0
+
+        return prefixes[end] ^ prefixes[start]
+
+    def select(self, categories=None, ranges=None):
+        """
+        :param categories:  dict(), categorical attribute -> list() of accepted values (any of them matches)
+        :param ranges:      dict(), range attribute -> tuple() (low, high), inclusive. None leaves that end open.
+        :return:            list() of int(), positions of the records matching every filter, in record order
+        """
+        bits = self._all
+        for attribute, values in (categories or {}).items():
+            bits = bits & self._match_category(attribute, values)
+            if not bits:
+                return []
+        for attribute, (low, high) in (ranges or {}).items():
+            bits = bits & self._match_range(attribute, low, high)
+            if not bits:
+                return []
+
+        positions = []
+        while bits:
+            lowest = bits & -bits
+            positions.append(lowest.bit_length() - 1)
+            bits = bits ^ lowest
+
+        return positions
@@ -1,8 +1,33 @@
+import contextlib
 import json
+import os
+import threading
 
 
-def write_json_string_to_file(fpath, jayson):
-    with open(fpath, 'w') as f:
+@contextlib.contextmanager
+def _open_for_atomic_write(fpath, encoding=None, fsync=False):
+    """
+    Writes to a temporary file next to fpath and renames it over fpath once the write completed, so other threads and
+    processes only ever read the previous or the new complete file, never a partial one. With fsync, the data is also
+    on disk before the rename, so the file survives a power loss or OS crash. That costs a disk flush per write, so it
+    is left to files that are expensive to rebuild.
+    """
+    temp_path = f"{fpath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding=encoding) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, fpath)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+
+def write_json_string_to_file(fpath, jayson, fsync=False):
+    with _open_for_atomic_write(fpath, fsync=fsync) as f:
         f.writelines(jayson)
 
 
@@ -16,13 +41,13 @@ def load_json_from_file(fpath):
     return op_json
 
 
-def dump_json_to_file(fpath, jayson_dict_or_list_of_dicts):
-    with open(fpath, 'w') as f:
+def dump_json_to_file(fpath, jayson_dict_or_list_of_dicts, fsync=False):
+    with _open_for_atomic_write(fpath, fsync=fsync) as f:
         json.dump(jayson_dict_or_list_of_dicts, f)
 
 
-def write_content_to_file(f_name, content):
-    with open(f_name, 'w', encoding='utf-8') as f:
+def write_content_to_file(f_name, content, fsync=False):
+    with _open_for_atomic_write(f_name, encoding='utf-8', fsync=fsync) as f:
         f.write(content)
 
 
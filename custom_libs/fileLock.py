@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _try_lock(fd, shared):
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBRLCK if shared else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(fd, shared):
+        try:
+            fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class FileLock:
+    """
+    Exclusive lock shared by every process (and thread) that uses the same lock file. It is held by the operating
+    system rather than by the file's existence, so a process that dies while holding it releases it. Readers can take
+    it shared instead, so they only exclude the exclusive holder.
+    """
+    def __init__(self, fpath, poll_interval=0.05):
+        """
+        :param fpath:           str(), lock file. Created on first use, its directory must exist.
+        :param poll_interval:   float(), seconds between attempts while waiting for the lock
+        """
+        self.fpath = fpath
+        self.poll_interval = poll_interval
+        self._fd = None
+        self._thread_lock = threading.Lock()
+
+    def acquire(self, blocking=True, timeout=None, shared=False):
+        """
+        :param blocking:    bool(), if False, gives up right away when another process or thread holds the lock
+        :param timeout:     float(), optional. Seconds to wait for the lock before giving up.
+        :param shared:      bool(), if True, other processes can hold it shared at the same time, only an exclusive
+                            holder is waited for. A lock file that cannot be opened for writing, e.g., in a read only
+                            directory, is opened read only.
+        :return:            bool(), True if the lock was acquired. Raises OSError if the lock file cannot be opened,
+                            e.g., it does not exist and cannot be created.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._thread_lock.acquire(blocking, -1 if timeout is None or not blocking else timeout):
+            return False
+
+        try:
+            fd = self._open(shared)
+        except OSError:
+            self._thread_lock.release()
+            raise
+
+        while not _try_lock(fd, shared):
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                os.close(fd)
+                self._thread_lock.release()
+                return False
+            time.sleep(self.poll_interval)
+
+        self._fd = fd
+        return True
+
+    def _open(self, shared):
+        try:
+            return os.open(self.fpath, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            if not shared:
+                raise
+            return os.open(self.fpath, os.O_RDONLY)
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
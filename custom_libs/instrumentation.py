@@ -0,0 +1,170 @@
+from collections import defaultdict
+import functools
+import threading
+import time
+
+
+# Same as inspect.CO_GENERATOR, inspect itself is slow to import
+_CO_GENERATOR = 0x20
+
+
+class Instrumentation:
+    """
+    Hook surface for metrics and tracing. Subclass it and override what you need to forward counters, histogram
+    observations and spans to your metrics or tracing system. Every method is a no-op here.
+
+    Pass an instance as the instrumentation parameter of NFLTeamStadiums or requestsCommon.basic_request. When no
+    instance is passed, nothing is measured at all.
+    """
+    def increment(self, name, value=1, tags=None):
+        """
+        :param name:    str(), counter name e.g., http.requests
+        :param value:   int(), amount to add
+        :param tags:    dict(), optional labels e.g., {'host': 'en.wikipedia.org'}
+        """
+        pass
+
+    def observe(self, name, value, tags=None):
+        """
+        :param name:    str(), histogram name e.g., http.response_bytes
+        :param value:   float(), observed value
+        :param tags:    dict(), optional labels
+        """
+        pass
+
+    def span_start(self, name, tags=None):
+        """
+        Called when a timed operation starts.
+
+        :param name:    str(), span name e.g., refresh.coordinates
+        :param tags:    dict(), optional labels
+        """
+        pass
+
+    def span_end(self, name, duration, error=None, tags=None):
+        """
+        Called when a timed operation ends.
+
+        :param name:        str(), span name
+        :param duration:    float(), seconds the operation took
+        :param error:       str(), name of the exception that ended the span, None if it succeeded
+        :param tags:        dict(), optional labels
+        """
+        pass
+
+
+class InMemoryInstrumentation(Instrumentation):
+    """
+    Instrumentation that keeps everything in memory. Useful for debugging, benchmarks and periodic log dumps.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(int)
+        self.histograms = defaultdict(list)
+        self.span_errors = defaultdict(int)
+
+    @staticmethod
+    def _get_key(name, tags):
+        if not tags:
+            return name
+        return name + '{' + ','.join(f"{k}={v}" for k, v in sorted(tags.items())) + '}'
+
+    def increment(self, name, value=1, tags=None):
+        with self._lock:
+            self.counters[self._get_key(name, tags)] += value
+
+    def observe(self, name, value, tags=None):
+        with self._lock:
+            self.histograms[self._get_key(name, tags)].append(value)
+
+    def span_end(self, name, duration, error=None, tags=None):
+        with self._lock:
+            self.histograms[f"{name}.seconds"].append(duration)
+            if error:
+                self.span_errors[name] += 1
+
+    def get_summary(self):
+        """
+        :return: dict(), counters, span error counts and count/total/min/max/mean for every histogram
+        """
+        with self._lock:
+            histograms = {}
+            for name, values in self.histograms.items():
+                histograms[name] = {
+                    "count": len(values),
+                    "total": sum(values),
+                    "min": min(values),
+                    "max": max(values),
+                    "mean": sum(values) / len(values)
+                }
+
+            return {"counters": dict(self.counters), "spanErrors": dict(self.span_errors), "histograms": histograms}
+
+
+class _Span:
+    __slots__ = ('_instrumentation', '_name', '_tags', '_start')
+
+    def __init__(self, instrumentation, name, tags):
+        self._instrumentation = instrumentation
+        self._name = name
+        self._tags = tags
+        self._start = None
+
+    def __enter__(self):
+        self._instrumentation.span_start(self._name, self._tags)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self._start
+        error = exc_type.__name__ if exc_type else None
+        self._instrumentation.span_end(self._name, duration, error=error, tags=self._tags)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+def span(instrumentation, name, tags=None):
+    """
+    :return: context manager that reports the enclosed block as a span to instrumentation. A shared no-op when
+             instrumentation is None.
+    """
+    if instrumentation is None:
+        return _null_span
+    return _Span(instrumentation, name, tags)
+
+
+def traced(name):
+    """
+    Method decorator that reports every call as a span to the instance's _instrumentation, if it has one. For
+    generator methods the span lasts from the first resume until the generator finishes.
+    """
+    def decorator(method):
+        if method.__code__.co_flags & _CO_GENERATOR:
+            @functools.wraps(method)
+            def generator_wrapper(self, *args, **kwargs):
+                if self._instrumentation is None:
+                    return (yield from method(self, *args, **kwargs))
+                with _Span(self._instrumentation, name, None):
+                    return (yield from method(self, *args, **kwargs))
+            return generator_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self._instrumentation is None:
+                return method(self, *args, **kwargs)
+            with _Span(self._instrumentation, name, None):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,9 +1,8 @@
 import os
-from pathlib import Path
 
 
 def create_file_path_string(list_of_dir):
-    dir_path = Path(__file__).parents[1]
+    dir_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
     for item in list_of_dir:
         dir_path = os.path.join(dir_path, item)
@@ -31,8 +30,25 @@ def check_if_dir_exists(dir_to_check):
 
 
 def create_dir(dir_to_create):
-    os.mkdir(dir_to_create)
+    os.makedirs(dir_to_create, exist_ok=True)
 
 
 def check_if_file_exists(file_to_check):
     return os.path.isfile(file_to_check)
+
+
+def get_file_size(file_to_check):
+    try:
+        return os.stat(file_to_check).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def get_file_modified_time(file_to_check):
+    """
+    :return: int(), last modification time in nanoseconds, None if the file does not exist
+    """
+    try:
+        return os.stat(file_to_check).st_mtime_ns
+    except FileNotFoundError:
+        return None
@@ -1,12 +1,117 @@
-from bs4 import BeautifulSoup as bS
-import requests
+from custom_libs import instrumentation as inst
+import threading
+import json
+import urllib.parse
 
+# bs4, requests and aiohttp are imported on first use so importing this module stays cheap when everything is served
+# from cache
 
-def get_soup_from_html_content(html_content):
-    return bS(html_content, 'html.parser')
+# One pooled session per host, created on first use. Tune with configure_sessions.
+_sessions = {}
+_sessions_lock = threading.Lock()
+_session_config = {
+    "pool_size": 16,
+    "max_retries": 3,
+    "backoff_factor": 0.5,
+    "retry_statuses": (429, 500, 502, 503, 504)
+}
 
 
-def basic_request(url, request_type="GET", timeout=5, **kwargs):
+def get_soup_from_html_content(html_content, parser='html.parser'):
+    from bs4 import BeautifulSoup as bS
+    return bS(html_content, parser)
+
+
+def get_fastest_html_parser():
+    """
+    :return: str(), 'lxml' if it is installed, otherwise the built-in 'html.parser'
+    """
+    try:
+        import lxml
+        return 'lxml'
+    except ImportError:
+        return 'html.parser'
+
+
+def configure_sessions(pool_size=None, max_retries=None, backoff_factor=None, retry_statuses=None):
+    """
+    Changes how the pooled sessions used by basic_request are built. Existing sessions are closed so the new settings
+    apply to every following request.
+
+    :param pool_size:       int(), connections kept open per host (default 16)
+    :param max_retries:     int(), retries for connection errors and retry_statuses (default 3)
+    :param backoff_factor:  float(), exponential backoff between retries: backoff_factor * 2 ** (retry - 1) seconds
+                            (default 0.5). A Retry-After header from the server takes precedence.
+    :param retry_statuses:  tuple() of int(), HTTP statuses that are retried (default 429 and 5xx)
+    """
+    with _sessions_lock:
+        if pool_size is not None:
+            _session_config['pool_size'] = pool_size
+        if max_retries is not None:
+            _session_config['max_retries'] = max_retries
+        if backoff_factor is not None:
+            _session_config['backoff_factor'] = backoff_factor
+        if retry_statuses is not None:
+            _session_config['retry_statuses'] = tuple(retry_statuses)
+
+        _close_sessions()
+
+
+def close_sessions():
+    """
+    Closes every pooled session and its connections. The next request opens a new session.
+    """
+    with _sessions_lock:
+        _close_sessions()
+
+
+def _close_sessions():
+    for session in _sessions.values():
+        session.close()
+    _sessions.clear()
+
+
+def _create_session():
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    import requests
+
+    retry = Retry(total=_session_config['max_retries'],
+                  backoff_factor=_session_config['backoff_factor'],
+                  status_forcelist=_session_config['retry_statuses'],
+                  respect_retry_after_header=True,
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_session_config['pool_size'], max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(url):
+    """
+    :param url: str(), url the session will be used for
+    :return:    requests.Session(), pooled session with retries for the url's host
+    """
+    host = urllib.parse.urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _create_session()
+                _sessions[host] = session
+
+    return session
+
+
+def basic_request(url, request_type="GET", timeout=5, instrumentation=None, **kwargs):
+    """
+    :param instrumentation: custom_libs.instrumentation.Instrumentation(), optional. Receives an http.request span,
+                            http.requests / http.errors counters and an http.response_bytes histogram, tagged with
+                            the host and status.
+    """
     request_type = request_type
     headers = {}
     params = {}
@@ -17,13 +122,154 @@ def basic_request(url, request_type="GET", timeout=5, **kwargs):
     if 'params' in kwargs:
         params = kwargs['params']
 
+    session = get_session(url)
+    if instrumentation is None:
+        return _send_request(session, url, request_type, headers, params, timeout)
+
+    tags = {'host': urllib.parse.urlsplit(url).netloc}
+    with inst.span(instrumentation, 'http.request', tags):
+        try:
+            response = _send_request(session, url, request_type, headers, params, timeout)
+        except Exception as e:
+            instrumentation.increment('http.errors', tags={**tags, 'error': type(e).__name__})
+            raise
+
+    _record_response(instrumentation, tags, response)
+    return response
+
+
+def _send_request(session, url, request_type, headers, params, timeout):
     if request_type == "GET":
-        return requests.request(request_type, url, headers=headers, params=params, timeout=timeout)
+        return session.request(request_type, url, headers=headers, params=params, timeout=timeout)
     else:
-        return requests.post(url, headers=headers, data=params, timeout=timeout)
+        return session.post(url, headers=headers, data=params, timeout=timeout)
+
+
+def _record_response(instrumentation, tags, response):
+    tags['status'] = response.status_code
+    instrumentation.increment('http.requests', tags=tags)
+    instrumentation.observe('http.response_bytes', len(response.content), tags={'host': tags['host']})
+    if response.status_code >= 400:
+        instrumentation.increment('http.errors', tags=tags)
 
 
+def get_validators(response):
+    """
+    :param response:    requests.Response() or BufferedResponse()
+    :return:            dict(), 'etag' and/or 'lastModified' from the response headers. Empty if the server sent neither,
+                        so the response cannot be requested conditionally.
+    """
+    validators = {}
+    if response.headers.get('ETag'):
+        validators['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        validators['lastModified'] = response.headers['Last-Modified']
 
+    return validators
 
 
+def get_conditional_headers(validators):
+    """
+    :param validators:  dict(), from get_validators
+    :return:            dict(), If-None-Match / If-Modified-Since headers. The server answers 304 without a body if the
+                        resource did not change since the validators were taken.
+    """
+    headers = {}
+    if 'etag' in validators:
+        headers['If-None-Match'] = validators['etag']
+    if 'lastModified' in validators:
+        headers['If-Modified-Since'] = validators['lastModified']
+
+    return headers
+
+
+class BufferedResponse:
+    """
+    Response whose content was read in full, with the parts of requests.Response the rest of the code uses. Returned by
+    async_basic_request, and used to serve a stored copy in place of a 304 Not Modified.
+    """
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def create_async_session():
+    """
+    Async counterpart of get_session. Unlike the pooled sessions it is not shared, create it inside the running event
+    loop and close it when done.
+
+    :return: aiohttp.ClientSession(), keeping up to pool_size connections open per host (see configure_sessions)
+    """
+    import aiohttp
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=_session_config['pool_size']))
+
+
+async def async_basic_request(session, url, request_type="GET", timeout=5, instrumentation=None, **kwargs):
+    """
+    Async counterpart of basic_request. Connection errors, timeouts and retry statuses are retried the same way as
+    with the pooled sessions (see configure_sessions). Cancelling the calling task cancels the request.
+
+    :param session:         aiohttp.ClientSession(), from create_async_session
+    :param timeout:         float(), seconds allowed for each attempt
+    :param instrumentation: custom_libs.instrumentation.Instrumentation(), optional. See basic_request.
+    :return:                BufferedResponse()
+    """
+    headers = kwargs.get('headers', {})
+    params = kwargs.get('params', {})
+    request_type = kwargs.get('type', request_type)
+
+    if instrumentation is None:
+        return await _send_async_request_with_retries(session, url, request_type, headers, params, timeout)
+
+    tags = {'host': urllib.parse.urlsplit(url).netloc}
+    with inst.span(instrumentation, 'http.request', tags):
+        try:
+            response = await _send_async_request_with_retries(session, url, request_type, headers, params, timeout)
+        except Exception as e:
+            instrumentation.increment('http.errors', tags={**tags, 'error': type(e).__name__})
+            raise
+
+    _record_response(instrumentation, tags, response)
+    return response
+
+
+async def _send_async_request_with_retries(session, url, request_type, headers, params, timeout):
+    import aiohttp
+    import asyncio
+
+    max_retries = _session_config['max_retries']
+    for retry in range(max_retries + 1):
+        try:
+            response = await _send_async_request(session, url, request_type, headers, params, timeout)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if retry == max_retries:
+                raise
+            await asyncio.sleep(_session_config['backoff_factor'] * 2 ** retry)
+            continue
+
+        if response.status_code not in _session_config['retry_statuses'] or retry == max_retries:
+            return response
+
+        delay = _session_config['backoff_factor'] * 2 ** retry
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            delay = int(retry_after)
+        await asyncio.sleep(delay)
+
+
+async def _send_async_request(session, url, request_type, headers, params, timeout):
+    import aiohttp
+
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    if request_type == "GET":
+        request = session.request(request_type, url, headers=headers, params=params, timeout=client_timeout)
+    else:
+        request = session.post(url, headers=headers, data=params, timeout=client_timeout)
 
+    async with request as response:
+        return BufferedResponse(str(response.url), response.status, response.headers, await response.read())
@@ -0,0 +1,89 @@
+import heapq
+import re
+import unicodedata
+
+
+class TrigramIndex:
+    """
+    Fuzzy text index. Every string is normalized (lowercase, accents and punctuation removed) and split into
+    trigrams, so "Mercedes Benz Stadium" matches "Mercedes-Benz Stadium" and "Arrowhead" matches "GEHA Field at
+    Arrowhead Stadium". Only strings sharing at least one trigram with the query are scored.
+
+    The score of a match is the mean of two trigram ratios, so it falls between 0 and 1 and is 1 for an exact match:
+        containment     shared trigrams / query trigrams, high when the query is part of the string
+        similarity      shared trigrams / trigrams in either, high when the query and the string are alike
+    """
+    _non_alphanumeric_pattern = re.compile(r'[^a-z0-9]+')
+
+    def __init__(self, entries):
+        """
+        :param entries: list() of tuple(), (text, key) for every string to index. key is returned with results and
+                        must be hashable. Give one key several strings (e.g., a name and its aliases) to match on
+                        any of them.
+        """
+        self._texts = []
+        self._keys = []
+        self._trigram_counts = []
+        self._postings = {}
+        for text, key in entries:
+            trigrams = self._get_trigrams(text)
+            if not trigrams:
+                continue
+
+            entry = len(self._texts)
+            self._texts.append(text)
+            self._keys.append(key)
+            self._trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self._postings.setdefault(trigram, []).append(entry)
+
+    def __len__(self):
+        return len(self._texts)
+
+    @classmethod
+    def normalize(cls, text):
+        """
+        :return: str(), text lowercased with accents removed and every run of punctuation or whitespace replaced by
+                 one space
+        """
+        text = unicodedata.normalize('NFKD', text.lower())
+        text = ''.join(x for x in text if not unicodedata.combining(x))
+        return cls._non_alphanumeric_pattern.sub(' ', text).strip()
+
+    @classmethod
+    def _get_trigrams(cls, text):
+        trigrams = set()
+        for word in cls.normalize(text).split():
+            padded = f"  {word} "
+            trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+
+        return trigrams
+
+    def search(self, query, limit=5, min_score=0.3):
+        """
+        :param query:       str(), text to look up
+        :param limit:       int(), maximum number of keys returned
+        :param min_score:   float(), matches scoring lower are dropped
+
+        :return:            list() of tuple(), (score, text, key) best first with one result per key, scored by its
+                            best matching string
+        """
+        trigrams = self._get_trigrams(query)
+        if not trigrams:
+            return []
+
+        shared_counts = {}
+        for trigram in trigrams:
+            for entry in self._postings.get(trigram, ()):
+                shared_counts[entry] = shared_counts.get(entry, 0) + 1
+
+        best = {}
+        for entry, shared in shared_counts.items():
+            containment = shared / len(trigrams)
+            similarity = shared / (len(trigrams) + self._trigram_counts[entry] - shared)
+            score = (containment + similarity) / 2
+            key = self._keys[entry]
+            if score >= min_score and (key not in best or score > best[key][0]):
+                best[key] = (score, self._texts[entry], key)
+
+        return heapq.nlargest(limit, best.values(), key=lambda x: x[0])
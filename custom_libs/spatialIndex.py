@@ -0,0 +1,106 @@
+import heapq
+import math
+
+
+class SpatialIndex:
+    """
+    KD-tree over points on the earth. Each latitude/longitude is converted to a 3D unit vector so plain euclidean
+    (chord) distance can be used for the tree, and chord distance orders points exactly like great-circle distance.
+    Results are converted back to great-circle miles.
+    """
+    def __init__(self, points, radius=3958.8):
+        """
+        :param points:  list() of tuple(), (lat, lon, item) for every point to index. item is returned with results.
+        :param radius:  float(), radius of the earth in the unit results should use (default miles)
+        """
+        self.radius = radius
+        self._items = [x[2] for x in points]
+        self._vectors = [self._to_unit_vector(x[0], x[1]) for x in points]
+        self._root = self._build(list(range(len(points))), 0)
+
+    def __len__(self):
+        return len(self._items)
+
+    @staticmethod
+    def _to_unit_vector(lat, lon):
+        lat, lon = math.radians(lat), math.radians(lon)
+        cos_lat = math.cos(lat)
+        return cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat)
+
+    def _build(self, indices, depth):
+        # node: (point index, split axis, left node, right node)
+        if not indices:
+            return None
+
+        axis = depth % 3
+        indices.sort(key=lambda x: self._vectors[x][axis])
+        median = len(indices) // 2
+        return (indices[median], axis, self._build(indices[:median], depth + 1),
+                self._build(indices[median + 1:], depth + 1))
+
+    def _chord_to_distance(self, chord_squared):
+        return 2 * self.radius * math.asin(min(1.0, math.sqrt(chord_squared) / 2))
+
+    def _distance_to_chord_squared(self, distance):
+        if distance >= math.pi * self.radius:
+            return 4.0
+        return (2 * math.sin(distance / self.radius / 2)) ** 2
+
+    def nearest(self, lat, lon, k=1):
+        """
+        :return: list() of tuple(), (distance, item) for the k closest points, closest first. Empty if k < 1.
+        """
+        if k < 1:
+            return []
+
+        query = self._to_unit_vector(lat, lon)
+        heap = []   # max heap on distance via negated chord, holds the best k found so far
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+
+            index, axis, left, right = node
+            vector = self._vectors[index]
+            chord_squared = (vector[0] - query[0]) ** 2 + (vector[1] - query[1]) ** 2 + (vector[2] - query[2]) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-chord_squared, index))
+            elif chord_squared < -heap[0][0]:
+                heapq.heapreplace(heap, (-chord_squared, index))
+
+            axis_distance = query[axis] - vector[axis]
+            near, far = (left, right) if axis_distance < 0 else (right, left)
+            # far side is only worth visiting if the splitting plane is closer than the current kth best
+            if len(heap) < k or axis_distance ** 2 < -heap[0][0]:
+                stack.append(far)
+            stack.append(near)
+
+        return [(self._chord_to_distance(-x[0]), self._items[x[1]]) for x in sorted(heap, reverse=True)]
+
+    def within(self, lat, lon, distance):
+        """
+        :return: list() of tuple(), (distance, item) for every point within distance, closest first
+        """
+        query = self._to_unit_vector(lat, lon)
+        max_chord_squared = self._distance_to_chord_squared(distance)
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+
+            index, axis, left, right = node
+            vector = self._vectors[index]
+            chord_squared = (vector[0] - query[0]) ** 2 + (vector[1] - query[1]) ** 2 + (vector[2] - query[2]) ** 2
+            if chord_squared <= max_chord_squared:
+                found.append((chord_squared, index))
+
+            axis_distance = query[axis] - vector[axis]
+            if axis_distance <= 0 or axis_distance ** 2 <= max_chord_squared:
+                stack.append(left)
+            if axis_distance >= 0 or axis_distance ** 2 <= max_chord_squared:
+                stack.append(right)
+
+        return [(self._chord_to_distance(x[0]), self._items[x[1]]) for x in sorted(found)]
@@ -0,0 +1,314 @@
+"""
+SQLite storage for the parsed stadium data and a history of weather forecasts.
+
+Tables:
+    stadiums            one row per stadium with its coordinates, id is the stadium's position in the data
+    stadium_teams       teams and currentTeams of each stadium
+    weather_snapshots   every forecast received from Open Meteo with the time it was received, indexed by location
+                        and time
+
+The stadium tables are only ever read whole, so they have no indexes besides their primary keys. The database is in
+WAL mode so any number of processes can read it while one writes. Each thread gets its own connection. Weather
+snapshots can be queued to a writer thread, so recording them never makes the caller wait for another process's
+write.
+"""
+from custom_libs.stadiumRecord import Stadium, Coordinates
+from collections.abc import Sequence
+import json
+import threading
+import time
+
+
+SCHEMA_VERSION = 2
+
+_schema = """
+CREATE TABLE IF NOT EXISTS stadiums (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    capacity INTEGER,
+    img_url TEXT,
+    city TEXT,
+    surface TEXT,
+    roof_type TEXT,
+    year_opened INTEGER,
+    shared_stadium INTEGER NOT NULL,
+    lat REAL,
+    lon REAL,
+    coordinates_primary TEXT,
+    globe TEXT
+);
+CREATE TABLE IF NOT EXISTS stadium_teams (
+    stadium_id INTEGER NOT NULL REFERENCES stadiums (id),
+    is_current INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    team TEXT NOT NULL,
+    PRIMARY KEY (stadium_id, is_current, position)
+);
+CREATE TABLE IF NOT EXISTS weather_snapshots (
+    id INTEGER PRIMARY KEY,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    timezone TEXT,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    weather TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS weather_snapshots_location ON weather_snapshots (latitude, longitude, fetched_at);
+"""
+
+
+class SqliteStadiumList(Sequence):
+    """
+    Read only list of Stadium records read from the database in one query, so it is a consistent snapshot even if
+    another process rewrites the stadiums afterwards. Each record is built from its row the first time it is accessed.
+    """
+    def __init__(self, rows, teams):
+        """
+        :param rows:    list() of tuple(), stadiums rows in id order
+        :param teams:   dict(), (stadium id, is_current) -> list() of str() teams in order
+        """
+        self._rows = rows
+        self._teams = teams
+        self._records = [None] * len(rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._rows)))]
+
+        record = self._records[index]
+        if record is None:
+            record = self._decode_record(self._rows[index])
+            self._records[index] = record
+
+        return record
+
+    def __eq__(self, other):
+        if isinstance(other, (list, SqliteStadiumList)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def _decode_record(self, row):
+        (stadium_id, name, capacity, img_url, city, surface, roof_type, year_opened, shared_stadium, lat, lon,
+         primary, globe) = row
+        coordinates = None if lat is None else Coordinates(lat, lon, primary, globe)
+        return Stadium(name, capacity, img_url, city, surface, roof_type, self._teams.get((stadium_id, 0), []),
+                       year_opened, bool(shared_stadium), self._teams.get((stadium_id, 1), []), coordinates)
+
+
+class SqliteStore:
+    """
+    Stadium data and weather history in one SQLite database file.
+    """
+    def __init__(self, fpath, timeout=30):
+        """
+        :param fpath:   str(), database file. Created with its tables on first use, its directory must exist.
+        :param timeout: float(), seconds to wait for another process's write to finish before giving up
+        """
+        self.fpath = fpath
+        self.timeout = timeout
+        self._local = threading.local()
+
+        # Weather snapshots waiting for the writer thread, which runs while there are any
+        self._queued_snapshots = []
+        self._writer = None
+        self._writer_done = threading.Condition()
+
+    def _get_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # sqlite3 is only imported when the sqlite cache format is used
+            import sqlite3
+
+            connection = sqlite3.connect(self.fpath, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            if connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                self._create_schema(connection)
+            self._local.connection = connection
+
+        return connection
+
+    @staticmethod
+    def _create_schema(connection):
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            # Checked again now that no other process can be creating it at the same time
+            version = connection.execute('PRAGMA user_version').fetchone()[0]
+            if version == 1:
+                # Version 2 only dropped the unused stadium indexes, so the weather history is kept
+                connection.execute('DROP INDEX IF EXISTS stadiums_name')
+                connection.execute('DROP INDEX IF EXISTS stadium_teams_team')
+                connection.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+            elif version != SCHEMA_VERSION:
+                for table in ['stadium_teams', 'stadiums', 'weather_snapshots']:
+                    connection.execute(f'DROP TABLE IF EXISTS {table}')
+                for statement in _schema.split(';'):
+                    if statement.strip():
+                        connection.execute(statement)
+                connection.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def close(self):
+        """
+        Closes the calling thread's connection. Other threads' connections are closed when the threads end.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def write_stadiums(self, stadiums):
+        """
+        Replaces every stored stadium in one transaction, so readers see either the previous or the new stadiums.
+
+        :param stadiums: list() of Stadium() or dict(), stadium data as built by NFLTeamStadiums
+        """
+        stadium_rows = []
+        team_rows = []
+        for i, stadium in enumerate(stadiums):
+            coordinates = stadium.get('coordinates')
+            lat, lon, primary, globe = None, None, None, None
+            if coordinates:
+                lat, lon = coordinates['lat'], coordinates['lon']
+                primary, globe = coordinates.get('primary', ''), coordinates.get('globe', 'earth')
+
+            stadium_rows.append((i, stadium['name'], stadium['capacity'], stadium['imgUrl'], stadium['city'],
+                                 stadium['surface'], stadium['roofType'], stadium['yearOpened'],
+                                 int(bool(stadium.get('sharedStadium', False))), lat, lon, primary, globe))
+            team_rows.extend((i, 0, position, x) for position, x in enumerate(stadium['teams']))
+            team_rows.extend((i, 1, position, x) for position, x in enumerate(stadium.get('currentTeams', [])))
+
+        connection = self._get_connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DELETE FROM stadium_teams')
+            connection.execute('DELETE FROM stadiums')
+            connection.executemany('INSERT INTO stadiums VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', stadium_rows)
+            connection.executemany('INSERT INTO stadium_teams VALUES (?, ?, ?, ?)', team_rows)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def load_stadiums(self):
+        """
+        :return: SqliteStadiumList(), None if no stadiums are stored
+        """
+        connection = self._get_connection()
+        connection.execute('BEGIN')
+        try:
+            rows = connection.execute('SELECT * FROM stadiums ORDER BY id').fetchall()
+            team_rows = connection.execute('SELECT stadium_id, is_current, team FROM stadium_teams '
+                                           'ORDER BY stadium_id, is_current, position').fetchall()
+        finally:
+            connection.execute('COMMIT')
+
+        if not rows:
+            return None
+
+        teams = {}
+        for stadium_id, is_current, team in team_rows:
+            teams.setdefault((stadium_id, is_current), []).append(team)
+
+        return SqliteStadiumList(rows, teams)
+
+    @staticmethod
+    def _round_coordinate(value):
+        # Same precision as the weather cache keys, so float noise does not split a location's history
+        return round(float(value), 4)
+
+    def add_weather_snapshots(self, snapshots, fetched_at=None):
+        """
+        :param snapshots:   list() of tuple(), (Open Meteo API parameters of a single location, forecast received for
+                            them)
+        :param fetched_at:  float(), unix time the forecasts were received (default now)
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        rows = [(self._round_coordinate(params['latitude']), self._round_coordinate(params['longitude']),
+                 params.get('timezone'), params['start_date'], params['end_date'], fetched_at,
+                 json.dumps(weather_data)) for params, weather_data in snapshots]
+
+        connection = self._get_connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('INSERT INTO weather_snapshots (latitude, longitude, timezone, start_date, '
+                                   'end_date, fetched_at, weather) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def queue_weather_snapshots(self, snapshots, on_error=None):
+        """
+        Same as add_weather_snapshots, but the snapshots are written by a writer thread and this returns right away.
+        Use flush to wait for them to be written.
+
+        :param snapshots:   list() of tuple(), see add_weather_snapshots. Received now.
+        :param on_error:    function, optional. Called from the writer thread with the Exception() of a failed write.
+        """
+        with self._writer_done:
+            self._queued_snapshots.append((snapshots, time.time(), on_error))
+            if self._writer is None:
+                # Not a daemon, so snapshots queued right before the interpreter exits are still written
+                self._writer = threading.Thread(target=self._write_queued_snapshots, name='SqliteStore writer')
+                self._writer.start()
+
+    def _write_queued_snapshots(self):
+        while True:
+            with self._writer_done:
+                queued, self._queued_snapshots = self._queued_snapshots, []
+                if not queued:
+                    self.close()
+                    self._writer = None
+                    self._writer_done.notify_all()
+                    return
+
+            for snapshots, fetched_at, on_error in queued:
+                try:
+                    self.add_weather_snapshots(snapshots, fetched_at=fetched_at)
+                except Exception as e:
+                    if on_error is not None:
+                        on_error(e)
+
+    def flush(self):
+        """
+        Waits until the snapshots queued so far are written, or failed to be.
+        """
+        with self._writer_done:
+            while self._writer is not None and self._writer is not threading.current_thread():
+                self._writer_done.wait()
+
+    def get_weather_snapshots(self, lat, lon, start=None, end=None, forecast_date=None):
+        """
+        :param lat:             float(), latitude of the location
+        :param lon:             float(), longitude of the location
+        :param start:           float(), optional. Unix time, only snapshots received at or after it
+        :param end:             float(), optional. Unix time, only snapshots received at or before it
+        :param forecast_date:   str(), optional. %Y-%m-%d day the forecast has to cover
+
+        :return:                list() of dict(), oldest first: 'fetchedAt' (unix time), 'startDate', 'endDate',
+                                'timezone' and 'weather'
+        """
+        query = ('SELECT fetched_at, start_date, end_date, timezone, weather FROM weather_snapshots '
+                 'WHERE latitude = ? AND longitude = ?')
+        args = [self._round_coordinate(lat), self._round_coordinate(lon)]
+        if start is not None:
+            query = query + ' AND fetched_at >= ?'
+            args.append(start)
+        if end is not None:
+            query = query + ' AND fetched_at <= ?'
+            args.append(end)
+        if forecast_date is not None:
+            query = query + ' AND start_date <= ? AND end_date >= ?'
+            args.extend([forecast_date, forecast_date])
+
+        rows = self._get_connection().execute(query + ' ORDER BY fetched_at', args).fetchall()
+        return [{"fetchedAt": fetched_at, "startDate": start_date, "endDate": end_date, "timezone": timezone,
+                 "weather": json.loads(weather)} for fetched_at, start_date, end_date, timezone, weather in rows]
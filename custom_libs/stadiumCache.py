@@ -0,0 +1,228 @@
+"""
+Compact binary cache for the parsed stadium data.
+
+Layout (little endian):
+    header          magic, schema version, record count, list value count, string count
+    records         one fixed size struct per stadium, strings stored as indexes into the string table
+    list values     string indexes for every stadium's teams and currentTeams lists, back to back
+    string offsets  string count + 1 offsets into the string blob
+    string blob     every unique string, utf-8 encoded
+
+Records and strings are decoded from the memory mapped file the first time they are accessed.
+
+Each write goes to a new file (parsedSoup.1.bin, parsedSoup.2.bin...) and readers map the newest one. A file that is
+mapped is never replaced, which Windows does not allow, and a process keeps reading the version it mapped. Older
+versions are removed by the next write, or a later one if a process still has them mapped on Windows.
+"""
+from custom_libs.stadiumRecord import Stadium, Coordinates
+from collections.abc import Sequence
+import mmap
+import os
+import re
+import struct
+
+
+MAGIC = b'NFLS'
+SCHEMA_VERSION = 2
+
+_header_struct = struct.Struct('<4sHIII')
+# name, capacity, imgUrl, city, surface, roofType, yearOpened, teams start/count, currentTeams start/count, flags,
+# lat, lon, primary, globe
+_record_struct = struct.Struct('<IiIIIIiIHIHBddII')
+_uint_struct = struct.Struct('<I')
+
+_FLAG_SHARED_STADIUM = 1
+_FLAG_COORDINATES = 2
+
+
+class LazyStadiumList(Sequence):
+    """
+    Read only list of Stadium records backed by a memory mapped cache file. Each record is built the first time it is
+    accessed and reused afterwards.
+    """
+    def __init__(self, buffer, record_count, list_value_count, string_count):
+        self._buffer = buffer
+        self._record_count = record_count
+        self._records_offset = _header_struct.size
+        self._list_values_offset = self._records_offset + record_count * _record_struct.size
+        self._string_offsets_offset = self._list_values_offset + list_value_count * _uint_struct.size
+        self._string_blob_offset = self._string_offsets_offset + (string_count + 1) * _uint_struct.size
+        self._strings = [None] * string_count
+        self._records = [None] * record_count
+
+    def __len__(self):
+        return self._record_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._record_count))]
+
+        if index < 0:
+            index = index + self._record_count
+        if not 0 <= index < self._record_count:
+            raise IndexError('stadium index out of range')
+
+        record = self._records[index]
+        if record is None:
+            record = self._decode_record(index)
+            self._records[index] = record
+
+        return record
+
+    def __eq__(self, other):
+        if isinstance(other, (list, LazyStadiumList)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def _get_string(self, string_index):
+        string = self._strings[string_index]
+        if string is None:
+            start, end = struct.unpack_from('<II', self._buffer,
+                                            self._string_offsets_offset + string_index * _uint_struct.size)
+            blob_start = self._string_blob_offset + start
+            string = bytes(self._buffer[blob_start:self._string_blob_offset + end]).decode('utf-8')
+            self._strings[string_index] = string
+
+        return string
+
+    def _get_string_list(self, start, count):
+        offset = self._list_values_offset + start * _uint_struct.size
+        return [self._get_string(x) for x in struct.unpack_from(f'<{count}I', self._buffer, offset)]
+
+    def _decode_record(self, index):
+        (name, capacity, img_url, city, surface, roof_type, year_opened, teams_start, teams_count, current_start,
+         current_count, flags, lat, lon, primary, globe) = _record_struct.unpack_from(
+            self._buffer, self._records_offset + index * _record_struct.size)
+
+        coordinates = None
+        if flags & _FLAG_COORDINATES:
+            coordinates = Coordinates(lat, lon, self._get_string(primary), self._get_string(globe))
+
+        return Stadium(self._get_string(name), capacity, self._get_string(img_url), self._get_string(city),
+                       self._get_string(surface), self._get_string(roof_type),
+                       self._get_string_list(teams_start, teams_count), year_opened,
+                       bool(flags & _FLAG_SHARED_STADIUM), self._get_string_list(current_start, current_count),
+                       coordinates)
+
+
+def _get_versions(fpath):
+    """
+    :param fpath:   str(), cache path without a version, e.g., resources/parsedSoup.bin
+    :return:        list() of tuple(), (version, path) of every version of the file, oldest first. The unversioned
+                    file of earlier releases is version 0.
+    """
+    directory, name = os.path.split(fpath)
+    stem, extension = os.path.splitext(name)
+    pattern = re.compile(re.escape(stem) + r'(?:\.(\d+))?' + re.escape(extension))
+    try:
+        names = os.listdir(directory or '.')
+    except FileNotFoundError:
+        return []
+
+    versions = []
+    for x in names:
+        match = pattern.fullmatch(x)
+        if match:
+            versions.append((int(match.group(1) or 0), os.path.join(directory, x)))
+    return sorted(versions)
+
+
+def write_stadium_cache(fpath, stadiums):
+    """
+    :param fpath:       str(), cache path without a version, e.g., resources/parsedSoup.bin. The data is written to
+                        the next version of it, see the module docstring. Writers must not run at the same time.
+    :param stadiums:    list() of Stadium() or dict(), stadium data as built by NFLTeamStadiums
+    """
+    strings = {}
+
+    def get_string_index(string):
+        if string not in strings:
+            strings[string] = len(strings)
+        return strings[string]
+
+    list_values = []
+
+    def add_string_list(values):
+        start = len(list_values)
+        list_values.extend(get_string_index(x) for x in values)
+        return start, len(values)
+
+    records = []
+    for stadium in stadiums:
+        teams_start, teams_count = add_string_list(stadium['teams'])
+        current_start, current_count = add_string_list(stadium.get('currentTeams', []))
+        flags = 0
+        if stadium.get('sharedStadium'):
+            flags = flags | _FLAG_SHARED_STADIUM
+
+        coordinates = stadium.get('coordinates')
+        lat, lon, primary, globe = 0.0, 0.0, 0, 0
+        if coordinates:
+            flags = flags | _FLAG_COORDINATES
+            lat, lon = coordinates['lat'], coordinates['lon']
+            primary = get_string_index(coordinates.get('primary', ''))
+            globe = get_string_index(coordinates.get('globe', 'earth'))
+
+        records.append(_record_struct.pack(
+            get_string_index(stadium['name']), stadium['capacity'], get_string_index(stadium['imgUrl']),
+            get_string_index(stadium['city']), get_string_index(stadium['surface']),
+            get_string_index(stadium['roofType']), stadium['yearOpened'], teams_start, teams_count, current_start,
+            current_count, flags, lat, lon, primary, globe))
+
+    encoded_strings = [x.encode('utf-8') for x in strings]
+    string_offsets = [0]
+    for encoded in encoded_strings:
+        string_offsets.append(string_offsets[-1] + len(encoded))
+
+    old_versions = _get_versions(fpath)
+    stem, extension = os.path.splitext(fpath)
+    version_path = f"{stem}.{old_versions[-1][0] + 1 if old_versions else 1}{extension}"
+    temp_path = f"{version_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(_header_struct.pack(MAGIC, SCHEMA_VERSION, len(records), len(list_values), len(encoded_strings)))
+        f.writelines(records)
+        f.write(struct.pack(f'<{len(list_values)}I', *list_values))
+        f.write(struct.pack(f'<{len(string_offsets)}I', *string_offsets))
+        f.writelines(encoded_strings)
+    os.replace(temp_path, version_path)
+
+    for _, old_path in old_versions:
+        try:
+            os.remove(old_path)
+        except OSError:
+            # Still mapped by a process on Windows, removed by a later write
+            pass
+
+
+def load_stadium_cache(fpath):
+    """
+    :param fpath:   str(), cache path given to write_stadium_cache. Its newest version is loaded.
+    :return:        LazyStadiumList(), or None if the file is missing, empty, truncated or has a different schema
+                    version
+    """
+    versions = _get_versions(fpath)
+    if not versions:
+        return None
+
+    try:
+        if os.stat(versions[-1][1]).st_size < _header_struct.size:
+            return None
+        with open(versions[-1][1], 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+    magic, version, record_count, list_value_count, string_count = _header_struct.unpack_from(buffer)
+    # Everything up to the string offsets, then the string blob whose length is the last offset
+    expected_size = (_header_struct.size + record_count * _record_struct.size +
+                     (list_value_count + string_count + 1) * _uint_struct.size)
+    if magic != MAGIC or version != SCHEMA_VERSION or len(buffer) < expected_size:
+        buffer.close()
+        return None
+
+    blob_size, = _uint_struct.unpack_from(buffer, expected_size - _uint_struct.size)
+    if len(buffer) < expected_size + blob_size:
+        buffer.close()
+        return None
+
+    return LazyStadiumList(buffer, record_count, list_value_count, string_count)
@@ -0,0 +1,162 @@
+"""
+Immutable stadium records.
+
+Records use __slots__, so each one is a small fixed size object instead of a dict repeating every key, and attribute
+access (stadium.roof_type) is a direct slot read. Repeated strings (cities, surfaces, roof types, teams) are interned
+so every record shares one copy of each.
+
+Records can also be read like the dicts they replace: stadium['roofType'], stadium.get('coordinates'), 'teams' in
+stadium and dict(stadium) all work, and a record compares equal to its to_dict(). Lists are stored as tuples. Since
+nothing can change a record, it is returned and shared without copying. Records are not dicts though: json.dumps
+needs to_dict(), and isinstance(stadium, dict) is False.
+"""
+from collections.abc import Mapping
+import sys
+
+
+class _Record(Mapping):
+    """
+    Base of the records. _fields pairs every dict key with its attribute, in the order of the constructor parameters.
+    """
+    __slots__ = ()
+    _fields = ()
+    _attributes_by_key = {}
+
+    def __getitem__(self, key):
+        try:
+            attribute = self._attributes_by_key[key]
+        except (KeyError, TypeError):
+            raise KeyError(key) from None
+        return getattr(self, attribute)
+
+    def __iter__(self):
+        return (key for key, _ in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable, use to_dict() for a copy that can be changed")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable, use to_dict() for a copy that can be changed")
+
+    def _get_values(self):
+        return tuple(getattr(self, attribute) for _, attribute in self._fields)
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self._get_values() == other._get_values()
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._get_values())
+
+    def __repr__(self):
+        values = ", ".join(f"{attribute}={getattr(self, attribute)!r}" for _, attribute in self._fields)
+        return f"{type(self).__name__}({values})"
+
+    def __reduce__(self):
+        return type(self), self._get_values()
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def to_dict(self):
+        """
+        :return: dict(), new dict in the JSON format of the stadium cache, with lists in place of tuples and nested
+                 records as dicts
+        """
+        return {key: self._to_json_value(getattr(self, attribute)) for key, attribute in self._fields}
+
+    @staticmethod
+    def _to_json_value(value):
+        if isinstance(value, _Record):
+            return value.to_dict()
+        if isinstance(value, tuple):
+            return [_Record._to_json_value(x) for x in value]
+        return value
+
+
+class Coordinates(_Record):
+    """
+    Coordinates of a stadium as returned by the wikipedia coordinates api.
+    """
+    __slots__ = ('lat', 'lon', 'primary', 'globe')
+    _fields = (('lat', 'lat'), ('lon', 'lon'), ('primary', 'primary'), ('globe', 'globe'))
+    _attributes_by_key = dict(_fields)
+
+    def __init__(self, lat, lon, primary='', globe='earth'):
+        """
+        :param lat:     float(), latitude in degrees
+        :param lon:     float(), longitude in degrees
+        :param primary: str(), '' if these are the page's primary coordinates
+        :param globe:   str(), e.g., earth
+        """
+        set_slot = object.__setattr__
+        set_slot(self, 'lat', lat)
+        set_slot(self, 'lon', lon)
+        set_slot(self, 'primary', sys.intern(primary))
+        set_slot(self, 'globe', sys.intern(globe))
+
+    @classmethod
+    def from_dict(cls, coordinates):
+        """
+        :param coordinates: dict(), with lat and lon, and optionally primary and globe. A Coordinates() is returned
+                            as is.
+        :return:            Coordinates()
+        """
+        if isinstance(coordinates, cls):
+            return coordinates
+        return cls(coordinates['lat'], coordinates['lon'], coordinates.get('primary', ''),
+                   coordinates.get('globe', 'earth'))
+
+
+class Stadium(_Record):
+    """
+    One stadium of NFLTeamStadiums.data. The dict keys are camelCase (e.g., 'roofType'), the attributes snake_case
+    (e.g., roof_type).
+    """
+    __slots__ = ('name', 'capacity', 'img_url', 'city', 'surface', 'roof_type', 'teams', 'year_opened',
+                 'shared_stadium', 'current_teams', 'coordinates')
+    _fields = (('name', 'name'), ('capacity', 'capacity'), ('imgUrl', 'img_url'), ('city', 'city'),
+               ('surface', 'surface'), ('roofType', 'roof_type'), ('teams', 'teams'), ('yearOpened', 'year_opened'),
+               ('sharedStadium', 'shared_stadium'), ('currentTeams', 'current_teams'), ('coordinates', 'coordinates'))
+    _attributes_by_key = dict(_fields)
+
+    def __init__(self, name, capacity, img_url, city, surface, roof_type, teams, year_opened, shared_stadium=False,
+                 current_teams=(), coordinates=None):
+        """
+        :param teams:           list() of str(), teams and events listed for the stadium on wikipedia
+        :param current_teams:   list() of str(), abbreviations of the NFL teams playing there
+        :param coordinates:     Coordinates() or dict(), None if wikipedia has none
+        """
+        set_slot = object.__setattr__
+        set_slot(self, 'name', name)
+        set_slot(self, 'capacity', capacity)
+        set_slot(self, 'img_url', img_url)
+        set_slot(self, 'city', sys.intern(city))
+        set_slot(self, 'surface', sys.intern(surface))
+        set_slot(self, 'roof_type', sys.intern(roof_type))
+        set_slot(self, 'teams', tuple(sys.intern(x) for x in teams))
+        set_slot(self, 'year_opened', year_opened)
+        set_slot(self, 'shared_stadium', shared_stadium)
+        set_slot(self, 'current_teams', tuple(sys.intern(x) for x in current_teams))
+        set_slot(self, 'coordinates', None if coordinates is None else Coordinates.from_dict(coordinates))
+
+    @classmethod
+    def from_dict(cls, stadium):
+        """
+        :param stadium: dict(), stadium data as built by NFLTeamStadiums. A Stadium() is returned as is.
+        :return:        Stadium()
+        """
+        if isinstance(stadium, cls):
+            return stadium
+        return cls(stadium['name'], stadium['capacity'], stadium['imgUrl'], stadium['city'], stadium['surface'],
+                   stadium['roofType'], stadium['teams'], stadium['yearOpened'], stadium.get('sharedStadium', False),
+                   stadium.get('currentTeams', ()), stadium.get('coordinates'))
@@ -0,0 +1,41 @@
+"""
+Read-copy-update snapshots of the stadium data.
+
+NFLTeamStadiums never changes the stadium data in place. A refresh builds new data on the side and publishes it as a
+new StadiumSnapshot by replacing the instance's reference to the current one in a single assignment. A reader takes
+that reference once and uses it for the whole call, so it sees the data and lookup indexes of one version even if a
+refresh publishes another meanwhile, without taking a lock. The previous snapshot is freed once the last reader using
+it is done.
+"""
+
+
+class StadiumSnapshot:
+    """
+    One version of the stadium data and the lookup indexes built from it.
+
+    data and stadium_metadata are never changed once published. The indexes are built on the first lookup that needs
+    them and stored here, so they always match the data they were built from. Two threads building the same index at
+    the same time build equal ones and whichever is stored last is kept.
+    """
+    __slots__ = ('data', 'stadium_metadata', 'lookup_indexes_ready', 'stadiums_by_team', 'stadiums_by_name',
+                 'distance_matrix_index', 'distance_matrices', 'spatial_index', 'attribute_index',
+                 'stadium_search_index')
+
+    def __init__(self, data, stadium_metadata):
+        """
+        :param data:                list() of Stadium(), or the read only lists of the binary and sqlite caches
+        :param stadium_metadata:    dict(), wikipedia title -> metadata of the stadium at metadata['index'] in data
+        """
+        self.data = data
+        self.stadium_metadata = stadium_metadata
+
+        # team and name indexes, set together by NFLTeamStadiums._build_lookup_indexes
+        self.lookup_indexes_ready = False
+        self.stadiums_by_team = {}
+        self.stadiums_by_name = {}
+        self.distance_matrix_index = {}
+
+        self.distance_matrices = {}     # (use_numpy, float32) -> matrix
+        self.spatial_index = None
+        self.attribute_index = None
+        self.stadium_search_index = None
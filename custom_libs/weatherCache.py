@@ -0,0 +1,172 @@
+from custom_libs import osCommon as osC
+from custom_libs import fileCommon as fC
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+
+
+class WeatherCache:
+    """
+    Two tier cache for weather API responses. Entries live in an in-memory LRU and in one json file per entry on disk,
+    expire after ttl seconds and are evicted oldest first when either tier is full.
+
+    Keys are built from the request parameters (coordinates, date range, timezone, variables and units), so any two
+    requests for the same location and window share one entry.
+    """
+    def __init__(self, cache_dir, ttl=3600, max_memory_entries=256, max_disk_entries=1024):
+        """
+        :param cache_dir:           str(), directory the disk tier is written to. Created on first write.
+        :param ttl:                 int(), seconds an entry stays valid
+        :param max_memory_entries:  int(), maximum entries held in memory. 0 disables the memory tier.
+        :param max_disk_entries:    int(), maximum entries held on disk. 0 disables the disk tier.
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._memory = OrderedDict()
+        # Keys of the disk tier, oldest write first. Built from one scan of cache_dir on the first write, then kept up
+        # to date so writes never scan the directory. Each process evicts the entries it knows of.
+        self._disk_keys = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "memoryHits": 0,
+            "diskHits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0
+        }
+
+    @staticmethod
+    def make_key(params):
+        """
+        :param params:  dict(), request parameters. latitude and longitude are rounded to 4 decimals (~10 meters) so
+                        float noise does not split entries.
+        :return:        str(), cache key
+        """
+        import hashlib
+
+        key_params = dict(params)
+        for coordinate in ['latitude', 'longitude']:
+            if isinstance(key_params.get(coordinate), float):
+                key_params[coordinate] = round(key_params[coordinate], 4)
+
+        return hashlib.sha1(json.dumps(key_params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _get_disk_file(self, key):
+        return osC.append_to_dir(self.cache_dir, f"{key}.json")
+
+    def _is_expired(self, created):
+        return time.time() - created > self.ttl
+
+    def get(self, key):
+        """
+        :param key: str(), key from make_key
+        :return:    cached data, or None on a miss. The returned object is shared with the cache, do not mutate it.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._is_expired(entry[0]):
+                    del self._memory[key]
+                    self._stats['expired'] = self._stats['expired'] + 1
+                else:
+                    self._memory.move_to_end(key)
+                    self._stats['hits'] = self._stats['hits'] + 1
+                    self._stats['memoryHits'] = self._stats['memoryHits'] + 1
+                    return entry[1]
+
+            if self.max_disk_entries > 0:
+                disk_file = self._get_disk_file(key)
+                if osC.check_if_file_exists(disk_file):
+                    entry = fC.load_json_from_file(disk_file)
+                    if entry and not self._is_expired(entry['created']):
+                        self._set_memory(key, entry['created'], entry['data'])
+                        self._stats['hits'] = self._stats['hits'] + 1
+                        self._stats['diskHits'] = self._stats['diskHits'] + 1
+                        return entry['data']
+
+                    self._remove_disk_entry(key)
+                    self._stats['expired'] = self._stats['expired'] + 1
+
+            self._stats['misses'] = self._stats['misses'] + 1
+            return None
+
+    def set(self, key, data):
+        """
+        :param key:     str(), key from make_key
+        :param data:    json serializable data to cache
+        """
+        created = time.time()
+        with self._lock:
+            self._set_memory(key, created, data)
+            if self.max_disk_entries > 0:
+                osC.check_create_directory(self.cache_dir)
+                if self._disk_keys is None:
+                    self._disk_keys = self._scan_disk_keys()
+                fC.dump_json_to_file(self._get_disk_file(key), {"created": created, "data": data})
+                self._disk_keys[key] = None
+                self._disk_keys.move_to_end(key)
+                self._evict_disk()
+
+    def _set_memory(self, key, created, data):
+        if self.max_memory_entries <= 0:
+            return
+
+        self._memory[key] = (created, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] = self._stats['evictions'] + 1
+
+    def _scan_disk_keys(self):
+        """
+        :return: OrderedDict(), key -> None for every entry file in cache_dir, oldest first
+        """
+        entries = [x for x in os.scandir(self.cache_dir) if x.name.endswith('.json')]
+        entries.sort(key=lambda x: x.stat().st_mtime)
+        return OrderedDict((x.name[:-len('.json')], None) for x in entries)
+
+    def _evict_disk(self):
+        while len(self._disk_keys) > self.max_disk_entries:
+            key, _ = self._disk_keys.popitem(last=False)
+            self._remove_disk_file(self._get_disk_file(key))
+            self._stats['evictions'] = self._stats['evictions'] + 1
+
+    def _remove_disk_entry(self, key):
+        self._remove_disk_file(self._get_disk_file(key))
+        if self._disk_keys is not None:
+            self._disk_keys.pop(key, None)
+
+    @staticmethod
+    def _remove_disk_file(disk_file):
+        try:
+            os.remove(disk_file)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """
+        Removes every entry from both tiers. Stats are kept.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._disk_keys = None
+            if osC.check_if_dir_exists(self.cache_dir):
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith('.json'):
+                        self._remove_disk_file(entry.path)
+
+    def get_stats(self):
+        """
+        :return: dict(), hit/miss/eviction counters plus the current number of entries in memory
+        """
+        with self._lock:
+            stats = self._stats.copy()
+            stats['memoryEntries'] = len(self._memory)
+
+        return stats
@@ -1,10 +1,39 @@
 from custom_libs import requestsCommon as rC
 from custom_libs import osCommon as osC
 from custom_libs import fileCommon as fC
+from custom_libs import stadiumCache
+from custom_libs.fileLock import FileLock
+from custom_libs.weatherCache import WeatherCache
+from custom_libs.spatialIndex import SpatialIndex
+from custom_libs.searchIndex import TrigramIndex
+from custom_libs.attributeIndex import AttributeIndex
+from custom_libs.stadiumRecord import Stadium
+from custom_libs.stadiumSnapshot import StadiumSnapshot
+from custom_libs.sqliteStore import SqliteStore
+from custom_libs.instrumentation import traced
 from custom_libs.teamLists import city_short, alt_city_short, long, mascots, mascots_short
 from datetime import datetime, timedelta
+from array import array
+from collections.abc import Sequence
+import threading
+import copy
+import json
 import urllib.parse
 import math
+import time
+import re
+
+
+def _import_numpy():
+    """
+    numpy is optional and slow to import, so it is only imported the first time a vectorized code path needs it.
+    :return: numpy module, or None if it is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
 
 
 class NFLTeamStadiums:
@@ -14,27 +43,129 @@ class NFLTeamStadiums:
 
     And various pages linked to on the main page.
     """
-    def __init__(self, use_cache=True, verbose=True):
+    # Radius of the Earth in miles, used for haversine distances
+    _earth_radius_miles = 3958.8
+
+    # Opening (group 1 empty) and closing (group 1 is "/") table tags, used to slice tables out of the page html
+    _table_tag_pattern = re.compile(r'<(/)?table[\s>]', re.IGNORECASE)
+
+    def __init__(self, use_cache=True, verbose=True, weather_cache_ttl=3600, weather_cache_memory_size=256,
+                 weather_cache_disk_size=1024, cache_format='json', cache_dir=None,
+                 wiki_api_url="https://en.wikipedia.org/w/api.php",
+                 weather_api_url="https://api.open-meteo.com/v1/forecast", instrumentation=None,
+                 max_concurrent_requests=4):
         """
 
-        :param use_cache:   bool(), if True, the class will try to use cache from last time it scraped the web. Since
-                            this data is fairly static, use_cache is on by default. Turn it off if you suspect
-                            there were changes in the data to get the latest.
+        :param use_cache:                   bool(), if True, the class will try to use cache from last time it scraped
+                                            the web. Since this data is fairly static, use_cache is on by default. Turn
+                                            it off if you suspect there were changes in the data to get the latest.
+
+        :param weather_cache_ttl:           int(), seconds a weather forecast is served from cache before it is
+                                            requested again (default 3600). 0 disables the weather cache.
+
+        :param weather_cache_memory_size:   int(), maximum forecasts kept in the in-memory weather cache (default 256)
+
+        :param weather_cache_disk_size:     int(), maximum forecasts kept in resources/weatherCache (default 1024)
+
+        :param cache_format:                str(), 'json' (default), 'binary' or 'sqlite'. 'binary' also keeps the
+                                            stadium data in a compact memory mapped file (resources/parsedSoup.N.bin,
+                                            a new N for each write) that loads each stadium on first access, for
+                                            faster start up in short lived processes. 'sqlite' also keeps it in an
+                                            SQLite database (resources/stadiums.sqlite3) that many processes can read
+                                            at once, along with every weather forecast received. See
+                                            get_weather_snapshots.
+
+        :param cache_dir:                   str(), optional. Directory for the stadium and weather caches. Defaults to
+                                            the resources directory of this project.
+
+        :param wiki_api_url:                str(), Wikipedia API endpoint. Change to point at a mirror or a local
+                                            stand-in.
+
+        :param weather_api_url:             str(), Open Meteo forecast endpoint. Change to point at a mirror or a local
+                                            stand-in.
+
+        :param instrumentation:             custom_libs.instrumentation.Instrumentation(), optional. Receives spans for
+                                            each refresh step (list page, table parsing, redirects, coordinates), cache
+                                            loads and writes and every http request, plus weather counters,
+                                            wiki.bytes_saved / wiki.not_modified counters for the downloads a refresh
+                                            skipped and refresh.failures for failed background refreshes. Nothing is
+                                            measured when it is None (default).
+
+        :param max_concurrent_requests:     int(), wikipedia requests (e.g., coordinate batches) a refresh keeps in
+                                            flight at once (default 4). Raise it for a fast mirror or a local
+                                            stand-in, lower it to go easier on a rate limited endpoint.
         """
-        self.data = list()
-        self._stadium_metadata = {}
+        if max_concurrent_requests < 1:
+            raise ValueError(f"max_concurrent_requests must be at least 1, not {max_concurrent_requests!r}")
+
+        # The published stadium data and its lookup indexes, replaced as a whole when the data changes. See
+        # custom_libs.stadiumSnapshot. A refresh builds the next data in _new_data and _new_stadium_metadata.
+        self._snapshot = StadiumSnapshot([], {})
+        self._new_data = None
+        self._new_stadium_metadata = None
         self.verbose = verbose
+        self._instrumentation = instrumentation
 
         # API Info
         self._header = {'User-Agent': 'NFLTeamStadiums/0.1 (https://github.com/grindSunday/NFLTeamStadiums)'}
-        self._main_url = "https://en.wikipedia.org/w/api.php"
+        self._main_url = wiki_api_url
+        self._weather_url = weather_api_url
+        self._max_concurrent_requests = max_concurrent_requests
 
         # Project Structure
-        self._resources_dir = osC.create_file_path_string(["resources"])
-        self._raw_soup = None
-        self._raw_soup_file = osC.create_file_path_string(["resources", "rawSoup.txt"])
-        self._parsed_soup_file = osC.create_file_path_string(["resources", "parsedSoup.json"])
-        self._check_create_project_structure()
+        self._resources_dir = cache_dir if cache_dir else osC.create_file_path_string(["resources"])
+        self._raw_html = None
+        self._raw_soup_file = osC.append_to_dir(self._resources_dir, "rawSoup.txt")
+        self._parsed_soup_file = osC.append_to_dir(self._resources_dir, "parsedSoup.json")
+        self._parsed_soup_binary_file = osC.append_to_dir(self._resources_dir, "parsedSoup.bin")
+        self._cache_metadata_file = osC.append_to_dir(self._resources_dir, "cacheMetadata.json")
+        self._wiki_responses_file = osC.append_to_dir(self._resources_dir, "wikiResponses.json")
+        self._cache_format = cache_format
+        self._sqlite_file = osC.append_to_dir(self._resources_dir, "stadiums.sqlite3")
+        self._sqlite_store = SqliteStore(self._sqlite_file) if cache_format == 'sqlite' else None
+
+        # Processes sharing the cache directory take this lock to scrape, so only one of them scrapes at a time.
+        # _cache_files_lock is only held while the cache files are written or read, so readers get the stadiums and
+        # metadata of the same refresh without waiting for a scrape. _cache_version is the modified time of the cache
+        # metadata this instance loaded or wrote, to spot a cache another process refreshed.
+        self._cache_lock = FileLock(osC.append_to_dir(self._resources_dir, "cache.lock"))
+        self._cache_files_lock = FileLock(osC.append_to_dir(self._resources_dir, "cacheFiles.lock"))
+        self._cache_version = None
+        self._weather_cache_dir = osC.append_to_dir(self._resources_dir, "weatherCache")
+        if weather_cache_ttl > 0:
+            self._weather_cache = WeatherCache(self._weather_cache_dir, ttl=weather_cache_ttl,
+                                               max_memory_entries=weather_cache_memory_size,
+                                               max_disk_entries=weather_cache_disk_size)
+        else:
+            self._weather_cache = None
+
+        # Forecast ranges fetched by prefetch_weather (location key -> list of [start_date, end_date, created, data])
+        # and weather requests in flight (cache key -> Future), so overlapping requests share a single fetch.
+        # Expired ranges are dropped and past the limit the oldest ones are, so a long running instance stays bounded.
+        self._weather_cache_ttl = weather_cache_ttl
+        self._prefetched_weather = {}
+        self._max_prefetched_ranges = 256
+        self._weather_in_flight = {}
+        self._weather_lock = threading.Lock()
+        self._weather_batch_size = 50   # locations packed into one Open Meteo request
+
+        # Wikipedia revision ids of the stadium list page and of each stadium page (final title -> revid) the data
+        # was built from. Used by refresh to re-fetch only what changed.
+        self._stadium_list_page = "List of current NFL stadiums"
+        self._page_revid = None
+        self._title_revisions = {}
+
+        # Size of the last download of the list page and each stadium page's share of its coordinates batch, to
+        # count the bytes a refresh saves by skipping them
+        self._page_bytes = None
+        self._title_bytes = {}
+
+        # Wikipedia responses that came with an ETag or Last-Modified header (request key -> validators and content),
+        # loaded from resources/wikiResponses.json on the first request. They are requested conditionally and a 304
+        # Not Modified is answered from the stored content. The list page html is not stored again, its 304 is
+        # answered from rawSoup.txt.
+        self._wiki_responses = None
+        self._wiki_responses_changed = False
 
         # Used to find stadium table from HTML. Change this if wiki structure changes.
         self._current_stadiums_wiki_section_name = 'List_of_current_stadiums'
@@ -43,41 +174,507 @@ class NFLTeamStadiums:
         self._additional_stadiums_table_from_heading = 1
 
 
-        # Used for team lookups
-        self._teams_city_short = [x.lower() for x in city_short]
-        self._teams_alt_city_short = [x.lower() for x in alt_city_short]
-        self._teams_long = [x.lower() for x in long]
-        self._teams_mascots = [x.lower() for x in mascots]
-        self._teams_mascots_short = [x.lower() for x in mascots_short]
-        self._team_lists = [self._teams_city_short, self._teams_alt_city_short, self._teams_long,
-                            self._teams_mascots, self._teams_mascots_short]
+        # Used for team lookups. Every alias (abbreviation, full name, mascot...) maps to the team abbreviation.
+        self._team_alias_index = self._build_team_alias_index()
+
+        # Used for fuzzy team search. The stadium lookup and search indexes are kept on each snapshot.
+        self._team_search_index = None
+
+        # Background refresh thread and the event that stops it, see start_background_refresh
+        self._background_refresh = None
+        self._background_refresh_stop = None
 
         # Get the Data
+        self._load_data(use_cache)
+
+    @property
+    def data(self):
+        """
+        list() of Stadium(), the stadium data. A refresh publishes a new list instead of changing this one, so it can
+        be iterated safely while the data is refreshed. Do not modify it.
+        """
+        return self._snapshot.data
+
+    def _load_data(self, use_cache):
         if use_cache:
             self._check_cache()
 
         if not self.data:
-            self._get_current_stadium_data()
-            self._get_other_stadium_data()
-            self._add_normalized_current_team_to_data()
-            self._add_stadium_coordinates_to_data()
-            fC.dump_json_to_file(self._parsed_soup_file, self.data)
+            self._acquire_cache_lock(wait=True)
+            try:
+                # Another process may have scraped while this one waited for the lock
+                if not (use_cache and self._load_newer_cache()):
+                    self._refresh_data()
+            finally:
+                self._cache_lock.release()
+
+    def _acquire_cache_lock(self, wait):
+        osC.check_create_directory(self._resources_dir)
+        if self._cache_lock.acquire(blocking=False):
+            return True
+        if not wait:
+            return False
+
+        self._check_print("INFO: Waiting for another process to finish scraping the stadium data.")
+        return self._cache_lock.acquire()
+
+    def _load_newer_cache(self):
+        """
+        Loads the cache if another process wrote it after this instance last loaded or wrote it.
+
+        :return: bool(), True if it was loaded
+        """
+        cache_version = osC.get_file_modified_time(self._cache_metadata_file)
+        if cache_version is None or cache_version == self._cache_version:
+            return False
+
+        self._check_print("INFO: Loading the stadium data another process scraped.")
+        self._check_cache()
+        return self._cache_version == cache_version
 
     def _check_print(self, print_txt):
         if self.verbose:
             print(print_txt)
 
-    def _check_cache(self):
+    def _increment(self, name, value=1, tags=None):
+        if self._instrumentation is not None:
+            self._instrumentation.increment(name, value=value, tags=tags)
 
-        raw_soup = fC.read_file_content(self._raw_soup_file)
-        parsed_soup = fC.load_json_from_file(self._parsed_soup_file)
+    @traced('cache.load')
+    def _check_cache(self):
+        # The stadium files and cacheMetadata.json are replaced one after another, so they are read under the lock
+        # _save_cache writes them under. Otherwise the stadiums of one refresh could be paired with the metadata of
+        # another, whose indexes point at the wrong stadiums. Readers only exclude _save_cache, not each other.
+        try:
+            self._cache_files_lock.acquire(shared=True)
+        except OSError:
+            # No lock file and none can be created, e.g., a cache in a read only directory. Nothing can replace the
+            # files there, so they are read without it.
+            parsed_soup, stadium_metadata, cache_version = self._read_cache()
+        else:
+            try:
+                parsed_soup, stadium_metadata, cache_version = self._read_cache()
+            finally:
+                self._cache_files_lock.release()
 
-        if raw_soup == "" or parsed_soup == {}:
+        if not parsed_soup:
             self._check_print("INFO: No cache available. If this is first run this is normal.")
         else:
             self._check_print("INFO: Loaded data from cache. If the data needs to be refreshed, start the class with "
                               "parameter use_cache = False")
-            self.data = parsed_soup
+            self._publish(StadiumSnapshot(parsed_soup, stadium_metadata))
+            self._cache_version = cache_version
+            self._wiki_responses = None
+
+    def _read_cache(self):
+        """
+        Call with self._cache_files_lock held, shared is enough. See _check_cache.
+
+        :return: tuple(), (stadiums, stadium metadata, cache version). stadiums is None if there is no cache.
+        """
+        cache_version = osC.get_file_modified_time(self._cache_metadata_file)
+        parsed_soup = None
+        if osC.get_file_size(self._raw_soup_file) > 0:
+            if self._cache_format == 'binary':
+                parsed_soup = stadiumCache.load_stadium_cache(self._parsed_soup_binary_file)
+            elif self._cache_format == 'sqlite' and osC.check_if_file_exists(self._sqlite_file):
+                parsed_soup = self._sqlite_store.load_stadiums()
+
+            if parsed_soup is None and osC.check_if_file_exists(self._parsed_soup_file):
+                parsed_soup = fC.load_json_from_file(self._parsed_soup_file)
+                parsed_soup = [Stadium.from_dict(x) for x in parsed_soup] if parsed_soup else None
+                if parsed_soup and self._cache_format != 'json':
+                    # binary or sqlite cache is missing or from an incompatible schema version
+                    self._check_print(f"INFO: Rebuilding {self._cache_format} cache from json cache.")
+                    try:
+                        self._write_stadium_store(parsed_soup)
+                    except Exception as e:
+                        # e.g., a read only cache directory, the json cache is used as is
+                        print(f"ERROR: Could not rebuild the {self._cache_format} cache. {type(e).__name__}: {e}")
+
+        if not parsed_soup:
+            return None, None, cache_version
+
+        return parsed_soup, self._load_cache_metadata(), cache_version
+
+    def _load_cache_metadata(self):
+        """
+        Loads the revision info of the cached data.
+
+        :return: dict(), stadium metadata of the cached data
+        """
+        if not osC.check_if_file_exists(self._cache_metadata_file):
+            return {}
+
+        cache_metadata = fC.load_json_from_file(self._cache_metadata_file)
+        if not cache_metadata:
+            return {}
+
+        self._page_revid = cache_metadata['pageRevid']
+        self._title_revisions = cache_metadata['titleRevisions']
+        self._page_bytes = cache_metadata.get('pageBytes')
+        self._title_bytes = cache_metadata.get('titleBytes', {})
+        return cache_metadata['stadiumMetadata']
+
+    def _publish(self, snapshot):
+        """
+        Makes snapshot the data every lookup uses from now on, in one assignment. Lookups already running finish with
+        the previous snapshot.
+        """
+        self._snapshot = snapshot
+
+    def _publish_new_data(self):
+        """
+        Ends a refresh. The stadiums are built as dicts in self._new_data, they are turned into the Stadium records
+        that are shared with callers, saved to the cache and published.
+        """
+        snapshot = StadiumSnapshot([Stadium.from_dict(x) for x in self._new_data], self._new_stadium_metadata)
+        self._new_data, self._new_stadium_metadata = None, None
+        self._save_cache(snapshot)
+        self._publish(snapshot)
+
+    @traced('cache.write')
+    def _save_cache(self, snapshot):
+        with self._cache_files_lock:
+            # The stadium cache files are fsynced, a scrape takes far longer to redo than the disk flushes
+            fC.dump_json_to_file(self._parsed_soup_file, [x.to_dict() for x in snapshot.data], fsync=True)
+            self._write_stadium_store(snapshot.data)
+            fC.dump_json_to_file(self._cache_metadata_file, {
+                "pageRevid": self._page_revid,
+                "stadiumMetadata": snapshot.stadium_metadata,
+                "titleRevisions": self._title_revisions,
+                "pageBytes": self._page_bytes,
+                "titleBytes": self._title_bytes
+            }, fsync=True)
+            self._cache_version = osC.get_file_modified_time(self._cache_metadata_file)
+        self._save_wiki_responses()
+
+    def _write_stadium_store(self, stadiums):
+        if self._cache_format == 'binary':
+            stadiumCache.write_stadium_cache(self._parsed_soup_binary_file, stadiums)
+        elif self._cache_format == 'sqlite':
+            self._sqlite_store.write_stadiums(stadiums)
+
+    def _get_wiki_responses(self):
+        if self._wiki_responses is None:
+            self._wiki_responses = {}
+            if osC.check_if_file_exists(self._wiki_responses_file):
+                self._wiki_responses = fC.load_json_from_file(self._wiki_responses_file)
+
+        return self._wiki_responses
+
+    def _save_wiki_responses(self):
+        if self._wiki_responses_changed:
+            fC.dump_json_to_file(self._wiki_responses_file, self._wiki_responses)
+            self._wiki_responses_changed = False
+
+    def _get_wiki_request_key(self, params):
+        return f"{self._main_url}?{urllib.parse.urlencode(sorted(params.items()))}"
+
+    def _get_wiki_request_headers(self, params):
+        """
+        :return: dict(), headers for a wikipedia request, conditional if a response to the same request was stored
+        """
+        stored = self._get_wiki_responses().get(self._get_wiki_request_key(params))
+        if stored is None:
+            return self._header
+
+        # The list page is answered from rawSoup.txt, it can only be requested conditionally while that is there
+        if params.get('action') == 'parse' and osC.get_file_size(self._raw_soup_file) == 0:
+            return self._header
+
+        return {**self._header, **rC.get_conditional_headers(stored)}
+
+    def _check_not_modified(self, params, response):
+        """
+        Stores the validators of a wikipedia response so the next identical request is conditional, and replaces a
+        304 Not Modified by the stored response. The list page html is already in rawSoup.txt, so only its revid is
+        stored with the validators (by _store_list_page_revid once the caller has parsed the response) and its 304 is
+        answered from that file. The other responses are small and are stored whole.
+
+        :return: requests.Response() or BufferedResponse(), the response to parse
+        """
+        key = self._get_wiki_request_key(params)
+        stored = self._get_wiki_responses().get(key)
+        is_list_page = params.get('action') == 'parse'
+        if response.status_code == 304 and stored is not None:
+            if is_list_page:
+                html_content = fC.read_file_content(self._raw_soup_file)
+                content = json.dumps({"parse": {"revid": stored.get('revid'), "text": {"*": html_content}}})
+            else:
+                content = stored['content']
+            self._increment('wiki.not_modified')
+            self._increment('wiki.bytes_saved', value=len(content), tags={'reason': 'not_modified'})
+            return rC.BufferedResponse(response.url, 200, response.headers, content.encode('utf-8'))
+
+        validators = rC.get_validators(response) if response.status_code == 200 else {}
+        if validators:
+            if is_list_page:
+                self._wiki_responses[key] = validators
+            else:
+                self._wiki_responses[key] = {**validators, "content": response.content.decode('utf-8')}
+            self._wiki_responses_changed = True
+        elif stored is not None:
+            del self._wiki_responses[key]
+            self._wiki_responses_changed = True
+
+        return response
+
+    def _store_list_page_revid(self, params, revid):
+        stored = self._get_wiki_responses().get(self._get_wiki_request_key(params))
+        if stored is not None and stored.get('revid') != revid:
+            stored['revid'] = revid
+            self._wiki_responses_changed = True
+
+    def _run_wiki_requests(self, steps):
+        """
+        Every method that requests wikipedia is a generator so the same code runs here and in AsyncNFLTeamStadiums.
+        It yields a list() of (params, parse) requests and is sent back the list() of parse(response) results in the
+        same order (the response itself when parse is None). This makes the requests of each list concurrently, at
+        most self._max_concurrent_requests at a time, with the pooled sessions of requestsCommon.
+
+        :param steps:   generator, e.g., self._refresh_steps(True)
+        :return:        the return value of steps
+        """
+        results, error = None, None
+        while True:
+            try:
+                requests = steps.throw(error) if error is not None else steps.send(results)
+            except StopIteration as e:
+                return e.value
+
+            try:
+                results, error = self._send_wiki_requests(requests), None
+            except Exception as e:
+                results, error = None, e
+
+    def _send_wiki_requests(self, requests):
+        # Loaded before the threads start so they all share it
+        self._get_wiki_responses()
+
+        def send_request(request):
+            params, parse = request
+            response = rC.basic_request(self._main_url, params=params, headers=self._get_wiki_request_headers(params),
+                                        instrumentation=self._instrumentation)
+            response = self._check_not_modified(params, response)
+            return response if parse is None else parse(response)
+
+        if len(requests) <= 1:
+            return [send_request(x) for x in requests]
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(self._max_concurrent_requests, len(requests))) as executor:
+            return list(executor.map(send_request, requests))
+
+    def _refresh_data(self, known_redirects=None, known_coordinates=None):
+        self._run_wiki_requests(self._refresh_data_steps(known_redirects, known_coordinates))
+
+    @traced('refresh')
+    def _refresh_data_steps(self, known_redirects=None, known_coordinates=None):
+        self._new_data = list()
+        self._new_stadium_metadata = {}
+        self._raw_html = None
+        self._check_create_project_structure()
+
+        yield from self._get_current_stadium_data()
+        self._get_other_stadium_data()
+        self._add_normalized_current_team_to_data()
+        yield from self._add_stadium_coordinates_to_data(known_redirects, known_coordinates)
+        self._publish_new_data()
+
+    def refresh(self, incremental=True, wait=True):
+        """
+        Updates the stadium data from wikipedia. Processes sharing the cache directory refresh one at a time, and a
+        process that finds the cache was refreshed by another one since it loaded the data uses that instead of
+        scraping again.
+
+        :param incremental: bool(), if True (default), one cheap request checks the revision ids of the stadium list
+                            page and every stadium page. Only what changed since the data was scraped is downloaded
+                            again: the list page is re-parsed only if it changed, and coordinates are re-queried only
+                            for stadium pages that changed. If False, or if there is no revision info for the current
+                            data, everything is scraped again.
+
+                            Either way, a wikipedia request whose previous response came with an ETag or Last-Modified
+                            header (e.g., from a caching mirror) is made conditionally, and a 304 Not Modified reuses
+                            the stored response instead of downloading it again: the list page html kept in
+                            resources/rawSoup.txt, or the response stored in resources/wikiResponses.json.
+
+        :param wait:        bool(), if True (default) and another process is refreshing, waits for it and uses its
+                            result. If False, returns right away and keeps the current data.
+
+        Lookups made from other threads while it runs are not blocked and use the previous data until the new data is
+        complete. See start_background_refresh to refresh on a schedule.
+
+        :return:            bool(), True if anything was re-fetched or loaded from another process's refresh, False if
+                            the data was already up to date or another process is refreshing and wait is False
+        """
+        if not self._acquire_cache_lock(wait):
+            self._check_print("INFO: Another process is refreshing the stadium data, keeping the current data.")
+            return False
+
+        try:
+            if self._load_newer_cache():
+                return True
+            return self._run_wiki_requests(self._refresh_steps(incremental))
+        finally:
+            self._cache_lock.release()
+
+    def start_background_refresh(self, interval=86400, incremental=True):
+        """
+        Refreshes the stadium data every interval seconds in a daemon thread, so a long running service picks up
+        changes without being restarted. Each refresh builds the new data on the side and publishes it in one step:
+        lookups in other threads are never blocked, never see partially refreshed data, and each lookup uses a single
+        version of the data from start to end.
+
+        A failed refresh is printed and counted as refresh.failures, and the current data is kept until the next one.
+        If another process is refreshing the shared cache at that time, its result is loaded at the next interval.
+
+        :param interval:    float(), seconds between refreshes (default 86400, once a day)
+        :param incremental: bool(), see refresh
+        """
+        if interval <= 0:
+            raise ValueError(f"interval must be greater than 0, not {interval!r}")
+
+        self.stop_background_refresh()
+        stop = threading.Event()
+        thread = threading.Thread(target=self._run_background_refresh, args=(stop, interval, incremental),
+                                  name='NFLTeamStadiums background refresh', daemon=True)
+        self._background_refresh, self._background_refresh_stop = thread, stop
+        thread.start()
+
+    def stop_background_refresh(self, timeout=None):
+        """
+        Stops the refreshes started by start_background_refresh. A refresh in progress is finished first.
+
+        :param timeout: float(), optional. Seconds to wait for a refresh in progress before returning anyway.
+        """
+        thread, stop = self._background_refresh, self._background_refresh_stop
+        if thread is None:
+            return
+
+        self._background_refresh, self._background_refresh_stop = None, None
+        stop.set()
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run_background_refresh(self, stop, interval, incremental):
+        while not stop.wait(interval):
+            try:
+                self.refresh(incremental=incremental, wait=False)
+            except Exception as e:
+                self._report_background_refresh_error(e)
+
+    def _report_background_refresh_error(self, error):
+        self._increment('refresh.failures')
+        print(f"ERROR: Background refresh of the stadium data failed, keeping the current data. {error!r}")
+
+    def _refresh_steps(self, incremental):
+        # The published data is only replaced once the refresh is complete. Put the previous revision info back if it
+        # fails or is cancelled part way through.
+        state = (self._page_revid, self._title_revisions, self._page_bytes, self._title_bytes)
+        try:
+            return (yield from self._refresh_changes_steps(incremental))
+        except BaseException:
+            self._page_revid, self._title_revisions, self._page_bytes, self._title_bytes = state
+            self._new_data, self._new_stadium_metadata = None, None
+            raise
+
+    def _refresh_changes_steps(self, incremental):
+        snapshot = self._snapshot
+        if not incremental or not snapshot.data or self._page_revid is None:
+            yield from self._refresh_data_steps()
+            return True
+
+        list_page_title = self._stadium_list_page.replace(" ", "_")
+        revisions = yield from self._get_page_revisions([list_page_title] + list(self._title_revisions))
+        page_changed = revisions.get(list_page_title) != self._page_revid
+        changed_titles = [x for x in self._title_revisions if revisions.get(x) != self._title_revisions[x]]
+
+        # What the revisions show does not need downloading again
+        bytes_saved = sum(self._title_bytes.get(x) or 0 for x in self._title_revisions if x not in changed_titles)
+        if not page_changed:
+            bytes_saved = bytes_saved + (self._page_bytes or 0)
+        if bytes_saved:
+            self._increment('wiki.bytes_saved', value=bytes_saved, tags={'reason': 'revision'})
+
+        if not page_changed and not changed_titles:
+            self._check_print("INFO: Stadium data is up to date with wikipedia.")
+            self._save_wiki_responses()
+            return False
+
+        # Reuse everything that did not change
+        known_redirects = {}
+        known_coordinates = {}
+        for title, metadata in snapshot.stadium_metadata.items():
+            final_title = metadata.get('finalTitle', title)
+            if 'finalTitle' in metadata:
+                known_redirects[title] = final_title
+            if final_title in self._title_revisions and final_title not in changed_titles:
+                known_coordinates[final_title] = snapshot.data[metadata['index']].get('coordinates')
+
+        if page_changed:
+            self._check_print("INFO: Stadium list page changed on wikipedia, re-parsing it.")
+            yield from self._refresh_data_steps(known_redirects, known_coordinates)
+        else:
+            self._check_print(f"INFO: {len(changed_titles)} stadium page(s) changed on wikipedia, updating them.")
+            # Copies, so the data in use is untouched until the update is complete
+            self._new_data = [x.to_dict() for x in snapshot.data]
+            self._new_stadium_metadata = {k: dict(v) for k, v in snapshot.stadium_metadata.items()}
+            yield from self._add_stadium_coordinates_to_data(known_redirects, known_coordinates)
+            self._publish_new_data()
+
+        return True
+
+    @staticmethod
+    def _build_team_alias_index():
+        team_alias_index = {}
+        for alias, team in NFLTeamStadiums._get_team_aliases():
+            team_alias_index.setdefault(alias.lower(), team)
+
+        return team_alias_index
+
+    @staticmethod
+    def _get_team_aliases():
+        """
+        :return: list() of tuple(), (alias, team abbreviation) for every alias in teamLists
+        """
+        aliases = []
+        for team_list in [city_short, alt_city_short, long, mascots, mascots_short]:
+            aliases.extend((alias, city_short[i].upper()) for i, alias in enumerate(team_list))
+
+        return aliases
+
+    def _check_lookup_indexes(self, snapshot):
+        """
+        The lookup indexes are built on the first lookup of each snapshot so a cache load never has to touch every
+        stadium record.
+        :return:
+        """
+        if not snapshot.lookup_indexes_ready:
+            self._build_lookup_indexes(snapshot)
+
+    @staticmethod
+    def _build_lookup_indexes(snapshot):
+        """
+        This function builds the team and name indexes used by the get_* lookups.
+        :return:
+        """
+        stadiums_by_team = {}
+        stadiums_by_name = {}
+        for stadium in snapshot.data:
+            stadiums_by_name.setdefault(stadium.name.lower(), stadium)
+            for team in stadium.current_teams:
+                stadiums_by_team.setdefault(team, []).append(stadium)
+
+        # Tuples, so nothing a lookup returns can change the index shared by every reader of the snapshot
+        snapshot.stadiums_by_team = {k: tuple(v) for k, v in stadiums_by_team.items()}
+        snapshot.stadiums_by_name = stadiums_by_name
+        distance_matrix_index = {}
+        for i, stadium in enumerate(snapshot.data):
+            distance_matrix_index.setdefault(stadium.name.lower(), i)
+
+        snapshot.distance_matrix_index = distance_matrix_index
+        snapshot.lookup_indexes_ready = True
 
     @staticmethod
     def _find_table_under_heading(heading_ele, table_num_from_heading):
@@ -96,6 +693,50 @@ class NFLTeamStadiums:
 
         return table_element
 
+    @staticmethod
+    def _slice_table_html(html_content, start_loc, table_num_from_heading):
+        """
+        Finds the nth <table> (counting nested tables, in document order like _find_table_under_heading) after
+        start_loc without parsing anything and returns its html, including any nested tables.
+
+        :return: str(), html of the table. None if there are not enough tables or the table is never closed.
+        """
+        table_start = start_loc
+        for _ in range(table_num_from_heading):
+            table_start = html_content.find('<table', table_start + 1)
+            if table_start == -1:
+                return None
+
+        depth = 0
+        for tag in NFLTeamStadiums._table_tag_pattern.finditer(html_content, table_start):
+            depth = depth + 1 if tag.group(1) is None else depth - 1
+            if depth == 0:
+                return html_content[table_start:tag.end()]
+
+        return None
+
+    @staticmethod
+    def _get_table_under_heading(html_content, heading_id, table_num_from_heading):
+        """
+        Locates the table straight from the html string and parses only that table. Falls back to parsing the full
+        page and walking it with _find_table_under_heading if the table cannot be sliced out.
+
+        :return: tuple(), (bool() heading was found, table element or None)
+        """
+        heading_match = re.search(r'id=["\']?' + re.escape(heading_id) + r'["\'\s>]', html_content)
+        if heading_match:
+            table_html = NFLTeamStadiums._slice_table_html(html_content, heading_match.end(), table_num_from_heading)
+            if table_html:
+                table_soup = rC.get_soup_from_html_content(table_html, parser=rC.get_fastest_html_parser())
+                return True, table_soup.find('table')
+
+        soup = rC.get_soup_from_html_content(html_content)
+        heading = soup.find(id=heading_id)
+        if not heading:
+            return False, None
+
+        return True, NFLTeamStadiums._find_table_under_heading(heading, table_num_from_heading)
+
     @staticmethod
     def _get_table_rows(table_element):
         return table_element.find_all('tr')
@@ -130,11 +771,12 @@ class NFLTeamStadiums:
         ref_bracket_loc = text_to_extract_from.find('[')
         return text_to_extract_from[:ref_bracket_loc] if ref_bracket_loc > -1 else text_to_extract_from
 
+    @traced('refresh.parse_table')
     def _parse_table_add_to_data(self, table_rows):
         (name_index, img_index, capacity_index, city_index, surface_index, roof_index, teams_or_events,
          date_opened_index, is_teams) = self._get_table_column_indices(table_rows)
 
-        index_count = len(self.data)
+        index_count = len(self._new_data)
         for row in table_rows[1:]:
             cells = row.find_all(['th', 'td'])
             name = self._clean_wiki_text(cells[name_index].text)
@@ -149,11 +791,11 @@ class NFLTeamStadiums:
             else:
                 has_redirect = False
             title = urllib.parse.unquote(temp_url.rsplit('/', 1)[-1])
-            self._stadium_metadata[title] = {}
-            self._stadium_metadata[title]['name'] = name
-            self._stadium_metadata[title]['url'] = f"https://en.wikipedia.org{temp_url}"
-            self._stadium_metadata[title]['index'] = index_count
-            self._stadium_metadata[title]['hasRedirect'] = has_redirect
+            self._new_stadium_metadata[title] = {}
+            self._new_stadium_metadata[title]['name'] = name
+            self._new_stadium_metadata[title]['url'] = f"https://en.wikipedia.org{temp_url}"
+            self._new_stadium_metadata[title]['index'] = index_count
+            self._new_stadium_metadata[title]['hasRedirect'] = has_redirect
             img_url = f"https://en.wikipedia.org{cells[img_index].find_all('a')[0].attrs['href']}"
             capacity = self._clean_wiki_text(cells[capacity_index].text.replace(",", ""))
             city = self._clean_wiki_text(cells[city_index].text)
@@ -177,39 +819,42 @@ class NFLTeamStadiums:
                 "yearOpened": int(year_opened)
             }
 
-            self.data.append(temp_dict.copy())
+            self._new_data.append(temp_dict.copy())
             index_count = index_count + 1
 
+    @traced('refresh.list_page')
     def _get_current_stadium_data(self):
         # Parameters for the API request
         params = {
             "action": "parse",
-            "page": "List of current NFL stadiums",
+            "page": self._stadium_list_page,
             "format": "json",
-            "prop": "text"
+            "prop": "text|revid"
         }
 
         # Make the API request
         self._check_print("INFO: Retrieving base stadium data from wikipedia")
-        response = rC.basic_request(self._main_url, params=params, headers=self._header)
+        response, = yield [(params, None)]
         data = response.json()
 
         # Extract the HTML content
         html_content = data['parse']['text']['*']
+        self._page_revid = data['parse'].get('revid')
+        self._page_bytes = len(response.content)
+        self._store_list_page_revid(params, self._page_revid)
 
-        # Parse the HTML content with BeautifulSoup
-        self._raw_soup = rC.get_soup_from_html_content(html_content)
-        fC.write_content_to_file(self._raw_soup_file, str(self._raw_soup))
+        self._raw_html = html_content
+        fC.write_content_to_file(self._raw_soup_file, html_content, fsync=True)
 
-        # find heading above table
-        heading = self._raw_soup.find(id=self._current_stadiums_wiki_section_name)
+        # find table under the heading
+        heading_found, table_element = self._get_table_under_heading(html_content,
+                                                                     self._current_stadiums_wiki_section_name,
+                                                                     self._current_stadiums_table_from_heading)
 
-        if not heading:
+        if not heading_found:
             print("ERROR: Could not get wikipedia current stadium data. The sections may have been updated.")
             return None
 
-        table_element = self._find_table_under_heading(heading, self._current_stadiums_table_from_heading)
-
         if not table_element:
             print("ERROR: Could not get wikipedia table data. Could not find current stadium table.")
             return None
@@ -218,16 +863,16 @@ class NFLTeamStadiums:
         self._parse_table_add_to_data(table_rows)
 
     def _get_other_stadium_data(self):
-        if self._raw_soup is None:
-            self._raw_soup = rC.get_soup_from_html_content(fC.read_file_content(self._raw_soup_file))
+        if self._raw_html is None:
+            self._raw_html = fC.read_file_content(self._raw_soup_file)
 
-        heading = self._raw_soup.find(id=self._additional_stadiums_wiki_section_name)
-        if not heading:
+        heading_found, table_element = self._get_table_under_heading(self._raw_html,
+                                                                     self._additional_stadiums_wiki_section_name,
+                                                                     self._additional_stadiums_table_from_heading)
+        if not heading_found:
             print("ERROR: Could not get wikipedia additional stadium data. The sections may have been updated.")
             return None
 
-        table_element = self._find_table_under_heading(heading, self._additional_stadiums_table_from_heading)
-
         if not table_element:
             print("ERROR: Could not get wikipedia table data. Could not find additional stadium table.")
             return None
@@ -240,7 +885,7 @@ class NFLTeamStadiums:
         This function adds the 'sharedStadium' and 'currentTeams' data
         :return:
         """
-        for stadium in self.data:
+        for stadium in self._new_data:
             found_current_teams = []
             for team in stadium['teams']:
                 found_team = self._get_normalized_team(team)
@@ -250,84 +895,165 @@ class NFLTeamStadiums:
             stadium['sharedStadium'] = False if len(found_current_teams) <= 1 else True
             stadium['currentTeams'] = found_current_teams.copy()
 
-    def _resolve_redirects(self, titles):
-        batch_size = 10
+    @staticmethod
+    def _request_batches(titles, request_batch, batch_size=10):
+        """
+        Splits titles into batches and requests all of them at once. request_batch returns the (params, parse)
+        request for one batch.
+
+        :return: list(), parse results in batch order
+        """
+        batches = [titles[i:i + batch_size] for i in range(0, len(titles), batch_size)]
+        if not batches:
+            return []
+
+        return (yield [request_batch(x) for x in batches])
+
+    def _request_redirects_batch(self, batch_titles):
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'titles': '|'.join(batch_titles),
+            'redirects': 1
+        }
+
+        return params, self._parse_redirects_response
+
+    def _parse_redirects_response(self, response):
         final_titles = {}
-        for i in range(0, len(titles), batch_size):
-            batch_titles = titles[i:i + batch_size]
-            batch_titles_str = '|'.join(batch_titles)
-
-            params = {
-                'action': 'query',
-                'format': 'json',
-                'titles': batch_titles_str,
-                'redirects': 1
-            }
+        if response.status_code == 200:
+            data = response.json()
+            redirects = data.get('query', {}).get('redirects', [])
 
-            response = rC.basic_request(self._main_url, params=params)
+            # Map original titles to final titles
+            for redirect in redirects:
+                final_titles[redirect['from'].replace(" ", "_")] = redirect['to'].replace(" ", "_")
+        else:
+            self._check_print(f"ERROR: Could not resolve stadium redirects. Status code: {response.status_code}")
 
-            if response.status_code == 200:
-                data = response.json()
-                redirects = data.get('query', {}).get('redirects', [])
+        return final_titles
 
-                # Map original titles to final titles
-                for redirect in redirects:
-                    final_titles[redirect['from'].replace(" ", "_")] = redirect['to'].replace(" ", "_")
+    @traced('refresh.redirects')
+    def _resolve_redirects(self, titles):
+        final_titles = {}
+        for batch_final_titles in (yield from self._request_batches(titles, self._request_redirects_batch)):
+            final_titles.update(batch_final_titles)
 
         return final_titles
 
-    def _add_stadium_coordinates_to_data(self):
-        titles = [x for x in self._stadium_metadata if self._stadium_metadata[x]['hasRedirect'] is False]
-        redirects = [x for x in self._stadium_metadata if self._stadium_metadata[x]['hasRedirect']]
-        resolved_redirects = self._resolve_redirects(redirects)
-        redirect_titles = list(resolved_redirects.values())
+    def _request_coordinates_batch(self, batch_titles):
+        # API parameters to get the coordinates and current revision of each page
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'prop': 'coordinates|info',
+            'titles': '|'.join(batch_titles)
+        }
 
-        for from_title, to_title in resolved_redirects.items():
-            self._stadium_metadata[from_title]['finalTitle'] = to_title
-            titles.append(to_title)
+        return params, self._parse_coordinates_response
 
-        batch_size = 10     # adjust if some data is not coming back (wikipedia api currently works with 10)
-        all_coordinates = {}
+    def _parse_coordinates_response(self, response):
+        if response.status_code != 200:
+            self._check_print("ERROR: Could not complete the API request to get coordinates for stadiums")
+            return {}, {}, {}
 
-        for i in range(0, len(titles), batch_size):
-            batch_titles = titles[i:i + batch_size]
-            batch_titles_str = '|'.join(batch_titles)
+        data = response.json()
 
-            # API parameters to get the full HTML content
-            params = {
-                'action': 'query',
-                'format': 'json',
-                'prop': 'coordinates',
-                'titles': batch_titles_str
-            }
+        # Process each page in the API response
+        batch_coordinates = {}
+        batch_revisions = {}
+        batch_bytes = {}
+        pages = data['query']['pages']
+        for page_id, page_data in pages.items():
+            title = page_data['title'].replace(" ", "_")
+            if "coordinates" in page_data:
+                coordinates = page_data["coordinates"][0]
+            else:
+                coordinates = None
+            batch_coordinates[title] = coordinates
+            batch_revisions[title] = page_data.get('lastrevid')
+            batch_bytes[title] = len(response.content) // len(pages)
 
-            response = rC.basic_request(self._main_url, headers=self._header, params=params)
-            if response.status_code != 200:
-                self._check_print("ERROR: Could not complete the API request to get coordinates for stadiums")
-                continue
+        return batch_coordinates, batch_revisions, batch_bytes
 
-            data = response.json()
+    def _request_revisions_batch(self, batch_titles):
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'prop': 'info',
+            'titles': '|'.join(batch_titles)
+        }
 
-            # Process each page in the API response
-            pages = data['query']['pages']
-            for page_id, page_data in pages.items():
-                title = page_data['title'].replace(" ", "_")
-                if "coordinates" in page_data:
-                    coordinates = page_data["coordinates"][0]
-                else:
-                    coordinates = None
-                all_coordinates[title] = coordinates
+        return params, self._parse_revisions_response
 
-            for title, coordinates in all_coordinates.items():
-                if title in redirect_titles:
-                    for key, value in resolved_redirects.items():
-                        if value == title:
-                            title = key
+    def _parse_revisions_response(self, response):
+        if response.status_code != 200:
+            self._check_print(f"ERROR: Could not check wikipedia revisions. Status code: {response.status_code}")
+            return {}
 
-                            break
-                data_index = self._stadium_metadata[title]['index']
-                # noinspection PyTypeChecker
-                self.data[data_index]['coordinates'] = coordinates
+        pages = response.json()['query']['pages']
+        return {x['title'].replace(" ", "_"): x.get('lastrevid') for x in pages.values()}
+
+    def _get_page_revisions(self, titles):
+        """
+        :param titles:  list() of str(), wikipedia page titles
+        :return:        dict(), title -> current revision id. Titles whose revision could not be retrieved are missing.
+        """
+        revisions = {}
+        # prop=info accepts up to 50 titles per request
+        for batch_revisions in (yield from self._request_batches(titles, self._request_revisions_batch,
+                                                                 batch_size=50)):
+            revisions.update(batch_revisions)
+
+        return revisions
+
+    @traced('refresh.coordinates')
+    def _add_stadium_coordinates_to_data(self, known_redirects=None, known_coordinates=None):
+        """
+        :param known_redirects:     dict(), optional. title -> final title for redirects that do not need resolving
+        :param known_coordinates:   dict(), optional. final title -> coordinates for pages that do not need querying.
+                                    Their revision in self._title_revisions is kept.
+        """
+        known_redirects = known_redirects if known_redirects else {}
+        known_coordinates = known_coordinates if known_coordinates else {}
+
+        titles = [x for x in self._new_stadium_metadata if self._new_stadium_metadata[x]['hasRedirect'] is False]
+        redirects = [x for x in self._new_stadium_metadata if self._new_stadium_metadata[x]['hasRedirect']]
+        resolved_redirects = {x: known_redirects[x] for x in redirects if x in known_redirects}
+        resolved_redirects.update((yield from self._resolve_redirects([x for x in redirects
+                                                                        if x not in known_redirects])))
+
+        # final title -> title used in the wiki table, to map coordinates back to the stadium
+        original_titles = {}
+        for from_title, to_title in resolved_redirects.items():
+            self._new_stadium_metadata[from_title]['finalTitle'] = to_title
+            original_titles.setdefault(to_title, from_title)
+            titles.append(to_title)
+
+        all_coordinates = {x: known_coordinates[x] for x in titles if x in known_coordinates}
+        title_revisions = {x: self._title_revisions.get(x) for x in all_coordinates}
+        title_bytes = {x: self._title_bytes.get(x) for x in all_coordinates}
+        titles_to_query = [x for x in titles if x not in known_coordinates]
+
+        # adjust batch_size if some data is not coming back (wikipedia api currently works with 10)
+        for batch_coordinates, batch_revisions, batch_bytes in (
+                yield from self._request_batches(titles_to_query, self._request_coordinates_batch, batch_size=10)):
+            all_coordinates.update(batch_coordinates)
+            title_revisions.update(batch_revisions)
+            title_bytes.update(batch_bytes)
+
+        for title, coordinates in all_coordinates.items():
+            title = original_titles.get(title, title)
+            if title not in self._new_stadium_metadata:
+                self._check_print(f"ERROR: Wikipedia returned coordinates for unknown stadium page {title}")
+                continue
+
+            data_index = self._new_stadium_metadata[title]['index']
+            # noinspection PyTypeChecker
+            self._new_data[data_index]['coordinates'] = coordinates
+
+        self._title_revisions = title_revisions
+        self._title_bytes = title_bytes
 
     def _check_create_project_structure(self):
         osC.check_create_directory(self._resources_dir)
@@ -337,11 +1063,7 @@ class NFLTeamStadiums:
             fC.dump_json_to_file(self._parsed_soup_file, {})
 
     def _get_normalized_team(self, search_team):
-        search_team = search_team.lower()
-        for team_list in self._team_lists:
-            if search_team in team_list:
-                return self._teams_city_short[team_list.index(search_team)].upper()
-        return None
+        return self._team_alias_index.get(search_team.lower())
 
     def get_list_of_stadium_names(self):
         """
@@ -349,7 +1071,7 @@ class NFLTeamStadiums:
 
         :return: list() of str()
         """
-        return [x['name'] for x in self.data]
+        return [x.name for x in self.data]
 
     def get_stadium_by_team(self, team):
         """
@@ -360,7 +1082,9 @@ class NFLTeamStadiums:
                         Mascot - e.g., Lions
                         Team Abbreviation - e.g, DET
 
-        :return:        dict(), JSON format of all available data for the given stadium for the provided team
+        :return:        Stadium(), all available data for the given stadium for the provided team. It is read only
+                        and can be read like a dict (stadium['roofType']) or by attribute (stadium.roof_type). Use
+                        to_dict() for a plain dict in the JSON format of the cache.
         """
 
         team = self._get_normalized_team(team)
@@ -373,14 +1097,16 @@ class NFLTeamStadiums:
                               )
             return None
 
-        teams = [x for x in self.data if team in x['currentTeams']]
+        snapshot = self._snapshot
+        self._check_lookup_indexes(snapshot)
+        teams = snapshot.stadiums_by_team.get(team, ())
 
         if len(teams) == 1:
             return teams[0]
         elif len(teams) > 1:
             self._check_print("WARNING: the team you provided plays at more than one stadium according to the data. "
                               "Both stadiums are returned in a list")
-            return teams
+            return list(teams)
         else:
             self._check_print("ERROR: the team you provided was recognized as a legitimate team, but there is no "
                               "data for them in the Wikipedia content.")
@@ -389,25 +1115,96 @@ class NFLTeamStadiums:
     def get_stadium_by_name(self, name):
         name = name.lower()
 
-        try:
-            return [x for x in self.data if x['name'].lower() == name][0]
-        except IndexError:
-            self._check_print(f"ERROR: {name} does not match a stadium name in the data. Use get_list_of_stadium_names"
-                              f" to get a list of valid stadium names.")
-            return None
+        snapshot = self._snapshot
+        self._check_lookup_indexes(snapshot)
+        stadium = snapshot.stadiums_by_name.get(name)
+        if stadium is None and self.verbose:
+            suggestion = ''
+            matches = self.search_stadiums(name, limit=1)
+            if matches:
+                suggestion = f" Did you mean {matches[0]['stadium'].name}?"
+            self._check_print(f"ERROR: {name} does not match a stadium name in the data.{suggestion} Use "
+                              f"get_list_of_stadium_names to get a list of valid stadium names, or search_stadiums "
+                              f"for inexact names.")
+
+        return stadium
+
+    def _get_stadium_search_index(self, snapshot):
+        if snapshot.stadium_search_index is None:
+            team_aliases = {}
+            for alias, team in self._get_team_aliases():
+                team_aliases.setdefault(team, []).append(alias)
+
+            entries = []
+            for i, stadium in enumerate(snapshot.data):
+                entries.append((stadium.name, i))
+                entries.append((stadium.city, i))
+                for team in stadium.current_teams:
+                    entries.extend((x, i) for x in team_aliases.get(team, []))
+            snapshot.stadium_search_index = TrigramIndex(entries)
+
+        return snapshot.stadium_search_index
+
+    def _get_team_search_index(self):
+        if self._team_search_index is None:
+            self._team_search_index = TrigramIndex(self._get_team_aliases())
+
+        return self._team_search_index
+
+    @staticmethod
+    def _search(search_index, query, limit, min_score, format_result):
+        def search_one(text):
+            return [format_result(*x) for x in search_index.search(text, limit=limit, min_score=min_score)]
+
+        if isinstance(query, str):
+            return search_one(query)
+        return [search_one(x) for x in query]
+
+    def search_stadiums(self, query, limit=5, min_score=0.3):
+        """
+        Fuzzy stadium search over stadium names, cities and the aliases of each stadium's teams, for messy input such
+        as "Arrowhead", "Mercedes Benz Stadium" or "NY Giants". Case, accents and punctuation are ignored.
+
+        :param query:       str(), text to look up. Pass a list() of str() to resolve many strings in one call.
+        :param limit:       int(), maximum number of stadiums returned per query (default 5)
+        :param min_score:   float(), matches scoring lower are dropped (default 0.3)
+
+        :return:            list() of dict(), {'stadium': stadium data, 'match': the name, city or team alias that
+                            matched, 'score': float() from 0 to 1, 1 for an exact match} best first. For a batch, a
+                            list() with one such list() per query.
+        """
+        snapshot = self._snapshot
+        return self._search(self._get_stadium_search_index(snapshot), query, limit, min_score,
+                            lambda score, text, key: {"stadium": snapshot.data[key], "match": text, "score": score})
+
+    def search_teams(self, query, limit=5, min_score=0.3):
+        """
+        Fuzzy version of the team formats accepted by get_stadium_by_team (City + Mascot, Mascot, Team Abbreviation),
+        for input such as "NY Giants" or "KC chiefs". Case, accents and punctuation are ignored.
+
+        :param query:       str(), text to look up. Pass a list() of str() to resolve many strings in one call.
+        :param limit:       int(), maximum number of teams returned per query (default 5)
+        :param min_score:   float(), matches scoring lower are dropped (default 0.3)
+
+        :return:            list() of dict(), {'team': team abbreviation, 'match': the team alias that matched,
+                            'score': float() from 0 to 1, 1 for an exact match} best first. For a batch, a list()
+                            with one such list() per query.
+        """
+        return self._search(self._get_team_search_index(), query, limit, min_score,
+                            lambda score, text, key: {"team": key, "match": text, "score": score})
 
     def get_stadium_coordinates_by_team(self, team):
         try:
             # noinspection PyTypeChecker
             return self.get_stadium_by_team(team)["coordinates"]
-        except TypeError or KeyError:
+        except (TypeError, KeyError):
             return None
 
     def get_stadium_coordinates_by_name(self, name):
         try:
             # noinspection PyTypeChecker
             return self.get_stadium_by_name(name)["coordinates"]
-        except TypeError or KeyError:
+        except (TypeError, KeyError):
             return None
 
     def calculate_distance_between_stadiums(self, team_stadium1, team_stadium2, name_stadium1=None, name_stadium2=None):
@@ -427,28 +1224,6 @@ class NFLTeamStadiums:
                                  https://en.wikipedia.org/wiki/Haversine_formula
         """
 
-        def calculate_haversine_distance(coord1, coord2):
-            # Radius of the Earth in miles
-            radius = 3958.8
-
-            # Coordinates in decimal degrees
-            lat1, lon1 = coord1['lat'], coord1['lon']
-            lat2, lon2 = coord2['lat'], coord2['lon']
-
-            # Convert latitude and longitude from degrees to radians
-            lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-
-            # Haversine formula
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
-            c = 2 * math.asin(math.sqrt(a))
-
-            # Distance in miles
-            distance = radius * c
-
-            return distance
-
         if name_stadium1 is not None:
             stadium1_coords = self.get_stadium_coordinates_by_name(name_stadium1)
         else:
@@ -462,10 +1237,437 @@ class NFLTeamStadiums:
         if stadium1_coords is None or stadium2_coords is None:
             return None
         else:
-            return calculate_haversine_distance(stadium1_coords, stadium2_coords)
+            return self._calculate_haversine_distance(stadium1_coords, stadium2_coords)
+
+    def distance_matrix(self, use_numpy=True, float32=False):
+        """
+        Calculates the distance in miles between every pair of stadiums at once by using stadium coordinates and the
+        haversine formula (https://en.wikipedia.org/wiki/Haversine_formula). The matrix is cached on the instance and
+        rebuilt when the stadium data is refreshed.
+
+        Rows and columns are in the same order as get_list_of_stadium_names(). Stadiums without coordinates have nan
+        (numpy or float32) or None (pure python) distances. Use get_distance_from_matrix to look up a pair by team or
+        stadium name.
+
+        :param use_numpy:   bool(), if True and numpy is installed, the matrix is computed with vectorized numpy
+                            arrays. Otherwise a pure python list of lists is built.
+        :param float32:     bool(), if True, distances are stored as 32-bit floats to halve the memory used.
+
+        :return:            numpy.ndarray(), or list() of list() / array('f') rows without numpy. N x N distances
+                            in miles.
+        """
+        return self._get_distance_matrix(self._snapshot, use_numpy, float32)
+
+    def _get_distance_matrix(self, snapshot, use_numpy, float32):
+        use_numpy = use_numpy and _import_numpy() is not None
+        cache_key = (use_numpy, float32)
+        matrix = snapshot.distance_matrices.get(cache_key)
+        if matrix is None:
+            coordinates = [x.coordinates for x in snapshot.data]
+            if use_numpy:
+                matrix = self._calculate_haversine_matrix_numpy(coordinates, 'float32' if float32 else 'float64')
+            else:
+                matrix = self._calculate_haversine_matrix_python(coordinates, float32)
+            snapshot.distance_matrices[cache_key] = matrix
+
+        return matrix
+
+    def get_distance_from_matrix(self, stadium1, stadium2, use_numpy=True, float32=False):
+        """
+        Looks up the distance in miles between two stadiums in the cached distance_matrix. Much faster than
+        calculate_distance_between_stadiums when many pairs are needed.
+
+        :param stadium1:    str(), team (e.g., DET, Lions, Detroit Lions) or stadium name (e.g., Ford Field)
+        :param stadium2:    str(), team or stadium name
+        :param use_numpy:   bool(), see distance_matrix
+        :param float32:     bool(), see distance_matrix
+
+        :return:            float(), distance in miles. None if either stadium was not recognized or has no
+                            coordinates.
+        """
+        snapshot = self._snapshot
+        row = self._get_distance_matrix_index(snapshot, stadium1)
+        column = self._get_distance_matrix_index(snapshot, stadium2)
+        if row is None or column is None:
+            return None
+
+        distance = self._get_distance_matrix(snapshot, use_numpy, float32)[row][column]
+        if distance is None or distance != distance:
+            return None
+
+        return float(distance)
+
+    def _get_distance_matrix_index(self, snapshot, team_or_name):
+        self._check_lookup_indexes(snapshot)
+        index = snapshot.distance_matrix_index.get(team_or_name.lower())
+        if index is None:
+            team = self._get_normalized_team(team_or_name)
+            if team in snapshot.stadiums_by_team:
+                index = snapshot.distance_matrix_index.get(snapshot.stadiums_by_team[team][0].name.lower())
+
+        return index
+
+    def _get_spatial_index(self, snapshot):
+        if snapshot.spatial_index is None:
+            snapshot.spatial_index = SpatialIndex([(x.coordinates.lat, x.coordinates.lon, x)
+                                                   for x in snapshot.data if x.coordinates is not None],
+                                                  radius=self._earth_radius_miles)
+
+        return snapshot.spatial_index
+
+    @staticmethod
+    def _query_spatial_index(query, lat, lon):
+        def format_results(results):
+            return [{"stadium": stadium, "distance": distance} for distance, stadium in results]
+
+        # Any sequence or array of latitudes is a batch. numpy arrays are not a Sequence, but have ndim > 0.
+        if (isinstance(lat, Sequence) and not isinstance(lat, str)) or getattr(lat, 'ndim', 0) > 0:
+            return [format_results(query(float(x), float(y))) for x, y in zip(lat, lon)]
+
+        return format_results(query(lat, lon))
+
+    def nearest_stadiums(self, lat, lon, k=1):
+        """
+        Finds the stadiums closest to a location (hotel, airport, another stadium...) using a spatial index over the
+        stadium coordinates.
+
+        :param lat:     float(), latitude in decimal degrees. Pass a list(), tuple() or numpy array of latitudes (and
+                        matching longitudes) to query many locations in one call.
+        :param lon:     float(), longitude in decimal degrees, or a list(), tuple() or numpy array of them
+        :param k:       int(), number of stadiums to return per location (default 1). None are returned if k < 1.
+
+        :return:        list() of dict(), {'stadium': stadium data, 'distance': great-circle miles} sorted closest
+                        first. For a batch, a list() with one such list() per location.
+        """
+        spatial_index = self._get_spatial_index(self._snapshot)
+        return self._query_spatial_index(lambda x, y: spatial_index.nearest(x, y, k), lat, lon)
+
+    def stadiums_within(self, lat, lon, miles):
+        """
+        Finds every stadium within a distance of a location using a spatial index over the stadium coordinates.
+
+        :param lat:     float(), latitude in decimal degrees. Pass a list(), tuple() or numpy array of latitudes (and
+                        matching longitudes) to query many locations in one call.
+        :param lon:     float(), longitude in decimal degrees, or a list(), tuple() or numpy array of them
+        :param miles:   float(), search radius in miles
+
+        :return:        list() of dict(), {'stadium': stadium data, 'distance': great-circle miles} sorted closest
+                        first. For a batch, a list() with one such list() per location.
+        """
+        spatial_index = self._get_spatial_index(self._snapshot)
+        return self._query_spatial_index(lambda x, y: spatial_index.within(x, y, miles), lat, lon)
+
+    def query(self, roof_type=None, surface=None, city=None, capacity=None, year_opened=None):
+        """
+        Filters the stadiums by attribute using indexes built once per data refresh, so compound filters are answered
+        by intersecting the indexes of each filter rather than checking every stadium. Filters left as None are not
+        applied.
+
+        :param roof_type:   str(), e.g., Retractable. Pass a list() of str() to accept any of them, e.g., ['Fixed',
+                            'Retractable']. Case and extra whitespace are ignored.
+        :param surface:     str() or list() of str(), e.g., Grass. Same matching as roof_type.
+        :param city:        str() or list() of str(), e.g., 'Detroit, Michigan'. Same matching as roof_type.
+        :param capacity:    tuple(), (minimum, maximum), both inclusive, either can be None for no bound. E.g.,
+                            (70000, None). An int() matches exactly.
+        :param year_opened: tuple(), (first, last) year, same as capacity. E.g., (2000, None) for stadiums opened in
+                            2000 or later.
+
+        :return:            list() of Stadium(), the stadiums matching every filter, in the same order as
+                            get_list_of_stadium_names()
+        """
+        categories = {}
+        for attribute, values in [('roof_type', roof_type), ('surface', surface), ('city', city)]:
+            if values is not None:
+                categories[attribute] = [values] if isinstance(values, str) else values
+
+        ranges = {}
+        for attribute, bounds in [('capacity', capacity), ('year_opened', year_opened)]:
+            if bounds is None:
+                continue
+            if isinstance(bounds, int):
+                bounds = (bounds, bounds)
+            if len(bounds) != 2:
+                raise ValueError(f"{attribute} must be an int() or a (minimum, maximum) tuple, not {bounds!r}")
+            ranges[attribute] = tuple(bounds)
+
+        snapshot = self._snapshot
+        return [snapshot.data[x] for x in self._get_attribute_index(snapshot).select(categories, ranges)]
+
+    @staticmethod
+    def _get_attribute_index(snapshot):
+        if snapshot.attribute_index is None:
+            snapshot.attribute_index = AttributeIndex(snapshot.data, categorical=['roof_type', 'surface', 'city'],
+                                                      ranges=['capacity', 'year_opened'])
+
+        return snapshot.attribute_index
+
+    def get_season_travel(self, schedule, use_numpy=True):
+        """
+        Calculates how far every team travels over a season in one pass over the cached distance_matrix. Teams start
+        the season at their home stadium, travel to every road or neutral site game (straight from one road game to
+        the next on back-to-back road legs), stay home during home games and bye weeks and end the season back home.
+
+        :param schedule:    list() of tuple(), one (week, home team, away team) tuple per game, or (week, home team,
+                            away team, venue) for neutral site games, where venue is a stadium name (e.g., Wembley
+                            Stadium) or a team whose stadium is used. Teams may be in any format accepted by
+                            get_stadium_by_team. E.g., [(1, 'DET', 'LAR'), (5, 'Jaguars', 'Bills', 'Tottenham Hotspur
+                            Stadium')]
+        :param use_numpy:   bool(), see distance_matrix
+
+        :return:            dict(), team abbreviation -> dict() with
+                            'totalMiles': float()
+                            'weeklyMiles': dict(), week -> miles traveled to reach that week's game location. The trip
+                            home after the season is included in the last week.
+                            'cumulativeMiles': dict(), week -> miles traveled so far
+                            'longestTrip': dict(), 'fromWeek', 'toWeek', 'from' and 'to' (stadium names) and 'miles'.
+                            fromWeek is None for the trip out of home before the season, toWeek None for the trip home
+                            after it. None if the team never travels.
+                            'backToBackRoadLegs': list() of dict(), same keys as longestTrip, one per trip straight
+                            from one road game to the next.
+                            Miles are nan for trips to a stadium without coordinates. None if a team or venue was not
+                            recognized.
+        """
+        snapshot = self._snapshot
+        season = self._get_season_games(snapshot, [schedule])
+        if season is None:
+            return None
+
+        teams, weeks, home, games = season
+        if use_numpy and _import_numpy() is not None:
+            locations, legs, _, _ = self._calculate_season_legs_numpy(snapshot, weeks, home, games, 1)
+            locations, legs = locations.tolist(), legs[0].tolist()
+        else:
+            locations = self._get_season_locations(weeks, home, games, 1)
+            matrix = self._get_distance_matrix(snapshot, False, False)
+            nan = float('nan')
+            legs = [[nan if matrix[x[i]][x[i + 1]] is None else matrix[x[i]][x[i + 1]] for i in range(len(x) - 1)]
+                    for x in locations[0]]
+
+        # leg i goes from position i to i + 1 of a team's locations. Position 0 is home before the season, 1 to
+        # len(weeks) the weeks and the last one home after the season.
+        def get_week(position):
+            return weeks[position - 1] if 0 < position <= len(weeks) else None
+
+        travel = {}
+        for t, team in enumerate(teams):
+            team_legs = legs[t]
+            team_locations = locations[0][t]
+
+            def get_trip(leg):
+                return {"fromWeek": get_week(leg), "toWeek": get_week(leg + 1),
+                        "from": snapshot.data[team_locations[leg]].name,
+                        "to": snapshot.data[team_locations[leg + 1]].name, "miles": team_legs[leg]}
+
+            weekly_miles = {}
+            cumulative_miles = {}
+            total = 0.0
+            for i, week in enumerate(weeks):
+                miles = team_legs[i] + (team_legs[-1] if i == len(weeks) - 1 else 0.0)
+                total = total + miles
+                weekly_miles[week] = miles
+                cumulative_miles[week] = total
+
+            longest_trip = None
+            trips = [i for i in range(len(team_legs)) if team_legs[i] > 0]
+            if trips:
+                longest_trip = get_trip(max(trips, key=lambda x: team_legs[x]))
+
+            travel[team] = {
+                "totalMiles": total,
+                "weeklyMiles": weekly_miles,
+                "cumulativeMiles": cumulative_miles,
+                "longestTrip": longest_trip,
+                "backToBackRoadLegs": [get_trip(i) for i in range(1, len(weeks))
+                                       if team_locations[i] != home[t] and team_locations[i + 1] != home[t]]
+            }
+
+        return travel
+
+    def get_season_travel_arrays(self, schedules):
+        """
+        Vectorized get_season_travel for many schedules at once, e.g., thousands of simulated seasons for a Monte Carlo
+        model. Every schedule is resolved to stadium indexes and all of them are measured with a single lookup into the
+        cached distance_matrix. Requires numpy.
+
+        :param schedules:   list() of schedules, each in the format accepted by get_season_travel
+
+        :return:            dict(), 'teams' (list() of team abbreviations, the team axis), 'weeks' (sorted list() of
+                            every week in any schedule, the week axis) and numpy arrays with one row per schedule:
+                            'weeklyMiles' and 'cumulativeMiles' (schedules x teams x weeks),
+                            'totalMiles' and 'longestTripMiles' (schedules x teams) and
+                            'backToBackRoadLegs' (schedules x teams, number of trips straight from one road game to
+                            the next).
+                            None if a team or venue was not recognized.
+        """
+        np = _import_numpy()
+        if np is None:
+            raise ImportError("get_season_travel_arrays requires numpy")
+
+        snapshot = self._snapshot
+        season = self._get_season_games(snapshot, schedules)
+        if season is None:
+            return None
+
+        teams, weeks, home, games = season
+        _, legs, weekly_miles, back_to_back = self._calculate_season_legs_numpy(snapshot, weeks, home, games,
+                                                                                len(schedules))
+        return {
+            "teams": teams,
+            "weeks": weeks,
+            "weeklyMiles": weekly_miles,
+            "cumulativeMiles": np.cumsum(weekly_miles, axis=-1),
+            "totalMiles": legs.sum(axis=-1),
+            "longestTripMiles": legs.max(axis=-1, initial=0.0),
+            "backToBackRoadLegs": back_to_back.sum(axis=-1)
+        }
+
+    def _get_season_games(self, snapshot, schedules):
+        """
+        Resolves every game of every schedule to team, week and stadium positions. Each distinct team, week and venue
+        string is resolved once, however many schedules it appears in.
+
+        :return: tuple(), (teams, weeks, home, games). home is the distance_matrix index of each team's stadium and
+                 games a dict() of flat lists with one value per game of every schedule: 'schedule' (position in
+                 schedules), 'week' (1 + position in weeks), 'home' and 'away' (positions in teams) and 'venue'
+                 (distance_matrix index of where the game is played). None if a team or venue was not recognized.
+        """
+        all_games = [x for schedule in schedules for x in schedule]
+        team_positions = {}
+        for team in {x[1] for x in all_games} | {x[2] for x in all_games}:
+            team_positions[team] = self._get_normalized_team(team)
+            if team_positions[team] is None:
+                self._check_print(f"ERROR: The team {team} in the schedule was not recognized.")
+                return None
+
+        venues = {}
+        for venue in {x[3] for x in all_games if len(x) > 3 and x[3] is not None}:
+            venues[venue] = self._get_distance_matrix_index(snapshot, venue)
+            if venues[venue] is None:
+                self._check_print(f"ERROR: The venue {venue} in the schedule was not recognized.")
+                return None
+
+        teams = sorted(set(team_positions.values()))
+        home = [self._get_distance_matrix_index(snapshot, x) for x in teams]
+        for team, home_index in zip(teams, home):
+            if home_index is None:
+                self._check_print(f"ERROR: There is no stadium data for {team}.")
+                return None
+
+        normalized_positions = {x: i for i, x in enumerate(teams)}
+        team_positions = {k: normalized_positions[v] for k, v in team_positions.items()}
+        weeks = sorted({x[0] for x in all_games})
+        week_positions = {x: i + 1 for i, x in enumerate(weeks)}
+
+        home_teams = [team_positions[x[1]] for x in all_games]
+        games = {
+            "schedule": [i for i, schedule in enumerate(schedules) for _ in schedule],
+            "week": [week_positions[x[0]] for x in all_games],
+            "home": home_teams,
+            "away": [team_positions[x[2]] for x in all_games],
+            "venue": [venues[x[3]] if len(x) > 3 and x[3] is not None else home[t]
+                      for x, t in zip(all_games, home_teams)]
+        }
+        return teams, weeks, home, games
+
+    @staticmethod
+    def _get_season_locations(weeks, home, games, schedule_count):
+        """
+        :return: list(), locations[schedule][team] is the list() of stadium indexes the team is at: home before the
+                 season, one per week (home during home games and bye weeks) and home after the season
+        """
+        locations = [[[x] * (len(weeks) + 2) for x in home] for _ in range(schedule_count)]
+        for schedule, week, home_team, away_team, venue in zip(games['schedule'], games['week'], games['home'],
+                                                                 games['away'], games['venue']):
+            locations[schedule][home_team][week] = venue
+            locations[schedule][away_team][week] = venue
+
+        return locations
+
+    def _calculate_season_legs_numpy(self, snapshot, weeks, home, games, schedule_count):
+        """
+        :return: tuple(), numpy arrays (locations, legs, weekly miles, back to back). locations is the
+                 _get_season_locations layout (schedules x teams x weeks + 2), legs the miles of every trip between
+                 consecutive locations (schedules x teams x weeks + 1), weekly miles the miles traveled to reach each
+                 week's location with the trip home after the season added to the last week (schedules x teams x
+                 weeks) and back to back whether each trip between weeks goes straight from one road location to
+                 another (schedules x teams x weeks - 1).
+        """
+        np = _import_numpy()
+        matrix = self._get_distance_matrix(snapshot, True, False)
+        home = np.asarray(home, dtype=np.intp)
+        locations = np.empty((schedule_count, len(home), len(weeks) + 2), dtype=np.intp)
+        locations[...] = home[:, np.newaxis]
+        schedule = np.asarray(games['schedule'], dtype=np.intp)
+        week = np.asarray(games['week'], dtype=np.intp)
+        venue = np.asarray(games['venue'], dtype=np.intp)
+        locations[schedule, np.asarray(games['home'], dtype=np.intp), week] = venue
+        locations[schedule, np.asarray(games['away'], dtype=np.intp), week] = venue
+
+        legs = matrix[locations[..., :-1], locations[..., 1:]]
+        weekly_miles = legs[..., :-1].copy()
+        if weekly_miles.shape[-1]:
+            weekly_miles[..., -1] += legs[..., -1]
+
+        road = locations != home[:, np.newaxis]
+        back_to_back = road[..., 1:-2] & road[..., 2:-1]
+        return locations, legs, weekly_miles, back_to_back
+
+    @staticmethod
+    def _calculate_haversine_distance(coord1, coord2):
+        # Coordinates in decimal degrees
+        lat1, lon1 = coord1['lat'], coord1['lon']
+        lat2, lon2 = coord2['lat'], coord2['lon']
+
+        # Convert latitude and longitude from degrees to radians
+        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+
+        # Haversine formula
+        dlat = lat2 - lat1
+        dlon = lon2 - lon1
+        a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+        c = 2 * math.asin(math.sqrt(a))
+
+        # Distance in miles
+        distance = NFLTeamStadiums._earth_radius_miles * c
+
+        return distance
+
+    @staticmethod
+    def _calculate_haversine_matrix_numpy(coordinates, dtype):
+        np = _import_numpy()
+        nan = float('nan')
+        lat = np.radians(np.array([x['lat'] if x else nan for x in coordinates], dtype=dtype))
+        lon = np.radians(np.array([x['lon'] if x else nan for x in coordinates], dtype=dtype))
+
+        # Haversine formula, broadcast over every (row, column) pair
+        dlat = lat[np.newaxis, :] - lat[:, np.newaxis]
+        dlon = lon[np.newaxis, :] - lon[:, np.newaxis]
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, np.newaxis] * np.cos(lat)[np.newaxis, :] * np.sin(dlon / 2) ** 2
+        c = 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+        return (NFLTeamStadiums._earth_radius_miles * c).astype(dtype, copy=False)
+
+    @staticmethod
+    def _calculate_haversine_matrix_python(coordinates, float32):
+        size = len(coordinates)
+        matrix = [[None] * size for _ in range(size)]
+        for i in range(size):
+            if not coordinates[i]:
+                continue
+            matrix[i][i] = 0.0
+            for j in range(i + 1, size):
+                if coordinates[j]:
+                    distance = NFLTeamStadiums._calculate_haversine_distance(coordinates[i], coordinates[j])
+                    matrix[i][j] = distance
+                    matrix[j][i] = distance
+
+        if float32:
+            matrix = [array('f', [float('nan') if x is None else x for x in row]) for row in matrix]
+
+        return matrix
 
     def get_weather_forecast_for_stadium(self, team, day, hour_start=0, hour_end=23, day_format="%Y-%m-%d",
-                                         timezone='America/New_York', stadium_name=None):
+                                         timezone='America/New_York', stadium_name=None, output_format='dict'):
         """
         :param team:            str(), used to retrieve the stadium for which you want weather. Alternatively, use
                                 the stadium_name parameter.
@@ -489,8 +1691,27 @@ class NFLTeamStadiums:
 
         :param stadium_name:    str(), optional, If provided, will utilize this parameter instead of team parameter to
                                 retrieve stadium information.
+
+        :param output_format:   str(), 'dict' (default) returns every hourly variable as a list. 'columnar' returns
+                                the hourly variables as numpy arrays instead: time as datetime64[m] and every other
+                                variable as float64 with nan for missing values. The hourly dict can be passed
+                                straight to pandas.DataFrame. Requires numpy.
+        """
+        params, start_datetime_obj, end_datetime_obj = self._get_forecast_request(team, day, hour_start, hour_end,
+                                                                                  day_format, timezone, stadium_name,
+                                                                                  output_format)
+        weather_data = self._get_weather_data(params)
+        return self._get_forecast_window(weather_data, start_datetime_obj, end_datetime_obj, output_format)
+
+    def _get_forecast_request(self, team, day, hour_start, hour_end, day_format, timezone, stadium_name,
+                              output_format):
+        """
+        :return: tuple(), (Open Meteo API parameters, first hour, last hour) for get_weather_forecast_for_stadium
         """
-        base_url = "https://api.open-meteo.com/v1/forecast"
+        if output_format not in ('dict', 'columnar'):
+            raise ValueError(f"output_format must be 'dict' or 'columnar', not {output_format!r}")
+        if output_format == 'columnar' and _import_numpy() is None:
+            raise ImportError("output_format='columnar' requires numpy")
 
         if stadium_name is not None:
             coords = self.get_stadium_coordinates_by_name(stadium_name)
@@ -504,10 +1725,72 @@ class NFLTeamStadiums:
         end_datetime_str = f"{day} {hour_end}:00:00"
         start_datetime_obj = datetime.strptime(start_datetime_str, f"{day_format} %H:%M:%S")
         end_datetime_obj = datetime.strptime(end_datetime_str, f"{day_format} %H:%M:%S")
-        start_date = start_datetime_obj.strftime("%Y-%m-%dT%H:00:00Z")
-        end_date = end_datetime_obj.strftime("%Y-%m-%dT%H:00:00Z")
+        params = self._get_weather_params(lat, lon, start_datetime_obj.strftime("%Y-%m-%d"),
+                                          end_datetime_obj.strftime("%Y-%m-%d"), timezone)
+        return params, start_datetime_obj, end_datetime_obj
 
-        params = {
+    def _get_forecast_window(self, weather_data, start_datetime_obj, end_datetime_obj, output_format):
+        if weather_data is not None:
+            weather_data['hourly'] = self._filter_hourly_window(weather_data['hourly'], start_datetime_obj,
+                                                                end_datetime_obj)
+            if output_format == 'columnar':
+                weather_data['hourly'] = self._get_columnar_hourly(weather_data['hourly'])
+
+            return weather_data
+        else:
+            return None
+
+    @staticmethod
+    def _filter_hourly_window(hourly, start_datetime_obj, end_datetime_obj):
+        """
+        Keeps the hours from start_datetime_obj through end_datetime_obj. Open Meteo returns one value per hour, so
+        the window is found from the first and last timestamps alone and every variable is sliced once. Falls back to
+        checking each timestamp when the times are not a regular hourly grid.
+        """
+        times = hourly['time']
+        if not times:
+            return hourly
+
+        hour = timedelta(hours=1)
+        first = datetime.strptime(times[0], '%Y-%m-%dT%H:%M')
+        last = datetime.strptime(times[-1], '%Y-%m-%dT%H:%M')
+        if last - first == hour * (len(times) - 1):
+            start = max(0, math.ceil((start_datetime_obj - first) / hour))
+            end = min(len(times), math.floor((end_datetime_obj - first) / hour) + 1)
+            window = slice(start, max(start, end))
+            if window.start == 0 and window.stop == len(times):
+                return hourly
+
+            return {key: values[window] for key, values in hourly.items()}
+
+        indices = [i for i, t in enumerate(times)
+                   if start_datetime_obj <= datetime.strptime(t, '%Y-%m-%dT%H:%M') <= end_datetime_obj]
+        if len(indices) == len(times):
+            return hourly
+
+        return {key: [values[x] for x in indices] for key, values in hourly.items()}
+
+    @staticmethod
+    def _get_columnar_hourly(hourly):
+        np = _import_numpy()
+        columnar = {}
+        for key, values in hourly.items():
+            if key == 'time':
+                columnar[key] = np.array(values, dtype='datetime64[m]')
+            else:
+                # None (missing value) becomes nan
+                columnar[key] = np.array(values, dtype='float64')
+
+        return columnar
+
+    @staticmethod
+    def _get_weather_params(lat, lon, start_date, end_date, timezone):
+        """
+        :param start_date:  str(), first day in %Y-%m-%d format
+        :param end_date:    str(), last day in %Y-%m-%d format
+        :return:            dict(), Open Meteo API parameters
+        """
+        return {
             'latitude': lat,
             'longitude': lon,
             'hourly': 'temperature_2m,apparent_temperature,precipitation_probability,precipitation,rain,'
@@ -516,35 +1799,546 @@ class NFLTeamStadiums:
             'temperature_unit': 'fahrenheit',
             'wind_speed_unit': 'mph',
             'precipitation_unit': 'inch',
-            'start_date': start_date.split('T')[0],
-            'end_date': end_date.split('T')[0],
+            'start_date': start_date,
+            'end_date': end_date,
             'timezone': timezone
         }
 
-        response = rC.basic_request(base_url, params=params)
+    @staticmethod
+    def _get_weather_location_key(params):
+        # Everything except the date range, so every range fetched for one location and set of variables matches
+        return WeatherCache.make_key({k: v for k, v in params.items() if k not in ('start_date', 'end_date')})
 
-        if response.status_code == 200:
-            weather_data = response.json()
-
-            indices = []
-            re_structure = False
-            for i, t in enumerate(weather_data['hourly']['time']):
-                tc = datetime.strptime(t, '%Y-%m-%dT%H:%M')
-                if start_datetime_obj <= tc <= end_datetime_obj:
-                    indices.append(i)
-                else:
-                    re_structure = True
+    def _get_weather_data(self, params):
+        """
+        Requests weather from Open Meteo, serving it from a prefetched range or the weather cache when possible.
+        Stadiums shared by more than one team have the same coordinates, so their teams share cache entries, and
+        identical requests made at the same time from different threads share one request.
 
-            if re_structure:
-                for key in weather_data['hourly']:
-                    new_list = [weather_data['hourly'][key][x] for x in indices]
-                    weather_data['hourly'][key] = new_list.copy()
+        :param params:  dict(), Open Meteo API parameters
+        :return:        dict(), a fresh copy of the response json the caller is free to modify. None if the request
+                        failed.
+        """
+        cache_key = WeatherCache.make_key(params)
+        with self._weather_lock:
+            future = self._weather_in_flight.get(cache_key)
+            is_owner = future is None
+            if is_owner:
+                from concurrent.futures import Future
+                future = Future()
+                self._weather_in_flight[cache_key] = future
+
+        if is_owner:
+            try:
+                weather_data = self._load_weather_data(params, cache_key)
+                future.set_result(weather_data)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._weather_lock:
+                    del self._weather_in_flight[cache_key]
+        else:
+            self._increment('weather.coalesced')
+            weather_data = future.result()
+
+        return copy.deepcopy(weather_data) if weather_data is not None else None
 
+    def _load_weather_data(self, params, cache_key):
+        # The returned data is shared with the prefetched ranges and the weather cache, callers must copy it
+        weather_data = self._get_stored_weather_data(params, cache_key)
+        if weather_data is not None:
             return weather_data
+
+        try:
+            response = rC.basic_request(self._weather_url, params=params, instrumentation=self._instrumentation)
+        except Exception as e:
+            # Raised to the caller, counted here like the failed responses _parse_weather_response counts
+            self._increment('weather.failures', tags={'error': type(e).__name__})
+            raise
+        return self._parse_weather_response(response, cache_key, params)
+
+    def _get_stored_weather_data(self, params, cache_key):
+        """
+        :return: dict(), weather from a prefetched range or the weather cache, None if it has to be requested
+        """
+        weather_data = self._get_prefetched_weather(params)
+        if weather_data is not None:
+            self._increment('weather.prefetch_hits')
+            return weather_data
+
+        if self._weather_cache is not None:
+            weather_data = self._weather_cache.get(cache_key)
+            if weather_data is not None:
+                self._increment('weather.cache_hits')
+                return weather_data
+            self._increment('weather.cache_misses')
+
+        return None
+
+    def _parse_weather_response(self, response, cache_key, params):
+        return self._parse_weather_batch_response(response, [(cache_key, params)])[0]
+
+    def _get_weather_data_many(self, params_list, max_workers=16):
+        """
+        Batched version of _get_weather_data. The locations that are not prefetched or cached are packed into as few
+        requests as possible: Open Meteo returns one forecast per location of a comma separated list, so requests that
+        only differ by location share one request of up to self._weather_batch_size locations. Locations another
+        thread is already requesting are waited on rather than requested again.
+
+        :param params_list: list() of dict(), Open Meteo API parameters for a single location each
+        :param max_workers: int(), maximum number of batched requests in flight at once (default 16)
+        :return:            list() of tuple(), (weather data, error) in the same order as params_list. The weather
+                            data is a fresh copy, None if the request failed. error is the Exception() raised by the
+                            request, or None.
+        """
+        cache_keys = [WeatherCache.make_key(x) for x in params_list]
+        owned = {}
+        waiting = {}
+        with self._weather_lock:
+            for params, cache_key in zip(params_list, cache_keys):
+                if cache_key in owned or cache_key in waiting:
+                    continue
+
+                future = self._weather_in_flight.get(cache_key)
+                if future is None:
+                    from concurrent.futures import Future
+                    future = Future()
+                    self._weather_in_flight[cache_key] = future
+                    owned[cache_key] = (params, future)
+                else:
+                    waiting[cache_key] = future
+
+        results = {}
+        try:
+            to_request = {}
+            for cache_key, (params, _) in owned.items():
+                weather_data = self._get_stored_weather_data(params, cache_key)
+                if weather_data is None:
+                    to_request[cache_key] = params
+                else:
+                    results[cache_key] = (weather_data, None)
+
+            batches = self._get_weather_batches(to_request)
+            if len(batches) <= 1:
+                batch_results = [self._load_weather_batch(x) for x in batches]
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+                with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+                    batch_results = list(executor.map(self._load_weather_batch, batches))
+            for batch_result in batch_results:
+                results.update(batch_result)
+        except BaseException as e:
+            for _, future in owned.values():
+                future.set_exception(e)
+            raise
         else:
+            for cache_key, (_, future) in owned.items():
+                weather_data, error = results[cache_key]
+                if error is None:
+                    future.set_result(weather_data)
+                else:
+                    future.set_exception(error)
+        finally:
+            with self._weather_lock:
+                for cache_key in owned:
+                    del self._weather_in_flight[cache_key]
+
+        for cache_key, future in waiting.items():
+            self._increment('weather.coalesced')
+            try:
+                results[cache_key] = (future.result(), None)
+            except Exception as e:
+                results[cache_key] = (None, e)
+
+        return [(copy.deepcopy(weather_data) if weather_data is not None else None, error)
+                for weather_data, error in (results[x] for x in cache_keys)]
+
+    def _get_weather_batches(self, params_by_key):
+        """
+        :param params_by_key:   dict(), cache key -> Open Meteo API parameters of the locations to request
+        :return:                list() of list() of tuple(), (cache key, parameters) for the locations of each request
+        """
+        groups = {}
+        for cache_key, params in params_by_key.items():
+            # Everything except the location has to match to share a request
+            batch_key = WeatherCache.make_key({k: v for k, v in params.items() if k not in ('latitude', 'longitude')})
+            groups.setdefault(batch_key, []).append((cache_key, params))
+
+        batch_size = max(1, self._weather_batch_size)
+        return [group[i:i + batch_size] for group in groups.values() for i in range(0, len(group), batch_size)]
+
+    @staticmethod
+    def _get_weather_batch_params(batch):
+        """
+        :param batch:   list() of tuple(), (cache key, parameters) from _get_weather_batches
+        :return:        dict(), Open Meteo API parameters requesting every location of the batch
+        """
+        params = dict(batch[0][1])
+        params['latitude'] = ','.join(str(x[1]['latitude']) for x in batch)
+        params['longitude'] = ','.join(str(x[1]['longitude']) for x in batch)
+        return params
+
+    def _load_weather_batch(self, batch):
+        try:
+            response = rC.basic_request(self._weather_url, params=self._get_weather_batch_params(batch),
+                                        instrumentation=self._instrumentation)
+        except Exception as e:
+            return {x[0]: (None, e) for x in batch}
+
+        return {x[0]: (y, None) for x, y in zip(batch, self._parse_weather_batch_response(response, batch))}
+
+    def _parse_weather_batch_response(self, response, batch):
+        """
+        :param batch:   list() of tuple(), (cache key, parameters) of each requested location, in request order
+        :return:        list() of dict(), the weather of each location in the same order, None if the request failed
+        """
+        cache_keys = [x[0] for x in batch]
+        self._increment('weather.requests')
+        if response.status_code != 200:
+            self._increment('weather.failures', tags={'status': response.status_code})
             print(f"Error: Unable to get weather data. Status code: {response.status_code}")
+            return [None] * len(cache_keys)
+
+        # A single location comes back as one forecast, several as a list in request order
+        forecasts = response.json()
+        if isinstance(forecasts, dict):
+            forecasts = [forecasts]
+        if len(forecasts) != len(cache_keys):
+            self._increment('weather.failures', tags={'error': 'LocationCountMismatch'})
+            print(f"Error: Unable to get weather data. Requested {len(cache_keys)} locations, received "
+                  f"{len(forecasts)}.")
+            return [None] * len(cache_keys)
+
+        if len(cache_keys) > 1:
+            self._increment('weather.batched_locations', value=len(cache_keys))
+        if self._weather_cache is not None:
+            for cache_key, weather_data in zip(cache_keys, forecasts):
+                self._weather_cache.set(cache_key, weather_data)
+        if self._sqlite_store is not None:
+            self._add_weather_snapshots([(x[1], y) for x, y in zip(batch, forecasts)])
+
+        return forecasts
+
+    def _add_weather_snapshots(self, snapshots):
+        # Written by the store's writer thread, the forecasts are returned without waiting for the database
+        self._sqlite_store.queue_weather_snapshots(snapshots, on_error=self._on_weather_snapshots_error)
+
+    def _on_weather_snapshots_error(self, error):
+        # The history is a record, the forecasts were still returned without it
+        self._increment('weather.snapshot_failures', tags={'error': type(error).__name__})
+        self._check_print(f"ERROR: Could not store weather snapshots. {type(error).__name__}: {error}")
+
+    def _get_prefetched_weather(self, params):
+        """
+        :return: dict(), the part of a prefetched range covering the days in params, None if no range covers them
+        """
+        location_key = self._get_weather_location_key(params)
+        with self._weather_lock:
+            weather_range = None
+            for start_date, end_date, created, data in self._prune_prefetched_weather(location_key):
+                if start_date <= params['start_date'] and params['end_date'] <= end_date:
+                    weather_range = data
+                    break
+
+        if weather_range is None:
             return None
 
+        start_datetime_obj = datetime.strptime(params['start_date'], "%Y-%m-%d")
+        end_datetime_obj = datetime.strptime(params['end_date'], "%Y-%m-%d") + timedelta(hours=23)
+        weather_data = {k: v for k, v in weather_range.items() if k != 'hourly'}
+        weather_data['hourly'] = self._filter_hourly_window(weather_range['hourly'], start_datetime_obj,
+                                                            end_datetime_obj)
+        return weather_data
+
+    def _add_prefetched_weather(self, params, weather_data):
+        location_key = self._get_weather_location_key(params)
+        with self._weather_lock:
+            # Ranges inside the new one are no longer needed
+            ranges = [x for x in self._prefetched_weather.get(location_key, [])
+                      if not (params['start_date'] <= x[0] and x[1] <= params['end_date'])]
+            ranges.append([params['start_date'], params['end_date'], time.time(), weather_data])
+            self._prefetched_weather[location_key] = ranges
+
+            for key in list(self._prefetched_weather):
+                self._prune_prefetched_weather(key)
+
+            entries = [(x[2], key, x) for key, ranges in self._prefetched_weather.items() for x in ranges]
+            if len(entries) > self._max_prefetched_ranges:
+                entries.sort(key=lambda x: x[0])
+                for _, key, entry in entries[:len(entries) - self._max_prefetched_ranges]:
+                    self._prefetched_weather[key].remove(entry)
+                    if not self._prefetched_weather[key]:
+                        del self._prefetched_weather[key]
+
+    def _prune_prefetched_weather(self, location_key):
+        """
+        Removes the expired prefetched ranges of a location. The caller holds _weather_lock.
+
+        :return: list(), the ranges left for the location
+        """
+        ranges = self._prefetched_weather.get(location_key, [])
+        if self._weather_cache_ttl > 0:
+            now = time.time()
+            ranges = [x for x in ranges if now - x[2] <= self._weather_cache_ttl]
+            if ranges:
+                self._prefetched_weather[location_key] = ranges
+            else:
+                self._prefetched_weather.pop(location_key, None)
+        return ranges
+
+    def prefetch_weather(self, start_day, end_day, teams=None, day_format="%Y-%m-%d", timezone='America/New_York',
+                         max_workers=16):
+        """
+        Retrieves the hourly forecast over a whole date range (Open Meteo forecasts up to 16 days ahead) for every
+        unique stadium location, so teams sharing a stadium share it. The locations are packed into as few requests
+        as possible (one for every NFL stadium). Afterwards
+        get_weather_forecast_for_stadium and get_weather_for_slate serve any game window inside the range from the
+        prefetched data without new requests. Locations already prefetched over the range are not requested again.
+
+        Prefetched ranges are kept for weather_cache_ttl seconds (until clear_weather_cache when the weather cache is
+        disabled). At most 256 ranges are kept, the oldest are dropped first.
+
+        :param start_day:       str(), first day in the format specified by day_format. E.g., 2024-09-05
+        :param end_day:         str(), last day in the format specified by day_format. E.g., 2024-09-20
+        :param teams:           list() of str(), teams to prefetch (default every team)
+        :param day_format:      str(), datetime format for start_day and end_day. https://strftime.org/
+        :param timezone:        str(), Open Meteo API timezone (default America/New_York). Must match the timezone
+                                later forecasts are requested with.
+        :param max_workers:     int(), maximum number of batched requests in flight at once (default 16)
+
+        :return:                dict(), 'locations' (unique stadium locations for the teams), 'requests' (locations
+                                that had to be requested) and 'failed' (list() of teams whose forecast could not be
+                                retrieved)
+        """
+        locations, to_request, failed = self._get_prefetch_locations(start_day, end_day, teams, day_format, timezone)
+        loaded = self._get_weather_data_many([x[0] for x in to_request], max_workers=max_workers)
+        self._add_prefetch_results(to_request, loaded, failed)
+        return {"locations": len(locations), "requests": len(to_request), "failed": failed}
+
+    def _get_prefetch_locations(self, start_day, end_day, teams, day_format, timezone):
+        """
+        :return: tuple(), (locations, to_request, failed). locations maps each unique stadium location to its
+                 (Open Meteo API parameters, list() of teams), to_request lists the locations not prefetched over the
+                 range yet and failed the teams without stadium coordinates.
+        """
+        start_date = datetime.strptime(start_day, day_format).strftime("%Y-%m-%d")
+        end_date = datetime.strptime(end_day, day_format).strftime("%Y-%m-%d")
+        if teams is None:
+            teams = sorted(set(self._team_alias_index.values()))
+
+        failed = []
+        locations = {}
+        for team in teams:
+            coords = self.get_stadium_coordinates_by_team(team)
+            if coords is None:
+                failed.append(team)
+                continue
+
+            params = self._get_weather_params(coords['lat'], coords['lon'], start_date, end_date, timezone)
+            location_key = self._get_weather_location_key(params)
+            if location_key not in locations:
+                locations[location_key] = (params, [])
+            locations[location_key][1].append(team)
+
+        to_request = [x for x in locations.values() if self._get_prefetched_weather(x[0]) is None]
+        return locations, to_request, failed
+
+    def _add_prefetch_results(self, to_request, loaded, failed):
+        """
+        :param to_request:  list() of tuple(), (parameters, teams) from _get_prefetch_locations
+        :param loaded:      list() of tuple(), (weather data, error) for each location of to_request
+        :param failed:      list(), the teams of every location that could not be retrieved are added to it
+        """
+        for (params, location_teams), (weather_data, error) in zip(to_request, loaded):
+            if error is not None:
+                self._increment('weather.failures', tags={'error': type(error).__name__})
+            if weather_data is None:
+                failed.extend(location_teams)
+            else:
+                self._add_prefetched_weather(params, weather_data)
+
+    def get_weather_cache_stats(self):
+        """
+        Use to see how effective the weather cache is.
+
+        :return: dict(), hits, memoryHits, diskHits, misses, expired, evictions and memoryEntries. None if the weather
+                 cache is disabled.
+        """
+        if self._weather_cache is None:
+            return None
+
+        return self._weather_cache.get_stats()
+
+    def clear_weather_cache(self):
+        """
+        Removes every cached weather forecast from memory and from resources/weatherCache, and every prefetched
+        forecast range.
+        """
+        with self._weather_lock:
+            self._prefetched_weather.clear()
+
+        if self._weather_cache is not None:
+            self._weather_cache.clear()
+
+    def get_weather_snapshots(self, team=None, start=None, end=None, forecast_day=None, day_format="%Y-%m-%d",
+                              stadium_name=None):
+        """
+        With cache_format='sqlite', every forecast received from Open Meteo (single, batched or prefetched) is kept
+        with the time it was received. Use to see how the forecast for a stadium changed over time, e.g., over the
+        week before a game. clear_weather_cache does not remove them.
+
+        :param team:            str(), team whose stadium you want forecasts for. Alternatively, use the stadium_name
+                                parameter.
+        :param start:           datetime(), optional. Only forecasts received at or after it
+        :param end:             datetime(), optional. Only forecasts received at or before it
+        :param forecast_day:    str(), optional. Only forecasts covering this day, in the format specified by
+                                day_format. E.g., 2024-09-08
+        :param day_format:      str(), datetime format for forecast_day. https://strftime.org/
+        :param stadium_name:    str(), optional. If provided, used instead of team.
+
+        :return:                list() of dict(), oldest first: 'fetchedAt' (datetime()), 'startDate' and 'endDate'
+                                (%Y-%m-%d, the days the forecast covers), 'timezone' and 'weather' (the forecast as
+                                received). None if cache_format is not 'sqlite' or the stadium has no coordinates.
+        """
+        if self._sqlite_store is None:
+            self._check_print("ERROR: Weather snapshots are only kept with cache_format='sqlite'.")
+            return None
+
+        if stadium_name is not None:
+            coords = self.get_stadium_coordinates_by_name(stadium_name)
+        else:
+            coords = self.get_stadium_coordinates_by_team(team)
+        if coords is None:
+            return None
+
+        if forecast_day is not None:
+            forecast_day = datetime.strptime(forecast_day, day_format).strftime("%Y-%m-%d")
+        # Include the forecasts received so far that the writer thread has not stored yet
+        self._sqlite_store.flush()
+        snapshots = self._sqlite_store.get_weather_snapshots(coords['lat'], coords['lon'],
+                                                             start=None if start is None else start.timestamp(),
+                                                             end=None if end is None else end.timestamp(),
+                                                             forecast_date=forecast_day)
+        for snapshot in snapshots:
+            snapshot['fetchedAt'] = datetime.fromtimestamp(snapshot['fetchedAt'])
+
+        return snapshots
+
+    def get_weather_for_stadiums(self, day, teams=None, hour_start=0, hour_end=23, day_format="%Y-%m-%d",
+                                 timezone='America/New_York', output_format='dict'):
+        """
+        Retrieves the weather forecast for many stadiums at once. The stadium locations are packed into as few Open
+        Meteo requests as possible, so every NFL stadium takes a single request instead of one per stadium.
+
+        :param day:             str(), day you want weather in format specified by the day_format parameter
+                                (default %Y-%m-%d). E.g., 2024-06-02
+        :param teams:           list() of str(), teams whose stadium you want weather for (default every team). See
+                                get_weather_forecast_for_stadium for the accepted formats.
+
+        Other parameters are the same as get_weather_forecast_for_stadium.
+
+        :return:                dict(), team as given -> the same data returned by get_weather_forecast_for_stadium,
+                                None if the weather could not be retrieved for the team's stadium
+        """
+        if teams is None:
+            teams = sorted(set(self._team_alias_index.values()))
+
+        results = self.get_weather_for_slate([(x, day, hour_start, hour_end) for x in teams], day_format=day_format,
+                                             timezone=timezone, output_format=output_format)
+        return {x['team']: x['weather'] for x in results}
+
+    def get_weather_for_slate(self, games, day_format="%Y-%m-%d", timezone='America/New_York', max_workers=16,
+                              output_format='dict'):
+        """
+        Retrieves the weather forecast for a whole slate of games at once. Games are packed into as few Open Meteo
+        requests as possible (one per day of the slate for a typical Sunday), so the slate takes about as long as one
+        request instead of one request per game. A game that fails does not stop the rest of the slate.
+
+        :param games:           list() of tuple(), one (team, day, hour_start, hour_end) tuple per game. hour_start
+                                and hour_end are optional (default 0 and 23). See get_weather_forecast_for_stadium for
+                                the format of each value. E.g., [('pit', '2024-09-08', 13, 16), ('lions', '2024-09-08')]
+
+        :param day_format:      str(), datetime format for each day. https://strftime.org/
+
+        :param timezone:        str(), Open Meteo API timezone utilized for the hours (default America/New_York).
+
+        :param max_workers:     int(), maximum number of weather requests in flight at once (default 16)
+
+        :param output_format:   str(), 'dict' (default) or 'columnar'. See get_weather_forecast_for_stadium.
+
+        :return:                list() of dict(), one per game in the same order as games. Each dict has the keys
+                                'team', 'day', 'hourStart', 'hourEnd', 'weather' (the same data returned by
+                                get_weather_forecast_for_stadium, or None) and 'error' (None, or str() describing why
+                                the weather could not be retrieved for that game).
+        """
+        results, requests = self._get_slate_requests(games, day_format, timezone, output_format)
+        loaded = self._get_weather_data_many([x[1][0] for x in requests], max_workers=max_workers)
+        self._set_slate_results(results, requests, loaded, output_format)
+        return results
+
+    def _get_slate_requests(self, games, day_format, timezone, output_format):
+        """
+        :return: tuple(), (results, requests). results has one _get_slate_result per game, requests one (game index,
+                 _get_forecast_request) tuple per game without an error.
+        """
+        results = [self._get_slate_result(x) for x in games]
+        requests = []
+        for i, result in enumerate(results):
+            if result['error'] is not None:
+                continue
+
+            try:
+                requests.append((i, self._get_forecast_request(result['team'], result['day'], result['hourStart'],
+                                                               result['hourEnd'], day_format, timezone, None,
+                                                               output_format)))
+            except Exception as e:
+                self._set_slate_error(result, e)
+
+        return results, requests
+
+    def _set_slate_results(self, results, requests, loaded, output_format):
+        """
+        :param loaded: list() of tuple(), (weather data, error) for each of requests
+        """
+        for (i, (_, start_datetime_obj, end_datetime_obj)), (weather_data, error) in zip(requests, loaded):
+            if error is not None:
+                self._set_slate_error(results[i], error)
+                continue
+
+            try:
+                weather = self._get_forecast_window(weather_data, start_datetime_obj, end_datetime_obj, output_format)
+            except Exception as e:
+                self._set_slate_error(results[i], e)
+            else:
+                self._set_slate_weather(results[i], weather)
+
+    def _get_slate_result(self, game):
+        team, day = game[0], game[1]
+        result = {
+            "team": team,
+            "day": day,
+            "hourStart": game[2] if len(game) > 2 else 0,
+            "hourEnd": game[3] if len(game) > 3 else 23,
+            "weather": None,
+            "error": None
+        }
+
+        if self.get_stadium_coordinates_by_team(team) is None:
+            result['error'] = f"Could not find stadium coordinates for team {team}"
+
+        return result
+
+    def _set_slate_error(self, result, error):
+        self._increment('weather.failures', tags={'error': type(error).__name__})
+        result['error'] = f"{type(error).__name__}: {error}"
+
+    @staticmethod
+    def _set_slate_weather(result, weather):
+        result['weather'] = weather
+        if weather is None:
+            result['error'] = "Unable to get weather data"
+
 
 def main():
     # Test code
@@ -0,0 +1,167 @@
+"""
+Shared fixtures. Every test runs offline against the Wikipedia/Open-Meteo stand-in of benchmarks/standIn.py, with its
+own cache directory.
+"""
+from pathlib import Path
+import builtins
+import errno
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+sys.path.insert(0, str(Path(__file__).parents[1] / "benchmarks"))
+
+from custom_libs.instrumentation import InMemoryInstrumentation
+from nflTeamStadiums import NFLTeamStadiums
+from standIn import StandInHandler, render_page_html, start_stand_in
+
+
+@pytest.fixture(scope='session')
+def stand_in_url():
+    server, base_url = start_stand_in()
+    yield base_url
+    server.shutdown()
+
+
+@pytest.fixture
+def stand_in(stand_in_url, monkeypatch):
+    """
+    :return: type(), StandInHandler. Changes a test makes to its fixture, latency or etags are undone afterwards.
+    """
+    monkeypatch.setattr(StandInHandler, 'fixture', dict(StandInHandler.fixture))
+    monkeypatch.setattr(StandInHandler, 'latency', 0.0)
+    monkeypatch.setattr(StandInHandler, 'etags', False)
+    return StandInHandler
+
+
+@pytest.fixture
+def publish_page_version(stand_in, monkeypatch):
+    """
+    :return: function, publishes a new revision of the stand-in's stadium list page and returns its version number.
+             Every version lists the stadiums in the opposite order of the previous one and sets each capacity to the
+             version number, so a lookup mixing the data of two versions returns the wrong stadium or capacity.
+    """
+    monkeypatch.setattr(stand_in, 'page_html', stand_in.page_html)
+    versions = [0]
+
+    def publish():
+        versions[0] = versions[0] + 1
+        fixture = dict(stand_in.fixture)
+        for table in ['currentStadiums', 'additionalStadiums']:
+            rows = [row[:3] + [versions[0]] + row[4:] for row in fixture[table]]
+            fixture[table] = rows[::-1] if versions[0] % 2 else rows
+        fixture['revid'] = fixture['revid'] + 1
+        stand_in.page_html = render_page_html(fixture)
+        stand_in.fixture = fixture
+        return versions[0]
+
+    return publish
+
+
+@pytest.fixture
+def peak_requests(stand_in, monkeypatch):
+    """
+    :return: dict(), 'peak' is the most requests the stand-in has been answering at once. Every request takes at least
+             20 ms, so requests sent together overlap.
+    """
+    counts = {"inFlight": 0, "peak": 0}
+    lock = threading.Lock()
+    do_get = stand_in.do_GET
+
+    def counting_do_get(handler):
+        with lock:
+            counts['inFlight'] = counts['inFlight'] + 1
+            counts['peak'] = max(counts['peak'], counts['inFlight'])
+        try:
+            time.sleep(0.02)
+            do_get(handler)
+        finally:
+            with lock:
+                counts['inFlight'] = counts['inFlight'] - 1
+
+    monkeypatch.setattr(stand_in, 'do_GET', counting_do_get)
+    return counts
+
+
+@pytest.fixture
+def stadium_kwargs(stand_in_url, stand_in, tmp_path):
+    """
+    :return: dict(), NFLTeamStadiums parameters pointing at the stand-in with a fresh cache directory
+    """
+    return {"verbose": False, "cache_dir": str(tmp_path / "resources"),
+            "wiki_api_url": f"{stand_in_url}/w/api.php", "weather_api_url": f"{stand_in_url}/v1/forecast",
+            "instrumentation": InMemoryInstrumentation()}
+
+
+@pytest.fixture
+def stadiums(stadium_kwargs):
+    """
+    :return: NFLTeamStadiums(), scraped from the stand-in
+    """
+    return NFLTeamStadiums(use_cache=False, **stadium_kwargs)
+
+
+@pytest.fixture
+def closed_port_url():
+    """
+    :return: str(), forecast url on a local port nothing listens on, so requests to it fail to connect
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}/v1/forecast"
+
+
+@pytest.fixture
+def make_read_only(monkeypatch):
+    """
+    :return: function, makes a directory and everything in it read only. Root ignores file permissions, so for root
+             opening a file under it for writing, or creating a directory there, raises PermissionError as well.
+    """
+    def make(directory):
+        directory = os.path.abspath(directory)
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                os.chmod(os.path.join(root, name), 0o444)
+            os.chmod(root, 0o555)
+        # Writable again afterwards, so tmp_path can be cleaned up
+        request_cleanup.append(directory)
+
+        if getattr(os, 'geteuid', lambda: None)() != 0:
+            return
+
+        def check(path):
+            if os.path.abspath(path) == directory or os.path.abspath(path).startswith(directory + os.sep):
+                raise PermissionError(errno.EACCES, "Permission denied", path)
+
+        real_open, real_mkdir, real_builtin_open = os.open, os.mkdir, builtins.open
+
+        def guarded_os_open(path, flags, *args, **kwargs):
+            if flags & (os.O_WRONLY | os.O_RDWR | os.O_CREAT):
+                check(path)
+            return real_open(path, flags, *args, **kwargs)
+
+        def guarded_mkdir(path, *args, **kwargs):
+            check(path)
+            return real_mkdir(path, *args, **kwargs)
+
+        def guarded_builtin_open(file, mode='r', *args, **kwargs):
+            if isinstance(file, (str, os.PathLike)) and any(x in mode for x in 'wax+'):
+                check(file)
+            return real_builtin_open(file, mode, *args, **kwargs)
+
+        monkeypatch.setattr(os, 'open', guarded_os_open)
+        monkeypatch.setattr(os, 'mkdir', guarded_mkdir)
+        monkeypatch.setattr(builtins, 'open', guarded_builtin_open)
+
+    request_cleanup = []
+    yield make
+    for directory in request_cleanup:
+        for root, dirs, files in os.walk(directory):
+            os.chmod(root, 0o755)
+            for name in files:
+                os.chmod(os.path.join(root, name), 0o644)
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+
+import pytest
+
+from asyncNFLTeamStadiums import AsyncNFLTeamStadiums
+from custom_libs import fileCommon as fC
+from custom_libs.weatherCache import WeatherCache
+
+SLATE = [('PIT', '2024-09-08', 13, 16), ('DET', '2024-09-08', 13, 16), ('KC', '2024-09-08', 20, 23)]
+
+
+def run_with_stadiums(stadium_kwargs, test, **kwargs):
+    async def main():
+        async with await AsyncNFLTeamStadiums.create(**stadium_kwargs, **kwargs) as nfl_stadiums:
+            return await test(nfl_stadiums)
+
+    return asyncio.run(main())
+
+
+def test_concurrent_slates_share_one_request(stadium_kwargs, stand_in):
+    async def test(nfl_stadiums):
+        requests_before = stand_in.request_count
+        results = await asyncio.gather(nfl_stadiums.get_weather_for_slate(SLATE),
+                                       nfl_stadiums.get_weather_for_slate(SLATE))
+        return stand_in.request_count - requests_before, results, dict(nfl_stadiums._weather_tasks)
+
+    requests, (first, second), weather_tasks = run_with_stadiums(stadium_kwargs, test, weather_cache_ttl=0)
+    assert requests == 1
+    assert [x['weather'] for x in first] == [x['weather'] for x in second]
+    assert all(x['error'] is None for x in first + second)
+    assert weather_tasks == {}
+
+
+def test_single_forecast_waits_for_batch_in_flight(stadium_kwargs, stand_in):
+    async def test(nfl_stadiums):
+        stand_in.latency = 0.05
+        requests_before = stand_in.request_count
+        slate_task = asyncio.ensure_future(nfl_stadiums.get_weather_for_slate(SLATE))
+        while not nfl_stadiums._weather_tasks:
+            await asyncio.sleep(0.001)
+        single = await nfl_stadiums.get_weather_forecast_for_stadium('DET', '2024-09-08', 13, 16)
+        slate = await slate_task
+        return stand_in.request_count - requests_before, slate, single
+
+    requests, slate, single = run_with_stadiums(stadium_kwargs, test, weather_cache_ttl=0)
+    assert requests == 1
+    assert single == slate[1]['weather']
+
+
+def test_cancelled_slate_cancels_its_batch(stadium_kwargs, stand_in):
+    async def test(nfl_stadiums):
+        stand_in.latency = 0.5
+        task = asyncio.ensure_future(nfl_stadiums.get_weather_for_slate(SLATE))
+        await asyncio.sleep(0.05)
+        in_flight = len(nfl_stadiums._weather_tasks)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return in_flight, dict(nfl_stadiums._weather_tasks)
+
+    in_flight, weather_tasks = run_with_stadiums(stadium_kwargs, test, weather_cache_ttl=0)
+    assert in_flight == len(SLATE)
+    assert weather_tasks == {}
+
+
+def test_cache_files_are_handled_off_the_event_loop(stadium_kwargs, stand_in, monkeypatch):
+    threads = {}
+
+    def record(owner, name):
+        function = getattr(owner, name)
+
+        def wrapper(*args, **kwargs):
+            threads.setdefault(name, set()).add(threading.get_ident())
+            return function(*args, **kwargs)
+        monkeypatch.setattr(owner, name, wrapper)
+
+    for name in ['load_json_from_file', 'dump_json_to_file', 'write_content_to_file']:
+        record(fC, name)
+    for name in ['get', 'set']:
+        record(WeatherCache, name)
+
+    async def test(nfl_stadiums):
+        stand_in.fixture['revid'] = stand_in.fixture['revid'] + 1
+        await nfl_stadiums.refresh()
+        await nfl_stadiums.get_weather_for_slate(SLATE)
+        await nfl_stadiums.get_weather_forecast_for_stadium('SEA', '2024-09-08', 13, 16)
+        async with await AsyncNFLTeamStadiums.create(**stadium_kwargs):
+            pass
+        return threading.get_ident()
+
+    loop_thread = run_with_stadiums(stadium_kwargs, test)
+    assert set(threads) == {'load_json_from_file', 'dump_json_to_file', 'write_content_to_file', 'get', 'set'}
+    assert [k for k, v in threads.items() if loop_thread in v] == []
+
+
+def test_cancelled_refresh_keeps_data(stadium_kwargs, stand_in):
+    async def test(nfl_stadiums):
+        data, page_revid = nfl_stadiums.data, nfl_stadiums._page_revid
+        stand_in.latency = 0.05
+        stand_in.fixture['revid'] = stand_in.fixture['revid'] + 1
+        task = asyncio.ensure_future(nfl_stadiums.refresh(incremental=False))
+        await asyncio.sleep(0.08)
+        task.cancel()
+        result = (await asyncio.gather(task, return_exceptions=True))[0]
+        return result, nfl_stadiums.data is data, nfl_stadiums._page_revid == page_revid
+
+    result, same_data, same_revid = run_with_stadiums(stadium_kwargs, test)
+    assert isinstance(result, asyncio.CancelledError)
+    assert same_data and same_revid
+
+
+def test_forecast_request_error_is_counted(stadium_kwargs, stand_in, closed_port_url):
+    async def test(nfl_stadiums):
+        nfl_stadiums._weather_url = closed_port_url
+        results = await asyncio.gather(nfl_stadiums.get_weather_forecast_for_stadium('DET', '2024-09-08', 13, 16),
+                                       return_exceptions=True)
+        return results[0]
+
+    error = run_with_stadiums(stadium_kwargs, test)
+    assert isinstance(error, Exception)
+    counters = stadium_kwargs['instrumentation'].counters
+    assert counters[f"weather.failures{{error={type(error).__name__}}}"] == 1
+
+
+def test_background_refresh_publishes_new_data(stadium_kwargs, stand_in, publish_page_version):
+    async def test(nfl_stadiums):
+        snapshot = nfl_stadiums._snapshot
+        version = publish_page_version()
+        nfl_stadiums.start_background_refresh(interval=0.01)
+        for _ in range(500):
+            if nfl_stadiums._snapshot is not snapshot:
+                break
+            await asyncio.sleep(0.01)
+        data = nfl_stadiums.data
+        await nfl_stadiums.stop_background_refresh()
+        return data, nfl_stadiums._background_refresh, version
+
+    data, background_refresh, version = run_with_stadiums(stadium_kwargs, test)
+    assert {x.capacity for x in data} == {version}
+    assert background_refresh is None
+
+
+@pytest.mark.parametrize('max_concurrent_requests', [1, 2])
+def test_max_concurrent_requests(stadium_kwargs, peak_requests, max_concurrent_requests):
+    async def test(nfl_stadiums):
+        return len(nfl_stadiums.data)
+
+    assert run_with_stadiums(stadium_kwargs, test, use_cache=False, max_concurrent_requests=max_concurrent_requests)
+    assert peak_requests['peak'] == max_concurrent_requests
@@ -0,0 +1,472 @@
+from datetime import datetime, timedelta
+import json
+import os
+import threading
+import time
+
+import pytest
+import requests
+
+from custom_libs import fileCommon as fC
+from custom_libs import requestsCommon as rC
+from custom_libs.fileLock import FileLock
+from custom_libs.stadiumRecord import Stadium
+from custom_libs.stadiumSnapshot import StadiumSnapshot
+from nflTeamStadiums import NFLTeamStadiums
+from standIn import get_forecast
+
+
+def assert_metadata_matches_data(nfl_stadiums):
+    snapshot = nfl_stadiums._snapshot
+    assert snapshot.stadium_metadata
+    for metadata in snapshot.stadium_metadata.values():
+        assert snapshot.data[metadata['index']].name == metadata['name']
+
+
+def test_cache_load_waits_for_cache_write(stadiums, stadium_kwargs):
+    # Write a reordered cache one file at a time while holding the lock, like _save_cache does
+    lock = FileLock(stadiums._cache_files_lock.fpath)
+    lock.acquire()
+    loaded = []
+    reader = threading.Thread(target=lambda: loaded.append(NFLTeamStadiums(**stadium_kwargs)))
+    try:
+        reader.start()
+        data = [x.to_dict() for x in reversed(stadiums.data)]
+        fC.dump_json_to_file(stadiums._parsed_soup_file, data)
+        time.sleep(0.2)
+        assert reader.is_alive()
+
+        cache_metadata = fC.load_json_from_file(stadiums._cache_metadata_file)
+        for metadata in cache_metadata['stadiumMetadata'].values():
+            metadata['index'] = len(data) - 1 - metadata['index']
+        fC.dump_json_to_file(stadiums._cache_metadata_file, cache_metadata)
+    finally:
+        lock.release()
+
+    reader.join()
+    assert loaded[0].data[0] == stadiums.data[-1]
+    assert_metadata_matches_data(loaded[0])
+
+
+def test_nearest_stadiums_with_no_k(stadiums):
+    assert stadiums.nearest_stadiums(42.34, -83.05, k=0) == []
+    assert stadiums.nearest_stadiums(42.34, -83.05, k=-1) == []
+    assert stadiums.nearest_stadiums([42.34, 39.05], [-83.05, -94.48], k=0) == [[], []]
+    assert len(stadiums.nearest_stadiums(42.34, -83.05, k=2)) == 2
+
+
+def test_stadium_to_dict_is_json_data(stadiums):
+    stadium = stadiums.get_stadium_by_team('DET')
+    data = stadium.to_dict()
+    assert type(data) is dict and type(data['teams']) is list and type(data['coordinates']) is dict
+    assert json.loads(json.dumps(data)) == data
+    assert data == stadium and stadium.coordinates.to_dict() == data['coordinates']
+    assert [x.to_dict() for x in stadiums.data] == fC.load_json_from_file(stadiums._parsed_soup_file)
+
+
+def test_prefetched_weather_is_pruned(stadium_kwargs, stand_in, monkeypatch):
+    nfl_stadiums = NFLTeamStadiums(use_cache=False, weather_cache_ttl=60, **stadium_kwargs)
+    nfl_stadiums.prefetch_weather('2024-09-05', '2024-09-20', teams=['DET', 'KC'])
+    det_key, kc_key = nfl_stadiums._prefetched_weather
+
+    # Expired ranges are removed on lookup, and from every location when a range is added
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    assert nfl_stadiums.get_weather_forecast_for_stadium('DET', '2024-09-08', 13, 16) is not None
+    assert list(nfl_stadiums._prefetched_weather) == [kc_key]
+    nfl_stadiums.prefetch_weather('2024-09-05', '2024-09-20', teams=['PIT'])
+    assert len(nfl_stadiums._prefetched_weather) == 1 and kc_key not in nfl_stadiums._prefetched_weather
+
+
+def test_prefetched_weather_is_capped(stadium_kwargs, stand_in):
+    nfl_stadiums = NFLTeamStadiums(use_cache=False, weather_cache_ttl=0, **stadium_kwargs)
+    nfl_stadiums._max_prefetched_ranges = 3
+    for day in range(1, 6):
+        nfl_stadiums.prefetch_weather(f'2024-09-0{day}', f'2024-09-0{day}', teams=['DET'])
+
+    ranges = [x for ranges in nfl_stadiums._prefetched_weather.values() for x in ranges]
+    assert [x[0] for x in ranges] == ['2024-09-03', '2024-09-04', '2024-09-05']
+
+
+def test_forecast_request_error_is_counted(stadium_kwargs, stand_in, closed_port_url):
+    nfl_stadiums = NFLTeamStadiums(use_cache=False, **stadium_kwargs)
+    nfl_stadiums._weather_url = closed_port_url
+    with pytest.raises(Exception) as error:
+        nfl_stadiums.get_weather_forecast_for_stadium('DET', '2024-09-08', 13, 16)
+
+    counters = stadium_kwargs['instrumentation'].counters
+    assert counters[f"weather.failures{{error={type(error.value).__name__}}}"] == 1
+
+
+def test_not_modified_list_page_is_read_from_raw_soup(stadium_kwargs, stand_in):
+    stand_in.etags = True
+    nfl_stadiums = NFLTeamStadiums(use_cache=False, **stadium_kwargs)
+    wiki_responses = fC.load_json_from_file(nfl_stadiums._wiki_responses_file)
+    list_page = [v for k, v in wiki_responses.items() if 'action=parse' in k]
+    assert len(list_page) == 1 and 'content' not in list_page[0] and list_page[0]['revid'] == nfl_stadiums._page_revid
+    assert all('content' in v for k, v in wiki_responses.items() if 'action=parse' not in k)
+
+    data = nfl_stadiums.data
+    bytes_before = stand_in.bytes_sent
+    assert nfl_stadiums.refresh(incremental=False)
+    assert stand_in.bytes_sent == bytes_before
+    assert nfl_stadiums.data == data and nfl_stadiums._page_revid == list_page[0]['revid']
+    counters = stadium_kwargs['instrumentation'].counters
+    assert counters['wiki.not_modified'] == len(wiki_responses)
+
+
+def test_list_page_json_is_parsed_once(stadium_kwargs, stand_in, publish_page_version, monkeypatch):
+    stand_in.etags = True
+    parsed = []
+    response_json = requests.Response.json
+    monkeypatch.setattr(requests.Response, 'json', lambda self, **kwargs: parsed.append(self.url) or
+                        response_json(self, **kwargs))
+
+    nfl_stadiums = NFLTeamStadiums(use_cache=False, **stadium_kwargs)
+    publish_page_version()
+    assert nfl_stadiums.refresh()
+    assert len([x for x in parsed if 'action=parse' in x]) == 2
+
+    wiki_responses = fC.load_json_from_file(nfl_stadiums._wiki_responses_file)
+    assert [v['revid'] for k, v in wiki_responses.items() if 'action=parse' in k] == [stand_in.fixture['revid']]
+
+
+def test_lookups_during_background_refreshes_see_one_version(stadiums, stand_in, publish_page_version):
+    publish_page_version()
+    assert stadiums.refresh()
+    expected = len(stadiums.data)
+    distance = stadiums.get_distance_from_matrix('DET', 'KC')
+    stop = threading.Event()
+    errors = []
+    versions = set()
+
+    def read():
+        while not stop.is_set():
+            try:
+                data = stadiums.data
+                assert len(data) == expected and len({x.capacity for x in data}) == 1
+                assert stadiums.get_stadium_by_team('DET').name == 'Ford Field'
+                assert stadiums.nearest_stadiums(42.34, -83.04)[0]['stadium'].name == 'Ford Field'
+                fixed = stadiums.query(roof_type='Fixed')
+                assert fixed and all(x.roof_type == 'Fixed' for x in fixed) and len({x.capacity for x in fixed}) == 1
+                assert stadiums.search_stadiums('Arrowhead', limit=1)[0]['stadium'].city == 'Kansas City, Missouri'
+                assert stadiums.get_distance_from_matrix('DET', 'KC') == distance
+                assert_metadata_matches_data(stadiums)
+                versions.add(data[0].capacity)
+            except Exception as e:
+                errors.append(e)
+
+    def publish():
+        while not stop.wait(0.02):
+            publish_page_version()
+
+    threads = [threading.Thread(target=read) for _ in range(4)] + [threading.Thread(target=publish)]
+    for thread in threads:
+        thread.start()
+    stadiums.start_background_refresh(interval=0.01)
+    for _ in range(1000):
+        if len(versions) > 3 or errors:
+            break
+        time.sleep(0.01)
+    stadiums.stop_background_refresh()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(versions) > 3
+    assert 'refresh.failures' not in stadiums._instrumentation.counters
+    assert stadiums._background_refresh is None
+
+
+def test_failed_background_refresh_keeps_data(stadiums, stand_in, publish_page_version, monkeypatch):
+    def fail(*args, **kwargs):
+        raise ConnectionError("stand-in is down")
+
+    snapshot, page_revid = stadiums._snapshot, stadiums._page_revid
+    publish_page_version()
+    counters = stadiums._instrumentation.counters
+    with monkeypatch.context() as m:
+        m.setattr(rC, 'basic_request', fail)
+        stadiums.start_background_refresh(interval=0.01)
+        for _ in range(500):
+            if counters['refresh.failures'] >= 2:
+                break
+            time.sleep(0.01)
+        stadiums.stop_background_refresh()
+
+    assert counters['refresh.failures'] >= 2
+    assert stadiums._snapshot is snapshot and stadiums._page_revid == page_revid
+    assert stadiums.refresh() and stadiums.data[0].capacity == 1
+
+
+@pytest.mark.parametrize('cache_format', ['json', 'binary'])
+@pytest.mark.parametrize('lock_file', [True, False])
+def test_cache_loads_from_read_only_directory(stadium_kwargs, stand_in, make_read_only, cache_format, lock_file):
+    stadiums = NFLTeamStadiums(use_cache=False, cache_format=cache_format, **stadium_kwargs)
+    if not lock_file:
+        os.remove(stadiums._cache_files_lock.fpath)
+    make_read_only(stadium_kwargs['cache_dir'])
+
+    requests_before = stand_in.request_count
+    loaded = NFLTeamStadiums(cache_format=cache_format, **stadium_kwargs)
+    assert stand_in.request_count == requests_before
+    assert list(loaded.data) == list(stadiums.data)
+    assert loaded.get_stadium_by_team('DET') == stadiums.get_stadium_by_team('DET')
+
+
+def test_stadiums_of_a_team_are_returned_as_a_copy(stadiums):
+    ford_field = stadiums.get_stadium_by_team('DET')
+    distance = stadiums.get_distance_from_matrix('DET', 'KC')
+    second = Stadium.from_dict({**ford_field.to_dict(), 'name': 'Ford Field II'})
+    stadiums._publish(StadiumSnapshot(list(stadiums.data) + [second], stadiums._snapshot.stadium_metadata))
+
+    found = stadiums.get_stadium_by_team('DET')
+    assert found == [ford_field, second]
+    found.reverse()
+    found.append(None)
+    assert stadiums.get_stadium_by_team('DET') == [ford_field, second]
+    assert stadiums.get_distance_from_matrix('DET', 'KC') == distance
+
+
+# KC: at DET, home, bye, at BUF, at DET (straight from BUF), DET at Wembley. DET and BUF have byes.
+SEASON = [(1, 'DET', 'KC'), (2, 'KC', 'BUF'), (4, 'Bills', 'Chiefs'), (5, 'DET', 'KC'),
+          (6, 'KC', 'Detroit Lions', 'Wembley Stadium')]
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_season_travel(stadiums, use_numpy):
+    def miles(*names):
+        return sum(stadiums.calculate_distance_between_stadiums('', '', name_stadium1=x, name_stadium2=y)
+                   for x, y in zip(names, names[1:]))
+
+    arrowhead, ford, highmark, wembley = ('GEHA Field at Arrowhead Stadium', 'Ford Field', 'Highmark Stadium',
+                                          'Wembley Stadium')
+    travel = stadiums.get_season_travel(SEASON, use_numpy=use_numpy)
+    assert sorted(travel) == ['BUF', 'DET', 'KC']
+
+    expected_weekly = {
+        'KC': {1: miles(arrowhead, ford), 2: miles(ford, arrowhead), 4: miles(arrowhead, highmark),
+               5: miles(highmark, ford), 6: miles(ford, wembley, arrowhead)},
+        'DET': {1: 0.0, 2: 0.0, 4: 0.0, 5: 0.0, 6: miles(ford, wembley, ford)},
+        'BUF': {1: 0.0, 2: miles(highmark, arrowhead), 4: miles(arrowhead, highmark), 5: 0.0, 6: 0.0}
+    }
+    for team, weekly in expected_weekly.items():
+        assert travel[team]['weeklyMiles'] == pytest.approx(weekly)
+        assert travel[team]['totalMiles'] == pytest.approx(sum(weekly.values()))
+        assert travel[team]['cumulativeMiles'][6] == pytest.approx(sum(weekly.values()))
+
+    kc = travel['KC']
+    assert kc['cumulativeMiles'][4] == pytest.approx(miles(arrowhead, ford, arrowhead, highmark))
+    assert kc['longestTrip'] == {"fromWeek": 6, "toWeek": None, "from": wembley, "to": arrowhead,
+                                 "miles": pytest.approx(miles(wembley, arrowhead))}
+    assert [(x['fromWeek'], x['toWeek'], x['from'], x['to']) for x in kc['backToBackRoadLegs']] == [
+        (4, 5, highmark, ford), (5, 6, ford, wembley)]
+    assert [x['miles'] for x in kc['backToBackRoadLegs']] == pytest.approx([miles(highmark, ford),
+                                                                            miles(ford, wembley)])
+    assert travel['DET']['longestTrip']['miles'] == pytest.approx(miles(ford, wembley))
+    assert travel['DET']['backToBackRoadLegs'] == [] and travel['BUF']['backToBackRoadLegs'] == []
+
+
+def test_season_travel_numpy_matches_pure_python(stadiums):
+    travel = stadiums.get_season_travel(SEASON)
+    python_travel = stadiums.get_season_travel(SEASON, use_numpy=False)
+    assert sorted(travel) == sorted(python_travel)
+    for team in travel:
+        for key in ['totalMiles', 'weeklyMiles', 'cumulativeMiles', 'longestTrip']:
+            assert travel[team][key] == pytest.approx(python_travel[team][key])
+        assert [pytest.approx(x) for x in travel[team]['backToBackRoadLegs']] == \
+            python_travel[team]['backToBackRoadLegs']
+
+
+@pytest.mark.parametrize('game', [(7, 'DET', 'Toronto Argonauts'), (7, 'Toronto Argonauts', 'DET'),
+                                  (7, 'DET', 'KC', 'Rogers Centre')])
+def test_season_travel_with_unknown_team_or_venue(stadiums, game):
+    assert stadiums.get_season_travel(SEASON + [game]) is None
+    assert stadiums.get_season_travel(SEASON + [game], use_numpy=False) is None
+    assert stadiums.get_season_travel_arrays([SEASON, SEASON + [game]]) is None
+
+
+def test_season_travel_arrays_match_each_schedule(stadiums):
+    # Same weeks in both, as a week only some schedules have is a bye week in the others
+    schedules = [SEASON, [(1, 'KC', 'DET'), (2, 'BUF', 'KC'), (4, 'DET', 'BUF', 'Tottenham Hotspur Stadium'),
+                          (5, 'KC', 'DET'), (6, 'BUF', 'DET')]]
+    arrays = stadiums.get_season_travel_arrays(schedules)
+    assert arrays['teams'] == ['BUF', 'DET', 'KC'] and arrays['weeks'] == [1, 2, 4, 5, 6]
+
+    for s, schedule in enumerate(schedules):
+        travel = stadiums.get_season_travel(schedule)
+        for t, team in enumerate(arrays['teams']):
+            weekly = {week: float(arrays['weeklyMiles'][s][t][w]) for w, week in enumerate(arrays['weeks'])}
+            assert weekly == pytest.approx(travel[team]['weeklyMiles'])
+            assert arrays['cumulativeMiles'][s][t][-1] == pytest.approx(travel[team]['totalMiles'])
+            assert arrays['totalMiles'][s][t] == pytest.approx(travel[team]['totalMiles'])
+            assert arrays['longestTripMiles'][s][t] == pytest.approx(travel[team]['longestTrip']['miles'])
+            assert arrays['backToBackRoadLegs'][s][t] == len(travel[team]['backToBackRoadLegs'])
+
+
+def test_incremental_refresh_requests(stadiums, stand_in, publish_page_version):
+    count = stand_in.request_count
+    assert not stadiums.refresh()
+    assert stand_in.request_count - count == 1
+
+    version = publish_page_version()
+    count = stand_in.request_count
+    assert stadiums.refresh()
+    # The revision ids, then the list page. No stadium page changed, so no coordinates are requested.
+    assert stand_in.request_count - count == 2
+    assert {x.capacity for x in stadiums.data} == {version}
+    assert stadiums.get_stadium_coordinates_by_team('DET') == {"lat": 42.34, "lon": -83.0456, "primary": "",
+                                                               "globe": "earth"}
+
+
+@pytest.mark.parametrize('day, hours', [('2024-03-10', ['00', '01', '03']),
+                                        ('2024-11-03', ['00', '01', '01', '02', '03']),
+                                        ('2024-06-02', ['00', '01', '02', '03'])])
+def test_forecast_window_on_a_dst_change(stadiums, day, hours):
+    forecast = stadiums.get_weather_forecast_for_stadium('DET', day, hour_start=0, hour_end=3)
+    assert forecast['hourly']['time'] == [f"{day}T{x}:00" for x in hours]
+    assert {len(x) for x in forecast['hourly'].values()} == {len(hours)}
+
+
+@pytest.mark.parametrize('start_date, end_date', [('2024-03-09', '2024-03-11'), ('2024-11-02', '2024-11-04'),
+                                                  ('2024-06-01', '2024-06-03')])
+def test_filter_hourly_window_matches_checking_every_hour(start_date, end_date):
+    # Across a DST change the times are not a regular hourly grid and every timestamp is checked instead
+    hourly = get_forecast({"latitude": "42.34", "longitude": "-83.0456", "hourly": "temperature_2m,rain",
+                           "start_date": start_date, "end_date": end_date, "timezone": "America/New_York"})['hourly']
+    first = datetime.strptime(start_date, '%Y-%m-%d')
+    for start in range(-2, 75, 5):
+        for length in [0, 1, 4, 23, 80]:
+            start_datetime_obj = first + timedelta(hours=start)
+            end_datetime_obj = start_datetime_obj + timedelta(hours=length)
+            indices = [i for i, x in enumerate(hourly['time'])
+                       if start_datetime_obj <= datetime.strptime(x, '%Y-%m-%dT%H:%M') <= end_datetime_obj]
+            assert NFLTeamStadiums._filter_hourly_window(hourly, start_datetime_obj, end_datetime_obj) == \
+                {key: [values[i] for i in indices] for key, values in hourly.items()}
+
+
+def test_query_matches_checking_every_stadium(stadiums):
+    def matches(value, accepted):
+        return accepted is None or value.lower() in {' '.join(x.split()).lower() for x in accepted}
+
+    def in_range(value, bounds):
+        low, high = bounds or (None, None)
+        return (low is None or value >= low) and (high is None or value <= high)
+
+    capacities = sorted({x.capacity for x in stadiums.data})
+    roof_types = [None, ['Open'], [' fixed  '], ['Fixed', 'RETRACTABLE'], ['Dome']]
+    surfaces = [None, ['Grass'], ['fieldturf', 'Hellas Matrix Turf']]
+    # Exact values, bounds between values, open ends, every stadium, none and an empty range
+    capacity_ranges = [None, (capacities[3], capacities[10]), (capacities[3] + 1, capacities[10] - 1), (70000, None),
+                       (None, 67000), (None, None), (0, 10 ** 6), (capacities[-1] + 1, None), (70000, 60000)]
+    for roof_type in roof_types:
+        for surface in surfaces:
+            for capacity in capacity_ranges:
+                expected = [x for x in stadiums.data if matches(x.roof_type, roof_type) and
+                            matches(x.surface, surface) and in_range(x.capacity, capacity)]
+                assert stadiums.query(roof_type=roof_type, surface=surface, capacity=capacity) == expected
+
+    assert stadiums.query(capacity=capacities[0]) == [x for x in stadiums.data if x.capacity == capacities[0]]
+    assert stadiums.query(roof_type='Retractable', year_opened=(2000, 2010)) == [
+        x for x in stadiums.data if x.roof_type == 'Retractable' and 2000 <= x.year_opened <= 2010]
+    with pytest.raises(ValueError):
+        stadiums.query(capacity=(1, 2, 3))
+
+
+def test_search_stadiums_finds_misspelled_names(stadiums):
+    # A dropped, swapped or wrong letter every third letter of every name
+    misspellings = []
+    for stadium in stadiums.data:
+        name = stadium.name
+        for i in range(1, len(name) - 1, 3):
+            misspellings.extend((x, stadium) for x in [name[:i] + name[i + 1:],
+                                                       name[:i] + name[i + 1] + name[i] + name[i + 2:],
+                                                       name[:i] + 'x' + name[i + 1:]])
+
+    results = stadiums.search_stadiums([x for x, _ in misspellings])
+    assert all(stadium in [x['stadium'] for x in result] for (_, stadium), result in zip(misspellings, results))
+    first = sum(bool(result) and result[0]['stadium'] == stadium for (_, stadium), result in zip(misspellings, results))
+    assert first / len(misspellings) >= 0.95
+    assert stadiums.search_stadiums('Arowhead')[0]['stadium'].name == 'GEHA Field at Arrowhead Stadium'
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+@pytest.mark.parametrize('float32', [False, True])
+def test_distance_matrix_matches_calculate_distance(stadiums, use_numpy, float32):
+    names = stadiums.get_list_of_stadium_names()
+    matrix = stadiums.distance_matrix(use_numpy=use_numpy, float32=float32)
+    tolerance = 0.05 if float32 else 1e-6
+    for i, name1 in enumerate(names):
+        for j, name2 in enumerate(names):
+            distance = stadiums.calculate_distance_between_stadiums('', '', name_stadium1=name1, name_stadium2=name2)
+            assert float(matrix[i][j]) == pytest.approx(distance, abs=tolerance)
+            assert stadiums.get_distance_from_matrix(name1, name2, use_numpy, float32) == \
+                pytest.approx(distance, abs=tolerance)
+
+    assert stadiums.get_distance_from_matrix('Lions', 'KC', use_numpy, float32) == pytest.approx(
+        stadiums.calculate_distance_between_stadiums('Lions', 'KC'), abs=tolerance)
+    assert stadiums.get_distance_from_matrix('DET', 'Toronto Argonauts', use_numpy, float32) is None
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_distance_matrix_without_coordinates(stadiums, use_numpy):
+    no_coordinates = Stadium.from_dict({**stadiums.get_stadium_by_team('DET').to_dict(), 'name': 'Pontiac Silverdome',
+                                        'currentTeams': [], 'coordinates': None})
+    stadiums._publish(StadiumSnapshot(list(stadiums.data) + [no_coordinates], stadiums._snapshot.stadium_metadata))
+
+    row = stadiums.distance_matrix(use_numpy=use_numpy)[-1]
+    assert all(x is None or x != x for x in row)
+    assert stadiums.calculate_distance_between_stadiums('', '', name_stadium1='Pontiac Silverdome',
+                                                        name_stadium2='Ford Field') is None
+    assert stadiums.get_distance_from_matrix('Pontiac Silverdome', 'Ford Field', use_numpy) is None
+
+
+def test_batched_spatial_queries_match_every_distance(stadiums):
+    np = pytest.importorskip('numpy')
+    lats, lons = [42.34, 25.0, 51.5, -33.9, 39.05], [-83.05, -80.2, -0.1, 151.2, -94.48]
+
+    def get_distances(lat, lon):
+        return sorted((NFLTeamStadiums._calculate_haversine_distance({"lat": lat, "lon": lon}, x.coordinates), x.name)
+                      for x in stadiums.data)
+
+    for batch_lats, batch_lons in [(lats, lons), (tuple(lats), tuple(lons)), (np.array(lats), np.array(lons)),
+                                   (range(20, 25), range(-100, -95))]:
+        nearest = stadiums.nearest_stadiums(batch_lats, batch_lons, k=3)
+        within = stadiums.stadiums_within(batch_lats, batch_lons, 600)
+        assert len(nearest) == len(within) == len(batch_lats)
+        for lat, lon, nearest_results, within_results in zip(batch_lats, batch_lons, nearest, within):
+            distances = get_distances(lat, lon)
+            for results, expected in [(nearest_results, distances[:3]), (within_results,
+                                                                           [x for x in distances if x[0] <= 600])]:
+                assert [x['stadium'].name for x in results] == [x[1] for x in expected]
+                assert [x['distance'] for x in results] == pytest.approx([x[0] for x in expected])
+
+    assert stadiums.nearest_stadiums(np.float64(42.34), np.float64(-83.05))[0]['stadium'].name == 'Ford Field'
+
+
+def test_only_stadium_cache_files_are_fsynced(stadium_kwargs, stand_in, monkeypatch):
+    writes = {}
+    open_for_atomic_write = fC._open_for_atomic_write
+
+    def record_write(fpath, encoding=None, fsync=False):
+        writes[os.path.basename(fpath)] = fsync
+        return open_for_atomic_write(fpath, encoding, fsync)
+
+    monkeypatch.setattr(fC, '_open_for_atomic_write', record_write)
+    nfl_stadiums = NFLTeamStadiums(use_cache=False, **stadium_kwargs)
+    assert nfl_stadiums.get_weather_forecast_for_stadium('DET', '2024-09-08', 13, 16) is not None
+
+    fsynced = {k for k, v in writes.items() if v}
+    assert fsynced == {'parsedSoup.json', 'cacheMetadata.json', 'rawSoup.txt'}
+    assert set(writes) - fsynced == set(os.listdir(nfl_stadiums._weather_cache_dir))
+
+
+@pytest.mark.parametrize('max_concurrent_requests', [1, 2])
+def test_max_concurrent_requests(stadium_kwargs, peak_requests, max_concurrent_requests):
+    nfl_stadiums = NFLTeamStadiums(use_cache=False, max_concurrent_requests=max_concurrent_requests, **stadium_kwargs)
+    assert nfl_stadiums.data
+    assert peak_requests['peak'] == max_concurrent_requests
+
+    with pytest.raises(ValueError):
+        NFLTeamStadiums(max_concurrent_requests=0, **stadium_kwargs)
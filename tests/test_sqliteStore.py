@@ -0,0 +1,75 @@
+from datetime import datetime
+import sqlite3
+import time
+
+from nflTeamStadiums import NFLTeamStadiums
+
+
+def test_stadiums_round_trip(stadiums, stadium_kwargs):
+    NFLTeamStadiums(use_cache=False, cache_format='sqlite', **stadium_kwargs)
+    loaded = NFLTeamStadiums(cache_format='sqlite', **stadium_kwargs)
+    assert list(loaded.data) == list(stadiums.data)
+    assert loaded.get_stadium_by_team('DET') == stadiums.get_stadium_by_team('DET')
+
+
+def test_weather_snapshot_history(stadium_kwargs, stand_in):
+    nfl_stadiums = NFLTeamStadiums(use_cache=False, cache_format='sqlite', weather_cache_ttl=0, **stadium_kwargs)
+    first = nfl_stadiums.get_weather_forecast_for_stadium('DET', '2024-09-08', 13, 16)
+    assert first is not None
+    between = time.time()
+    nfl_stadiums.get_weather_for_slate([('DET', '2024-09-08', 13, 16), ('KC', '2024-09-09', 13, 16)])
+
+    snapshots = nfl_stadiums.get_weather_snapshots('DET')
+    assert len(snapshots) == 2
+    assert [x['startDate'] for x in snapshots] == ['2024-09-08', '2024-09-08']
+    assert len(nfl_stadiums.get_weather_snapshots('DET', start=datetime.fromtimestamp(between))) == 1
+    assert nfl_stadiums.get_weather_snapshots('DET', forecast_day='2024-09-09') == []
+    assert len(nfl_stadiums.get_weather_snapshots('KC', forecast_day='2024-09-09')) == 1
+
+
+def test_locked_database_does_not_delay_forecasts(stadium_kwargs, stand_in):
+    nfl_stadiums = NFLTeamStadiums(use_cache=False, cache_format='sqlite', weather_cache_ttl=0, **stadium_kwargs)
+    nfl_stadiums._sqlite_store.timeout = 0.5
+    nfl_stadiums._sqlite_store.close()
+
+    # Another process holds the write lock for longer than the store waits for it
+    other = sqlite3.connect(nfl_stadiums._sqlite_file, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    try:
+        started = time.perf_counter()
+        weather = nfl_stadiums.get_weather_forecast_for_stadium('DET', '2024-09-08', 13, 16)
+        elapsed = time.perf_counter() - started
+        nfl_stadiums._sqlite_store.flush()
+    finally:
+        other.rollback()
+        other.close()
+
+    assert weather is not None
+    assert elapsed < 0.5
+    counters = stadium_kwargs['instrumentation'].counters
+    assert counters['weather.snapshot_failures{error=OperationalError}'] == 1
+    assert nfl_stadiums.get_weather_snapshots('DET') == []
+
+
+def test_version_1_database_keeps_weather_history(stadium_kwargs, stand_in):
+    nfl_stadiums = NFLTeamStadiums(use_cache=False, cache_format='sqlite', weather_cache_ttl=0, **stadium_kwargs)
+    nfl_stadiums.get_weather_forecast_for_stadium('DET', '2024-09-08', 13, 16)
+    nfl_stadiums._sqlite_store.flush()
+    nfl_stadiums._sqlite_store.close()
+
+    # The stadium indexes of version 1 were never used by a query
+    with sqlite3.connect(nfl_stadiums._sqlite_file, isolation_level=None) as connection:
+        connection.execute('CREATE INDEX stadiums_name ON stadiums (name COLLATE NOCASE)')
+        connection.execute('CREATE INDEX stadium_teams_team ON stadium_teams (team)')
+        connection.execute('PRAGMA user_version=1')
+    connection.close()
+
+    loaded = NFLTeamStadiums(cache_format='sqlite', **stadium_kwargs)
+    assert list(loaded.data) == list(nfl_stadiums.data)
+    assert len(loaded.get_weather_snapshots('DET')) == 1
+    with sqlite3.connect(nfl_stadiums._sqlite_file) as connection:
+        indexes = [x[0] for x in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND "
+                                                    "name NOT LIKE 'sqlite_autoindex%'")]
+        assert indexes == ['weather_snapshots_location']
+        assert connection.execute('PRAGMA user_version').fetchone()[0] == 2
+    connection.close()
@@ -0,0 +1,78 @@
+import os
+import struct
+
+from custom_libs import stadiumCache
+from custom_libs.stadiumRecord import Coordinates, Stadium
+
+STADIUMS = [
+    Stadium('Ford Field', 65000, 'Ford_Field.jpg', 'Detroit, Michigan', 'FieldTurf', 'Fixed', ['Detroit Lions'], 2002,
+            False, ['DET'], Coordinates(42.34, -83.0456)),
+    Stadium('SoFi Stadium', 70240, 'SoFi.jpg', 'Inglewood, California', 'Matrix Turf', 'Fixed',
+            ['Los Angeles Rams', 'Los Angeles Chargers'], 2020, True, ['LAR', 'LAC'],
+            Coordinates(33.9535, -118.3392, 'secondary', 'earth')),
+    Stadium('Estádio do Maracanã', 78838, '', 'Rio de Janeiro, Brazil', 'Grass', 'Open', [], 1950),
+]
+
+
+def test_round_trip(tmp_path):
+    fpath = str(tmp_path / "parsedSoup.bin")
+    stadiumCache.write_stadium_cache(fpath, STADIUMS)
+    loaded = stadiumCache.load_stadium_cache(fpath)
+    assert list(loaded) == STADIUMS
+    assert loaded[-1] is loaded[2] and loaded[1:] == STADIUMS[1:]
+    assert stadiumCache.load_stadium_cache(str(tmp_path / "missing.bin")) is None
+
+
+def test_writes_never_replace_a_mapped_file(tmp_path, monkeypatch):
+    fpath = str(tmp_path / "parsedSoup.bin")
+    stadiumCache.write_stadium_cache(fpath, STADIUMS)
+    loaded = stadiumCache.load_stadium_cache(fpath)
+
+    # Like Windows: a mapped file can be neither replaced nor removed
+    mapped = os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0])
+    replace, remove = os.replace, os.remove
+
+    def guarded_replace(src, dst):
+        assert not os.path.exists(dst)
+        replace(src, dst)
+
+    def guarded_remove(path):
+        if path == mapped:
+            raise PermissionError(13, "The process cannot access the file", path)
+        remove(path)
+
+    monkeypatch.setattr(os, 'replace', guarded_replace)
+    monkeypatch.setattr(os, 'remove', guarded_remove)
+    stadiumCache.write_stadium_cache(fpath, STADIUMS[:1])
+    assert list(stadiumCache.load_stadium_cache(fpath)) == STADIUMS[:1]
+    assert list(loaded) == STADIUMS
+
+    monkeypatch.undo()
+    del loaded
+    stadiumCache.write_stadium_cache(fpath, STADIUMS[:2])
+    assert os.listdir(str(tmp_path)) == ["parsedSoup.3.bin"]
+    assert list(stadiumCache.load_stadium_cache(fpath)) == STADIUMS[:2]
+
+
+def test_truncated_file_is_not_loaded(tmp_path):
+    fpath = str(tmp_path / "parsedSoup.bin")
+    stadiumCache.write_stadium_cache(fpath, STADIUMS)
+    version_path = str(tmp_path / "parsedSoup.1.bin")
+    with open(version_path, 'rb') as f:
+        content = f.read()
+
+    # Cut inside the string blob, then inside the records
+    for size in [len(content) - 1, stadiumCache._header_struct.size + 10]:
+        with open(version_path, 'wb') as f:
+            f.write(content[:size])
+        assert stadiumCache.load_stadium_cache(fpath) is None
+
+
+def test_other_schema_version_is_not_loaded(tmp_path):
+    fpath = str(tmp_path / "parsedSoup.bin")
+    stadiumCache.write_stadium_cache(fpath, STADIUMS)
+    version_path = str(tmp_path / "parsedSoup.1.bin")
+    with open(version_path, 'r+b') as f:
+        f.seek(4)
+        f.write(struct.pack('<H', stadiumCache.SCHEMA_VERSION + 1))
+    assert stadiumCache.load_stadium_cache(fpath) is None
@@ -0,0 +1,34 @@
+import os
+
+from custom_libs.weatherCache import WeatherCache
+
+
+def test_disk_tier_is_scanned_once(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "weatherCache")
+    old_cache = WeatherCache(cache_dir, max_disk_entries=10)
+    for i in range(5):
+        old_cache.set(f"old{i}", i)
+
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scans.append(path) or scandir(path))
+
+    # Entries left by an earlier instance are counted and evicted first
+    cache = WeatherCache(cache_dir, max_memory_entries=0, max_disk_entries=10)
+    for i in range(30):
+        cache.set(f"new{i}", i)
+
+    assert len(scans) == 1
+    assert sorted(x[:-len('.json')] for x in os.listdir(cache_dir)) == sorted(f"new{i}" for i in range(20, 30))
+    assert cache.get_stats()['evictions'] == 25
+    assert cache.get("new29") == 29 and cache.get("new19") is None
+
+
+def test_expired_disk_entries_are_no_longer_counted(tmp_path):
+    cache = WeatherCache(str(tmp_path / "weatherCache"), ttl=-1, max_memory_entries=0, max_disk_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") is None
+    cache.set("c", 3)
+    assert sorted(os.listdir(cache.cache_dir)) == ["b.json", "c.json"]
+    assert cache.get_stats()['evictions'] == 0